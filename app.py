@@ -1,38 +1,103 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, url_for
+from flask_compress import Compress
 from flask_cors import CORS
 from routes.chat import chat_bp
 from routes.history import history_bp
 from routes.conversations import conversations_bp
 from routes.users import users_bp
+from services.faiss_service import get_faiss_service
+from services.prompt_engine import get_prompt_engine
+from services.json_provider import ORJSONProvider
+from services.openai_service import set_usage_endpoint
+from services.static_assets import asset_version
 from config import Config
+from logging_config import current_request_id, end_request, request_duration_ms, setup_logging, start_request
 import logging
-import sys
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('promptsense.log')
-    ]
-)
+import re
+import threading
+import uuid
+
+# Configure logging (queued; written by a background thread, see logging_config.py)
+setup_logging()
 
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger('promptsense.requests')
+
+# Client-supplied X-Request-ID values that are reused as is
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
 
 # Create Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = ORJSONProvider(app)
 
 # Enable CORS
 CORS(app)
 
+# Compress large responses (brotli/gzip, see COMPRESS_* in Config)
+Compress(app)
+
 # Register blueprints
 app.register_blueprint(chat_bp)
 app.register_blueprint(history_bp)
 app.register_blueprint(conversations_bp)
 app.register_blueprint(users_bp)
 
+# Open the vector store and build the shared services off the request path;
+# /api/health reports readiness once the store is open
+get_faiss_service()
+threading.Thread(target=get_prompt_engine, name='warm-up', daemon=True).start()
+
+
+@app.before_request
+def begin_request_logging():
+    """Tag this request's log records with a request id (the client's X-Request-ID when valid)"""
+    request_id = request.headers.get('X-Request-ID', '')
+    start_request(request_id if REQUEST_ID_PATTERN.match(request_id) else uuid.uuid4().hex)
+    set_usage_endpoint(request.endpoint)
+
+
+@app.after_request
+def log_request(response):
+    """Echo the request id and log the request with its duration and stage timings"""
+    request_id = current_request_id()
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+        if request.endpoint != 'static':
+            request_logger.info(
+                "%s %s %s", request.method, request.path, response.status_code,
+                extra={"duration_ms": request_duration_ms()}
+            )
+    return response
+
+
+@app.teardown_request
+def finish_request_logging(error):
+    end_request()
+    set_usage_endpoint(None)
+
+
+@app.template_global()
+def static_url(filename):
+    """Static file URL carrying its content hash, so browsers can cache it for good"""
+    version = asset_version(app.static_folder, filename)
+    return url_for('static', filename=filename, v=version) if version else url_for('static', filename=filename)
+
+
+@app.after_request
+def cache_static_assets(response):
+    """Hashed static URLs are immutable; any other static request is revalidated with its ETag"""
+    if request.endpoint == 'static':
+        version = request.args.get('v')
+        if version and version == asset_version(app.static_folder, request.view_args['filename']):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = Config.STATIC_ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+    return response
+
 
 @app.route('/')
 def index():
@@ -42,22 +107,41 @@ def index():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+    Responds 503 while the vector store is still opening so load balancers hold traffic back;
+    a store that failed to open is reported as degraded (chat keeps working without similar queries)
+    """
+    vector_index = get_faiss_service().status
+    if vector_index == 'loading':
+        status, code = "starting", 503
+    elif vector_index == 'error':
+        status, code = "degraded", 200
+    else:
+        status, code = "healthy", 200
+
     return jsonify({
-        "status": "healthy",
+        "status": status,
+        "ready": vector_index != 'loading',
+        "components": {
+            "vector_index": vector_index
+        },
         "service": "PromptSense",
         "version": "1.0.0"
-    }), 200
+    }), code
 
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
-    """Get client-safe configuration"""
-    return jsonify({
+    """Get client-safe configuration (with an ETag; If-None-Match gets a 304)"""
+    response = jsonify({
         "embedding_model": Config.EMBEDDING_MODEL,
         "llm_model": Config.LLM_MODEL,
         "similar_queries_limit": Config.SIMILAR_QUERIES_LIMIT
-    }), 200
+    })
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.errorhandler(404)
@@ -72,7 +156,7 @@ def not_found(error):
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error)
     return jsonify({
         "success": False,
         "error": "Internal server error"
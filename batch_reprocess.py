@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline Reprocessing Script for PromptSense
+Re-classifies messages and re-titles conversations through the OpenAI Batch API
+
+Examples:
+    python batch_reprocess.py run --kinds intent,domain,title
+    python batch_reprocess.py submit --kinds title --since 2024-01-01
+    python batch_reprocess.py collect batch_abc123
+"""
+
+import sys
+import io
+import argparse
+from services.batch_jobs import BatchJobRunner, JOB_KINDS
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Bulk reprocessing through the OpenAI Batch API")
+    parser.add_argument('--backend', choices=['openai', 'local'], help="Override OPENAI_BATCH_BACKEND")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name in ('submit', 'run'):
+        sub = subparsers.add_parser(name, help=f"{name.capitalize()} reprocessing batches")
+        sub.add_argument('--kinds', default=','.join(JOB_KINDS), help="Comma separated: intent,domain,title")
+        sub.add_argument('--since', help="Only rows newer than this timestamp (YYYY-MM-DD)")
+        sub.add_argument('--limit', type=int, help="Maximum number of source rows per kind")
+        sub.add_argument('--all-titles', action='store_true', help="Re-title every conversation, not only generic ones")
+        sub.add_argument('--interval', type=int, help="Polling interval in seconds")
+
+    collect = subparsers.add_parser('collect', help="Wait for batches and apply their results")
+    collect.add_argument('batch_ids', nargs='+')
+    collect.add_argument('--interval', type=int, help="Polling interval in seconds")
+
+    return parser.parse_args()
+
+
+def main():
+    """Run the offline reprocessing job"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Offline Reprocessing")
+    print("=" * 60)
+    print()
+
+    try:
+        runner = BatchJobRunner(backend=args.backend)
+
+        if args.command in ('submit', 'run'):
+            kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+            unknown = [kind for kind in kinds if kind not in JOB_KINDS]
+            if unknown:
+                print(f"❌ Unknown kinds: {', '.join(unknown)}")
+                sys.exit(1)
+
+            batch_ids = runner.submit(kinds, since=args.since, limit=args.limit, all_titles=args.all_titles)
+            if not batch_ids:
+                print("Nothing to reprocess.")
+                return
+            print(f"📤 Submitted batches: {' '.join(batch_ids)}")
+            if args.command == 'submit':
+                print("Collect results later with: python batch_reprocess.py collect " + ' '.join(batch_ids))
+                return
+        else:
+            batch_ids = args.batch_ids
+
+        for batch_id in batch_ids:
+            print(f"⏳ Waiting for {batch_id}...")
+            applied = runner.collect(batch_id, interval=args.interval)
+            summary = ', '.join(f"{kind}: {count}" for kind, count in applied.items())
+            print(f"✅ Applied {batch_id} ({summary})")
+
+    except Exception as e:
+        print(f"❌ Reprocessing failed: {e}")
+        logger.exception("Reprocessing error")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON Serialization Benchmark for PromptSense
+Compares CPU time and peak Python memory of serving one long conversation as JSON:
+the previous path (fetchall, per-row isoformat, Flask's json), the orjson provider on the
+same list, and the streamed response fed row by row like a server-side cursor
+
+Examples:
+    python -m benchmarks.json_serialization
+    python -m benchmarks.json_serialization --messages 50000 --include-enhanced
+"""
+
+import sys
+import io
+import argparse
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="CPU time and peak memory of conversation JSON responses")
+    parser.add_argument('--messages', type=int, default=10000, help="Messages in the conversation")
+    parser.add_argument('--runs', type=int, default=5, help="Timed runs per mode (median is reported)")
+    parser.add_argument('--include-enhanced', action='store_true', help="Include the prompt detail columns")
+    return parser.parse_args()
+
+
+def message_rows(count, include_enhanced):
+    """Rows shaped like the RealDictCursor results of the slim message projection"""
+    started = datetime(2025, 1, 1, 9, 0, 0, 123456)
+    for message_id in range(1, count + 1):
+        row = {
+            "id": message_id,
+            "conversation_id": 1,
+            "role": "user" if message_id % 2 else "assistant",
+            "content": f"Message {message_id}: how do I tune a Postgres index for this query? " * 4,
+            "intent": "question",
+            "domain": "databases",
+            "timestamp": started + timedelta(seconds=message_id),
+            "has_enhanced_prompt": message_id % 2 == 1
+        }
+        if include_enhanced:
+            row["original_prompt"] = row["content"]
+            row["enhanced_prompt"] = "Context: the user prefers concise, practical answers. " * 8 + row["content"]
+            row["metadata"] = {"similar_queries_count": 3}
+        yield row
+
+
+def serve_jsonify(app, args, keep_body=False):
+    """Previous path: the whole list in memory, timestamps converted per row, standard json"""
+    from flask.json.provider import DefaultJSONProvider
+
+    provider = DefaultJSONProvider(app)
+    messages = []
+    for row in message_rows(args.messages, args.include_enhanced):
+        msg_dict = dict(row)
+        if msg_dict.get('timestamp'):
+            msg_dict['timestamp'] = msg_dict['timestamp'].isoformat()
+        messages.append(msg_dict)
+    response = provider.response({"success": True, "messages": messages, "count": len(messages)})
+    return response.get_data() if keep_body else len(response.get_data())
+
+
+def serve_orjson(app, args, keep_body=False):
+    """orjson provider over the same fully fetched list"""
+    messages = list(message_rows(args.messages, args.include_enhanced))
+    response = app.json.response({"success": True, "messages": messages, "count": len(messages)})
+    return response.get_data() if keep_body else len(response.get_data())
+
+
+def serve_stream(app, args, keep_body=False):
+    """Streamed response: rows serialized in batches as the cursor yields them"""
+    rows = message_rows(args.messages, args.include_enhanced)
+    chunks = app.json.stream_list({"success": True, "conversation_id": 1}, "messages", rows)
+    if keep_body:
+        return b''.join(chunks)
+    return sum(len(chunk) for chunk in chunks)
+
+
+def same_messages(app, args, modes):
+    """
+    Whether every mode returns the same parsed messages array. The bodies differ around it:
+    the stream also carries conversation_id and complete, and writes count after the list
+    """
+    import json
+
+    arrays = [json.loads(serve(app, args, keep_body=True))["messages"] for _, serve in modes]
+    return all(array == arrays[0] for array in arrays[1:])
+
+
+def measure(serve, app, args):
+    """Median CPU ms, response bytes and peak traced memory (MB) of one mode"""
+    cpu = []
+    for _ in range(args.runs):
+        started = time.process_time()
+        size = serve(app, args)
+        cpu.append((time.process_time() - started) * 1000)
+
+    tracemalloc.start()
+    serve(app, args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(cpu), size, peak / (1024 * 1024)
+
+
+def main():
+    """Run the serialization benchmark"""
+    args = parse_args()
+
+    from flask import Flask
+    from services.json_provider import ORJSONProvider
+
+    print("=" * 60)
+    print("PromptSense JSON Serialization Benchmark")
+    print("=" * 60)
+    print()
+
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+
+    print(f"📦 {args.messages} messages" + (" with prompt details" if args.include_enhanced else "") + f", {args.runs} runs per mode")
+    print()
+    print(f"   {'mode':<16} {'cpu ms':>9} {'body MB':>9} {'peak MB':>9}")
+    modes = (("jsonify", serve_jsonify), ("orjson", serve_orjson), ("orjson stream", serve_stream))
+    with app.app_context():
+        for label, serve in modes:
+            cpu_ms, size, peak_mb = measure(serve, app, args)
+            print(f"   {label:<16} {cpu_ms:>9.1f} {size / (1024 * 1024):>9.2f} {peak_mb:>9.2f}")
+        identical = same_messages(app, args, modes)
+
+    print()
+    if identical:
+        print("✅ Parsed messages arrays are identical in all modes")
+    else:
+        print("❌ Parsed messages arrays differ between modes")
+    print("ℹ️  Peak memory covers Python allocations (rows, dicts, response body), not the database driver")
+
+
+if __name__ == '__main__':
+    main()
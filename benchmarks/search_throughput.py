@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search Throughput Benchmark for PromptSense
+Runs concurrent search_similar callers against a synthetic shard store, with and without the search batcher
+
+Examples:
+    python -m benchmarks.search_throughput
+    python -m benchmarks.search_throughput --vectors 50000 --users 32 --clients 1,8,64 --window-ms 1
+"""
+
+import sys
+import io
+import os
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Concurrent vector search throughput benchmark")
+    parser.add_argument('--vectors', type=int, default=20000, help="Synthetic vectors to index")
+    parser.add_argument('--users', type=int, default=16, help="Users the vectors are spread over")
+    parser.add_argument('--dimension', type=int, help="Vector dimension (defaults to EMBEDDING_DIMENSION)")
+    parser.add_argument('--clients', default='1,8,64', help="Comma separated concurrent client counts")
+    parser.add_argument('--duration', type=float, default=5, help="Seconds per measurement")
+    parser.add_argument('--batch-size', type=int, default=64, help="Batcher maximum queries per search")
+    parser.add_argument('--window-ms', type=float, default=2, help="Batcher window in milliseconds")
+    return parser.parse_args()
+
+
+def measure(service, clients, duration, users, dimension):
+    """Run clients threads calling search_similar for duration seconds; returns (qps, p50 ms, p99 ms)"""
+    latencies = [[] for _ in range(clients)]
+    stop = threading.Event()
+
+    def client(slot):
+        rng = random.Random(slot)
+        while not stop.is_set():
+            query = [rng.random() for _ in range(dimension)]
+            started = time.perf_counter()
+            service.search_similar(query, k=3, user_id=rng.randint(1, users))
+            latencies[slot].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(latency for per_client in latencies for latency in per_client)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return len(samples) / duration, statistics.median(samples) * 1000, p99 * 1000
+
+
+def main():
+    """Run the search throughput benchmark"""
+    args = parse_args()
+
+    # The store must point at a scratch directory before the configuration is read
+    scratch = tempfile.mkdtemp(prefix='promptsense-bench-')
+    os.environ['FAISS_SHARD_DIR'] = scratch
+    os.environ['FAISS_MODE'] = 'writer'
+    os.environ['VECTOR_SEARCH_BATCH_SIZE'] = str(args.batch_size)
+    os.environ['VECTOR_SEARCH_BATCH_WINDOW_MS'] = str(args.window_ms)
+
+    from config import Config
+    if args.dimension:
+        Config.EMBEDDING_DIMENSION = args.dimension
+    from services.faiss_service import FAISSService
+
+    print("=" * 60)
+    print("PromptSense Search Throughput Benchmark")
+    print("=" * 60)
+    print()
+
+    service = FAISSService()
+    dimension = Config.EMBEDDING_DIMENSION
+    print(f"📦 Indexing {args.vectors} vectors of dimension {dimension} for {args.users} users...")
+    rng = random.Random(0)
+    for start in range(0, args.vectors, 1000):
+        service.add_vectors([
+            {
+                "vector": [rng.random() for _ in range(dimension)],
+                "user_id": rng.randint(1, args.users),
+                "message_id": message_id,
+                "text": f"message {message_id}"
+            }
+            for message_id in range(start, min(start + 1000, args.vectors))
+        ])
+
+    batcher = service.search_batcher
+    print(f"📦 Batcher: up to {args.batch_size} queries, {args.window_ms} ms window")
+    print()
+    print(f"   {'clients':>7}  {'mode':<9} {'qps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+    for clients in [int(value) for value in args.clients.split(',')]:
+        for mode in ('unbatched', 'batched'):
+            service.search_batcher = batcher if mode == 'batched' else None
+            qps, p50, p99 = measure(service, clients, args.duration, args.users, dimension)
+            print(f"   {clients:>7}  {mode:<9} {qps:>9.1f} {p50:>9.2f} {p99:>9.2f}")
+
+    service.search_batcher = batcher
+    if batcher:
+        stats = batcher.get_stats()
+        print()
+        print(f"📊 Batches: {stats['batches']}, average size {stats['avg_batch']}, largest {stats['max_batch']}")
+    print(f"🗑️  Scratch shards left in {scratch}")
+
+
+if __name__ == '__main__':
+    main()
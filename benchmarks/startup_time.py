@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Startup Benchmark for PromptSense
+Measures, in fresh processes, how long importing the app takes and how long until /api/health is ready
+
+Examples:
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --runs 10 --shard-dir ./faiss_shards
+"""
+
+import sys
+import io
+import os
+import json
+import argparse
+import statistics
+import subprocess
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prefix of the result line (the app also logs to stdout)
+RESULT_MARKER = 'STARTUP_RESULT '
+
+# Runs inside each fresh interpreter
+CHILD_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+client = app.app.test_client()
+deadline = started + {timeout}
+response = client.get('/api/health')
+while response.status_code == 503 and time.perf_counter() < deadline:
+    time.sleep(0.005)
+    response = client.get('/api/health')
+ready = time.perf_counter() - started
+print("{marker}" + json.dumps({{"import_s": imported, "ready_s": ready, "status": response.get_json()["status"]}}))
+"""
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Worker startup time benchmark")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh processes to start")
+    parser.add_argument('--shard-dir', help="FAISS_SHARD_DIR to start against (defaults to the configured one)")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds to wait for readiness per run")
+    return parser.parse_args()
+
+
+def run_once(env, timeout):
+    """Start one interpreter and return its timings"""
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT.format(timeout=timeout, marker=RESULT_MARKER)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith(RESULT_MARKER))
+    return json.loads(line[len(RESULT_MARKER):])
+
+
+def summarize(label, values):
+    """Print median, min and max of a series in milliseconds"""
+    print(
+        f"   {label:<18} median {statistics.median(values) * 1000:8.1f} ms"
+        f"   min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    """Run the startup benchmark"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Startup Benchmark")
+    print("=" * 60)
+    print()
+
+    env = dict(os.environ)
+    if args.shard_dir:
+        env['FAISS_SHARD_DIR'] = args.shard_dir
+
+    results = []
+    for run in range(args.runs):
+        try:
+            result = run_once(env, args.timeout)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Run {run + 1} failed:\n{e.stderr}")
+            sys.exit(1)
+        results.append(result)
+        print(f"   Run {run + 1}: import {result['import_s'] * 1000:.1f} ms, ready {result['ready_s'] * 1000:.1f} ms ({result['status']})")
+
+    print()
+    print("📊 Results:")
+    summarize("import app", [r['import_s'] for r in results])
+    summarize("health ready", [r['ready_s'] for r in results])
+
+
+if __name__ == '__main__':
+    main()
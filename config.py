@@ -17,10 +17,69 @@ class Config:
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True') == 'True'
 
+    # Response compression (flask-compress reads these from app.config): responses of at least
+    # COMPRESS_MIN_SIZE bytes are encoded with the first algorithm the client accepts
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+    COMPRESS_ALGORITHM = os.getenv('COMPRESS_ALGORITHM', 'br,gzip')
+    COMPRESS_ALGORITHM_STREAMING = os.getenv('COMPRESS_ALGORITHM_STREAMING', 'br,deflate')
+    COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', '4'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+
+    # Static files requested with their content hash (?v=) are cached by browsers for this long
+    STATIC_ASSET_MAX_AGE = int(os.getenv('STATIC_ASSET_MAX_AGE', str(365 * 24 * 3600)))
+
+    # Logging (logging_config.py): records go through a bounded in-memory queue to a background
+    # thread that writes stdout and a size-rotated JSON file. LOG_LEVELS overrides single loggers,
+    # e.g. "services.openai_service=DEBUG,werkzeug=WARNING"
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_FILE = os.getenv('LOG_FILE', 'promptsense.log')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # stdout format: 'text' or 'json'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
     # FAISS
     FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', './faiss_index.bin')
     FAISS_METADATA_PATH = os.getenv('FAISS_METADATA_PATH', './faiss_metadata.json')
 
+    # FAISS shards: users are bucketed by user_id % FAISS_SHARD_COUNT, one index file per bucket
+    FAISS_SHARD_DIR = os.getenv('FAISS_SHARD_DIR', './faiss_shards')
+    FAISS_SHARD_COUNT = int(os.getenv('FAISS_SHARD_COUNT', '64'))
+    FAISS_MEMORY_BUDGET_MB = int(os.getenv('FAISS_MEMORY_BUDGET_MB', '512'))
+    # Metric of new shard stores: 'cosine' (inner product over normalized vectors) or 'l2';
+    # convert an existing store with convert_index.py
+    FAISS_METRIC = os.getenv('FAISS_METRIC', 'cosine')
+    # Vector encoding of new shard stores: 'flat' (float32), 'fp16', 'sq8' or 'pq' (FAISS_PQ_M bytes per vector).
+    # Quantized shards re-rank FAISS_RERANK_FACTOR times more candidates with float32 copies mapped from disk (0: off)
+    FAISS_INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat')
+    FAISS_PQ_M = int(os.getenv('FAISS_PQ_M', '64'))
+    FAISS_RERANK_FACTOR = int(os.getenv('FAISS_RERANK_FACTOR', '4'))
+    # Seconds a write waits for the store to finish opening at startup
+    FAISS_READY_TIMEOUT = float(os.getenv('FAISS_READY_TIMEOUT', '30'))
+    # 'writer': this process owns the shards (single worker)
+    # 'reader': web workers memory-map published snapshots and spool writes for vector_indexer.py
+    # 'remote': web workers call vector_server.py, which owns the shards
+    FAISS_MODE = os.getenv('FAISS_MODE', 'writer')
+    FAISS_SPOOL_DIR = os.getenv('FAISS_SPOOL_DIR', os.path.join(FAISS_SHARD_DIR, 'spool'))
+    FAISS_RELOAD_INTERVAL = float(os.getenv('FAISS_RELOAD_INTERVAL', '1'))
+    FAISS_INDEXER_POLL_INTERVAL = float(os.getenv('FAISS_INDEXER_POLL_INTERVAL', '1'))
+    # Snapshots written by vector_snapshot.py export
+    FAISS_SNAPSHOT_DIR = os.getenv('FAISS_SNAPSHOT_DIR', './faiss_snapshots')
+    # Also store each user message embedding (float16) in the message_embeddings table, in the
+    # message's transaction, so rebuild_vectors.py can recreate the shards without the API
+    EMBEDDINGS_IN_DB = os.getenv('EMBEDDINGS_IN_DB', 'False') == 'True'
+
+    # Vector search server (vector_server.py), used by web workers with FAISS_MODE=remote
+    VECTOR_SERVER_HOST = os.getenv('VECTOR_SERVER_HOST', '127.0.0.1')
+    VECTOR_SERVER_PORT = int(os.getenv('VECTOR_SERVER_PORT', '5055'))
+    VECTOR_SERVER_URL = os.getenv('VECTOR_SERVER_URL', f"http://{VECTOR_SERVER_HOST}:{VECTOR_SERVER_PORT}")
+    VECTOR_SERVER_TIMEOUT = float(os.getenv('VECTOR_SERVER_TIMEOUT', '5'))
+
+    # Coalescing of concurrent searches into one multi-query index search
+    VECTOR_SEARCH_BATCH_SIZE = int(os.getenv('VECTOR_SEARCH_BATCH_SIZE', '64'))
+    VECTOR_SEARCH_BATCH_WINDOW_MS = float(os.getenv('VECTOR_SEARCH_BATCH_WINDOW_MS', '2'))
+
     # Embedding Model
     EMBEDDING_MODEL = "text-embedding-3-large"
     EMBEDDING_DIMENSION = 3072
@@ -30,3 +89,75 @@ class Config:
 
     # FAISS Search
     SIMILAR_QUERIES_LIMIT = 3
+    # Similar queries below this cosine similarity are not added to the prompt
+    SIMILARITY_MIN_SCORE = float(os.getenv('SIMILARITY_MIN_SCORE', '0.4'))
+    # Hybrid retrieval: BM25 keyword hits fused with vector hits by reciprocal rank
+    # (keyword hits alone when the embedding call fails)
+    HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'True') == 'True'
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '10'))
+    HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', '60'))
+    # Keyword hits must contain at least this fraction of the query's terms to reach the prompt
+    HYBRID_MIN_TERM_MATCH = float(os.getenv('HYBRID_MIN_TERM_MATCH', '0.5'))
+
+    # Conversation history sent with each response request: up to HISTORY_MAX_MESSAGES of the
+    # conversation and about HISTORY_MAX_TOKENS, trimmed HISTORY_BLOCK_MESSAGES at a time so the
+    # prompt prefix stays the same between trims
+    HISTORY_MAX_MESSAGES = max(1, int(os.getenv('HISTORY_MAX_MESSAGES', '8')))
+    HISTORY_BLOCK_MESSAGES = max(1, int(os.getenv('HISTORY_BLOCK_MESSAGES', '4')))
+    HISTORY_MAX_TOKENS = max(0, int(os.getenv('HISTORY_MAX_TOKENS', '2000')))
+
+    # Batch Chat
+    BATCH_CHAT_MAX_ITEMS = int(os.getenv('BATCH_CHAT_MAX_ITEMS', '500'))
+    BATCH_CHAT_CONCURRENCY = int(os.getenv('BATCH_CHAT_CONCURRENCY', '8'))
+
+    # Conversation message pagination
+    MESSAGES_PAGE_SIZE = int(os.getenv('MESSAGES_PAGE_SIZE', '50'))
+    MESSAGES_MAX_PAGE_SIZE = int(os.getenv('MESSAGES_MAX_PAGE_SIZE', '200'))
+
+    # Seconds a cached conversation list ETag is trusted without re-running the query
+    CONVERSATION_LIST_ETAG_TTL = float(os.getenv('CONVERSATION_LIST_ETAG_TTL', '10'))
+
+    # Background title generation
+    TITLE_WORKERS = int(os.getenv('TITLE_WORKERS', '2'))
+    TITLE_DONE_CACHE_SIZE = int(os.getenv('TITLE_DONE_CACHE_SIZE', '10000'))
+
+    # Request threads per worker process (e.g. gunicorn --threads)
+    WORKER_THREADS = int(os.getenv('WORKER_THREADS', '8'))
+
+    # Speculative completion: start the response on the unrefined query while it is refined,
+    # keeping it when the refined query is within this normalized edit distance of the original
+    SPECULATIVE_COMPLETION = os.getenv('SPECULATIVE_COMPLETION', 'False') == 'True'
+    SPECULATION_MAX_DISTANCE = float(os.getenv('SPECULATION_MAX_DISTANCE', '0.1'))
+    SPECULATION_WORKERS = int(os.getenv('SPECULATION_WORKERS', str(max(WORKER_THREADS, BATCH_CHAT_CONCURRENCY))))
+
+    # OpenAI HTTP client (pool leaves room for hedged requests)
+    OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', str(2 * max(WORKER_THREADS, BATCH_CHAT_CONCURRENCY))))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+    OPENAI_TIMEOUTS = {
+        'embedding': float(os.getenv('OPENAI_TIMEOUT_EMBEDDING', '10')),
+        'classification': float(os.getenv('OPENAI_TIMEOUT_CLASSIFICATION', '8')),
+        'refinement': float(os.getenv('OPENAI_TIMEOUT_REFINEMENT', '10')),
+        'response': float(os.getenv('OPENAI_TIMEOUT_RESPONSE', '60')),
+        'background': float(os.getenv('OPENAI_TIMEOUT_BACKGROUND', '30'))
+    }
+
+    # OpenAI retries, hedging and circuit breaker
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+    OPENAI_BACKOFF_BASE = float(os.getenv('OPENAI_BACKOFF_BASE', '0.5'))
+    OPENAI_BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', '8'))
+    OPENAI_HEDGE_CLASSIFICATION = os.getenv('OPENAI_HEDGE_CLASSIFICATION', 'False') == 'True'
+    OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv('OPENAI_HEDGE_MIN_SAMPLES', '20'))
+    OPENAI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('OPENAI_BREAKER_FAILURE_THRESHOLD', '5'))
+    OPENAI_BREAKER_RESET_TIMEOUT = float(os.getenv('OPENAI_BREAKER_RESET_TIMEOUT', '30'))
+
+    # OpenAI client-side rate limits for this process (0 disables a limit)
+    OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+    OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '200000'))
+    OPENAI_RATE_LIMIT_BURST_SECONDS = float(os.getenv('OPENAI_RATE_LIMIT_BURST_SECONDS', '10'))
+
+    # OpenAI Batch API (offline reprocessing)
+    OPENAI_BATCH_BACKEND = os.getenv('OPENAI_BATCH_BACKEND', 'openai')  # 'openai' or 'local'
+    OPENAI_BATCH_BASE_URL = os.getenv('OPENAI_BATCH_BASE_URL')  # Optional local stub of the Batch API
+    BATCH_JOB_DIR = os.getenv('BATCH_JOB_DIR', './batch_jobs')
+    BATCH_JOB_POLL_INTERVAL = int(os.getenv('BATCH_JOB_POLL_INTERVAL', '60'))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Index Conversion for PromptSense
+Rebuilds every FAISS shard with another metric or vector encoding. Converting L2 shards to
+'cosine' stores normalized vectors in inner-product indexes, so search scores become cosine
+similarities that SIMILARITY_MIN_SCORE can cut off. The fp16, sq8 and pq encodings shrink the
+index (sq8 and pq train a codec on a sample of the stored vectors first). Stop the vector
+indexer or vector server first: the conversion needs the shard directory's writer lock
+
+Examples:
+    python convert_index.py
+    python convert_index.py --metric l2
+    python convert_index.py --index-type sq8
+    python convert_index.py --index-type pq --pq-m 96 --train-size 50000
+"""
+
+import sys
+import io
+import argparse
+from services.faiss_service import FAISSService
+from services.vector_shards import INDEX_TYPES
+from config import Config
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS shards with another similarity metric or vector encoding")
+    parser.add_argument('--metric', choices=['cosine', 'l2'], default=Config.FAISS_METRIC, help="Target metric")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default=Config.FAISS_INDEX_TYPE, help="Target vector encoding")
+    parser.add_argument('--train-size', type=int, default=20000, help="Vectors sampled to train sq8/pq codecs")
+    parser.add_argument('--pq-m', type=int, default=Config.FAISS_PQ_M, help="PQ sub-quantizers (bytes per vector); must divide the dimension")
+    return parser.parse_args()
+
+
+def main():
+    """Convert the shard store"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Index Conversion")
+    print("=" * 60)
+    print()
+
+    service = FAISSService(mode='writer')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards (see the log above)")
+        sys.exit(1)
+
+    store = service.store
+    print(f"📦 {Config.FAISS_SHARD_DIR}: {store.total_vectors()} vectors, metric {store.metric}, index type {store.index_type}")
+
+    try:
+        converted = store.convert(args.metric, args.index_type, train_size=args.train_size, pq_m=args.pq_m)
+    except Exception as e:
+        print(f"❌ Conversion failed: {e}")
+        sys.exit(1)
+
+    print(f"✅ Converted {converted} shards to {args.metric} / {args.index_type}")
+    if args.metric != Config.FAISS_METRIC:
+        print(f"⚠️  Set FAISS_METRIC={args.metric} so new stores are created the same way")
+    if args.index_type != Config.FAISS_INDEX_TYPE:
+        print(f"⚠️  Set FAISS_INDEX_TYPE={args.index_type} so new stores are created the same way")
+
+
+if __name__ == '__main__':
+    main()
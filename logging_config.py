@@ -0,0 +1,172 @@
+"""
+Logging setup for PromptSense
+Request threads only put records on a bounded queue; a QueueListener thread writes them to stdout
+and to a size-rotated file of JSON lines, so slow disks never stall a request. Records carry the
+current request id and the stage timings recorded so far with mark_stage()
+"""
+
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+from config import Config
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed with extra= and is written as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+_stages: ContextVar[Optional[Dict]] = ContextVar('stages', default=None)
+
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_request(request_id: str):
+    """Tag this thread's records with request_id and start its stage clock"""
+    _request_id.set(request_id)
+    _stages.set({"_started": time.perf_counter(), "_last": time.perf_counter(), "timings": {}})
+
+
+def end_request() -> Dict[str, float]:
+    """Stop tagging records; returns the stage timings (ms) of the request"""
+    stages = _stages.get()
+    _request_id.set(None)
+    _stages.set(None)
+    return dict(stages["timings"]) if stages else {}
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def mark_stage(name: str):
+    """Record the ms since the previous mark (or the request start) as stage name; no-op outside a request"""
+    stages = _stages.get()
+    if stages is None:
+        return
+    now = time.perf_counter()
+    stages["timings"][name] = round((now - stages["_last"]) * 1000, 2)
+    stages["_last"] = now
+
+
+def request_duration_ms() -> Optional[float]:
+    stages = _stages.get()
+    return round((time.perf_counter() - stages["_started"]) * 1000, 2) if stages else None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request_id, stages and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    QueueHandler that stamps records with the request context in the calling thread and
+    never blocks it: when the queue is full records are dropped and counted
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render the traceback here: they may not survive the thread hop
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = getattr(record, 'request_id', None) or _request_id.get()
+        stages = _stages.get()
+        if stages and stages["timings"] and not hasattr(record, 'stages'):
+            record.stages = dict(stages["timings"])
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self._reported:
+            missed = self.dropped - self._reported
+            self._reported = self.dropped
+            warning = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                        "Dropped %s log records (log queue full)", (missed,), None)
+            try:
+                self.queue.put_nowait(self.prepare(warning))
+            except queue.Full:
+                pass
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'a.b=DEBUG, c=WARNING' -> {'a.b': 'DEBUG', 'c': 'WARNING'}"""
+    levels = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file: Optional[str] = None) -> QueueListener:
+    """Route the root logger through the queue (once per process); returns the running listener"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        text_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        stdout = logging.StreamHandler(sys.stdout)
+        stdout.setFormatter(JSONFormatter() if Config.LOG_FORMAT == 'json' else text_format)
+        handlers = [stdout]
+
+        log_file = log_file if log_file is not None else Config.LOG_FILE
+        if log_file:
+            rotating = RotatingFileHandler(
+                log_file,
+                maxBytes=Config.LOG_MAX_BYTES,
+                backupCount=Config.LOG_BACKUP_COUNT,
+                encoding='utf-8',
+                delay=True
+            )
+            rotating.setFormatter(JSONFormatter())
+            handlers.append(rotating)
+
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(RequestQueueHandler(log_queue))
+        root.setLevel(Config.LOG_LEVEL.upper())
+        for name, level in parse_levels(Config.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(_listener.stop)
+        return _listener
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Migration Runner for PromptSense
+Applies a migration from models/migration_<name>.sql
+
+Usage:
+    python migrate.py user_stats
+"""
+
+import sys
+import io
+import os
+from services.db_service import DatabaseService
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = 'models'
+
+
+def available_migrations():
+    """List migration names found in the models directory"""
+    return sorted(
+        filename[len('migration_'):-len('.sql')]
+        for filename in os.listdir(MIGRATIONS_DIR)
+        if filename.startswith('migration_') and filename.endswith('.sql')
+    )
+
+
+def run_migration(name):
+    """Run one migration in a single transaction"""
+    path = os.path.join(MIGRATIONS_DIR, f"migration_{name}.sql")
+    if not os.path.exists(path):
+        print(f"❌ Unknown migration '{name}'. Available: {', '.join(available_migrations())}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"PromptSense Migration: {name}")
+    print("=" * 60)
+    print()
+
+    try:
+        db = DatabaseService()
+        conn = db.get_connection()
+        cur = conn.cursor()
+
+        print("📊 Reading migration SQL...")
+        with open(path, 'r', encoding='utf-8') as f:
+            migration_sql = f.read()
+
+        print("🔄 Running migration...")
+        cur.execute(migration_sql)
+        conn.commit()
+
+        print("✅ Migration completed successfully!")
+        print()
+
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        logger.exception("Migration error")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f"Usage: python migrate.py <name>  (available: {', '.join(available_migrations())})")
+        sys.exit(1)
+    run_migration(sys.argv[1])
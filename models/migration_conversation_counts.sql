@@ -0,0 +1,73 @@
+-- Migration: Denormalized Conversation Counts
+-- Stores message_count and last_message_preview on conversations so the sidebar
+-- query no longer joins and aggregates every message of every conversation.
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS last_message_preview TEXT;
+
+-- Replace the timestamp trigger function: it now also maintains the counts and preview
+CREATE OR REPLACE FUNCTION update_conversation_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE conversations
+        SET updated_at = CURRENT_TIMESTAMP,
+            message_count = message_count + 1,
+            last_message_preview = LEFT(NEW.content, 200)
+        WHERE id = NEW.conversation_id;
+        RETURN NEW;
+    END IF;
+
+    UPDATE conversations
+    SET message_count = GREATEST(message_count - 1, 0),
+        last_message_preview = (
+            SELECT LEFT(content, 200)
+            FROM messages
+            WHERE conversation_id = OLD.conversation_id
+            ORDER BY id DESC
+            LIMIT 1
+        )
+    WHERE id = OLD.conversation_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block message writes while the triggers are replaced and counts are backfilled
+LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_timestamp ON messages;
+CREATE TRIGGER trigger_update_conversation_timestamp
+    AFTER INSERT ON messages
+    FOR EACH ROW
+    WHEN (NEW.conversation_id IS NOT NULL)
+    EXECUTE FUNCTION update_conversation_timestamp();
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_counts_delete ON messages;
+CREATE TRIGGER trigger_update_conversation_counts_delete
+    AFTER DELETE ON messages
+    FOR EACH ROW
+    WHEN (OLD.conversation_id IS NOT NULL)
+    EXECUTE FUNCTION update_conversation_timestamp();
+
+-- Backfill counts and previews
+UPDATE conversations c
+SET message_count = s.message_count,
+    last_message_preview = s.last_message_preview
+FROM (
+    SELECT conversation_id,
+           COUNT(*) AS message_count,
+           (array_agg(LEFT(content, 200) ORDER BY id DESC))[1] AS last_message_preview
+    FROM messages
+    WHERE conversation_id IS NOT NULL
+    GROUP BY conversation_id
+) s
+WHERE c.id = s.conversation_id;
+
+-- Covering index for the sidebar query (supersedes the plain user_id index)
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+    ON conversations(user_id, updated_at DESC)
+    INCLUDE (id, title, created_at, message_count, last_message_preview);
+DROP INDEX IF EXISTS idx_conversations_user_id;
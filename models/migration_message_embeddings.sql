@@ -0,0 +1,14 @@
+-- Migration: Message Embeddings
+-- Compact copies (float16 bytes) of the user message embeddings, written with the message
+-- when EMBEDDINGS_IN_DB=True, so rebuild_vectors.py can recreate the FAISS shards without
+-- calling the embeddings API again.
+
+CREATE TABLE IF NOT EXISTS message_embeddings (
+    message_id INTEGER PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    dimension INTEGER NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- float16 bytes barely compress; skip the compression attempt on every write
+ALTER TABLE message_embeddings ALTER COLUMN embedding SET STORAGE EXTERNAL;
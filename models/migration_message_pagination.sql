@@ -0,0 +1,6 @@
+-- Migration: Cursor-Paginated Conversation Messages
+-- Keyset pagination walks (conversation_id, id) newest-first; this index serves
+-- both directions and supersedes the plain conversation_id index.
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_id ON messages(conversation_id, id);
+DROP INDEX IF EXISTS idx_messages_conversation_id;
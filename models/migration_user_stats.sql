@@ -0,0 +1,122 @@
+-- Migration: Per-User Statistics
+-- Keeps message totals, intent/domain counters and vector counts per user.
+-- Triggers maintain the counters in the same transaction as every message write,
+-- so /api/chat/insights becomes a single primary key lookup.
+
+-- Create user_stats table
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    vector_count INTEGER NOT NULL DEFAULT 0,
+    intent_counts JSONB NOT NULL DEFAULT '{}',
+    domain_counts JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add delta to one key of a JSONB counter object (keys that reach zero are dropped)
+CREATE OR REPLACE FUNCTION jsonb_counter_add(counters JSONB, counter_key TEXT, delta INTEGER)
+RETURNS JSONB AS $$
+DECLARE
+    new_value INTEGER;
+BEGIN
+    IF counter_key IS NULL THEN
+        RETURN counters;
+    END IF;
+    new_value := COALESCE((counters ->> counter_key)::INTEGER, 0) + delta;
+    IF new_value <= 0 THEN
+        RETURN counters - counter_key;
+    END IF;
+    RETURN jsonb_set(counters, ARRAY[counter_key], to_jsonb(new_value));
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Remove the old row's contribution and add the new row's contribution
+CREATE OR REPLACE FUNCTION update_user_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        UPDATE user_stats
+        SET total_messages = total_messages - 1,
+            vector_count = vector_count - CASE WHEN OLD.vector_saved THEN 1 ELSE 0 END,
+            intent_counts = jsonb_counter_add(intent_counts, OLD.intent, -1),
+            domain_counts = jsonb_counter_add(domain_counts, OLD.domain, -1),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+        INSERT INTO user_stats (user_id, total_messages, vector_count, intent_counts, domain_counts)
+        VALUES (
+            NEW.user_id,
+            1,
+            CASE WHEN NEW.vector_saved THEN 1 ELSE 0 END,
+            jsonb_counter_add('{}', NEW.intent, 1),
+            jsonb_counter_add('{}', NEW.domain, 1)
+        )
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_messages = user_stats.total_messages + 1,
+            vector_count = user_stats.vector_count + EXCLUDED.vector_count,
+            intent_counts = jsonb_counter_add(user_stats.intent_counts, NEW.intent, 1),
+            domain_counts = jsonb_counter_add(user_stats.domain_counts, NEW.domain, 1),
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block message writes while the triggers are installed and the table is backfilled
+LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_user_stats_insert_delete ON messages;
+CREATE TRIGGER trigger_user_stats_insert_delete
+    AFTER INSERT OR DELETE ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_stats();
+
+DROP TRIGGER IF EXISTS trigger_user_stats_update ON messages;
+CREATE TRIGGER trigger_user_stats_update
+    AFTER UPDATE OF user_id, intent, domain, vector_saved ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_stats();
+
+-- Backfill counters from existing messages
+INSERT INTO user_stats (user_id, total_messages, vector_count, intent_counts, domain_counts)
+SELECT
+    totals.user_id,
+    totals.total_messages,
+    totals.vector_count,
+    COALESCE(intents.counts, '{}'),
+    COALESCE(domains.counts, '{}')
+FROM (
+    SELECT user_id, COUNT(*) AS total_messages, COUNT(*) FILTER (WHERE vector_saved) AS vector_count
+    FROM messages
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+) totals
+LEFT JOIN (
+    SELECT user_id, jsonb_object_agg(intent, count) AS counts
+    FROM (
+        SELECT user_id, intent, COUNT(*) AS count
+        FROM messages
+        WHERE user_id IS NOT NULL AND intent IS NOT NULL
+        GROUP BY user_id, intent
+    ) per_intent
+    GROUP BY user_id
+) intents ON intents.user_id = totals.user_id
+LEFT JOIN (
+    SELECT user_id, jsonb_object_agg(domain, count) AS counts
+    FROM (
+        SELECT user_id, domain, COUNT(*) AS count
+        FROM messages
+        WHERE user_id IS NOT NULL AND domain IS NOT NULL
+        GROUP BY user_id, domain
+    ) per_domain
+    GROUP BY user_id
+) domains ON domains.user_id = totals.user_id
+ON CONFLICT (user_id) DO UPDATE
+SET total_messages = EXCLUDED.total_messages,
+    vector_count = EXCLUDED.vector_count,
+    intent_counts = EXCLUDED.intent_counts,
+    domain_counts = EXCLUDED.domain_counts,
+    updated_at = CURRENT_TIMESTAMP;
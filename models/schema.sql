@@ -13,10 +13,22 @@ CREATE TABLE IF NOT EXISTS users (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Conversations table (message_count and last_message_preview are maintained by triggers)
+CREATE TABLE IF NOT EXISTS conversations (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    title TEXT DEFAULT 'New Conversation',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_preview TEXT
+);
+
 -- Messages table
 CREATE TABLE IF NOT EXISTS messages (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id INTEGER REFERENCES conversations(id) ON DELETE CASCADE,
     role TEXT NOT NULL CHECK (role IN ('user', 'assistant', 'system')),
     content TEXT NOT NULL,
     original_prompt TEXT,
@@ -32,6 +44,137 @@ CREATE TABLE IF NOT EXISTS messages (
 CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages(user_id);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_messages_vector_saved ON messages(vector_saved);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_id ON messages(conversation_id, id);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+    ON conversations(user_id, updated_at DESC)
+    INCLUDE (id, title, created_at, message_count, last_message_preview);
+
+-- Keep updated_at, message_count and last_message_preview of conversations current
+CREATE OR REPLACE FUNCTION update_conversation_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE conversations
+        SET updated_at = CURRENT_TIMESTAMP,
+            message_count = message_count + 1,
+            last_message_preview = LEFT(NEW.content, 200)
+        WHERE id = NEW.conversation_id;
+        RETURN NEW;
+    END IF;
+
+    UPDATE conversations
+    SET message_count = GREATEST(message_count - 1, 0),
+        last_message_preview = (
+            SELECT LEFT(content, 200)
+            FROM messages
+            WHERE conversation_id = OLD.conversation_id
+            ORDER BY id DESC
+            LIMIT 1
+        )
+    WHERE id = OLD.conversation_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_timestamp ON messages;
+CREATE TRIGGER trigger_update_conversation_timestamp
+    AFTER INSERT ON messages
+    FOR EACH ROW
+    WHEN (NEW.conversation_id IS NOT NULL)
+    EXECUTE FUNCTION update_conversation_timestamp();
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_counts_delete ON messages;
+CREATE TRIGGER trigger_update_conversation_counts_delete
+    AFTER DELETE ON messages
+    FOR EACH ROW
+    WHEN (OLD.conversation_id IS NOT NULL)
+    EXECUTE FUNCTION update_conversation_timestamp();
+
+-- Per-user message, intent/domain and vector counters, maintained by triggers
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_messages INTEGER NOT NULL DEFAULT 0,
+    vector_count INTEGER NOT NULL DEFAULT 0,
+    intent_counts JSONB NOT NULL DEFAULT '{}',
+    domain_counts JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add delta to one key of a JSONB counter object (keys that reach zero are dropped)
+CREATE OR REPLACE FUNCTION jsonb_counter_add(counters JSONB, counter_key TEXT, delta INTEGER)
+RETURNS JSONB AS $$
+DECLARE
+    new_value INTEGER;
+BEGIN
+    IF counter_key IS NULL THEN
+        RETURN counters;
+    END IF;
+    new_value := COALESCE((counters ->> counter_key)::INTEGER, 0) + delta;
+    IF new_value <= 0 THEN
+        RETURN counters - counter_key;
+    END IF;
+    RETURN jsonb_set(counters, ARRAY[counter_key], to_jsonb(new_value));
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Remove the old row's contribution and add the new row's contribution
+CREATE OR REPLACE FUNCTION update_user_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        UPDATE user_stats
+        SET total_messages = total_messages - 1,
+            vector_count = vector_count - CASE WHEN OLD.vector_saved THEN 1 ELSE 0 END,
+            intent_counts = jsonb_counter_add(intent_counts, OLD.intent, -1),
+            domain_counts = jsonb_counter_add(domain_counts, OLD.domain, -1),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+        INSERT INTO user_stats (user_id, total_messages, vector_count, intent_counts, domain_counts)
+        VALUES (
+            NEW.user_id,
+            1,
+            CASE WHEN NEW.vector_saved THEN 1 ELSE 0 END,
+            jsonb_counter_add('{}', NEW.intent, 1),
+            jsonb_counter_add('{}', NEW.domain, 1)
+        )
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_messages = user_stats.total_messages + 1,
+            vector_count = user_stats.vector_count + EXCLUDED.vector_count,
+            intent_counts = jsonb_counter_add(user_stats.intent_counts, NEW.intent, 1),
+            domain_counts = jsonb_counter_add(user_stats.domain_counts, NEW.domain, 1),
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_user_stats_insert_delete ON messages;
+CREATE TRIGGER trigger_user_stats_insert_delete
+    AFTER INSERT OR DELETE ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_stats();
+
+DROP TRIGGER IF EXISTS trigger_user_stats_update ON messages;
+CREATE TRIGGER trigger_user_stats_update
+    AFTER UPDATE OF user_id, intent, domain, vector_saved ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_stats();
+
+-- float16 copies of user message embeddings (written when EMBEDDINGS_IN_DB=True, read by rebuild_vectors.py)
+CREATE TABLE IF NOT EXISTS message_embeddings (
+    message_id INTEGER PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    dimension INTEGER NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- float16 bytes barely compress; skip the compression attempt on every write
+ALTER TABLE message_embeddings ALTER COLUMN embedding SET STORAGE EXTERNAL;
 
 -- Insert demo users
 INSERT INTO users (id, email, name, preferences) VALUES
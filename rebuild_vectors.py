@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vector Rebuild for PromptSense
+Recreates the FAISS shards from the message_embeddings table (EMBEDDINGS_IN_DB=True) without
+calling the embeddings API. Rows are streamed with a server-side cursor and added in bulk one
+chunk at a time, so memory stays bounded by the chunk size and the shard budget
+
+The shards are written to FAISS_SHARD_DIR; point it at an empty directory to build a fresh store
+next to the live one. Any index type can be produced: sq8 and pq codecs are trained on the
+rebuilt vectors at the end. Stop the vector indexer or vector server first: the rebuild needs
+the shard directory's writer lock
+
+Examples:
+    python rebuild_vectors.py
+    python rebuild_vectors.py --index-type sq8
+    python rebuild_vectors.py --after-id 250000 --chunk-rows 20000
+"""
+
+import sys
+import io
+import os
+import argparse
+from services.db_service import DatabaseService
+from services.faiss_service import FAISSService
+from services.vector_shards import CODEC_FILE, INDEX_TYPES, TRAINED_INDEX_TYPES
+from config import Config
+import numpy as np  # type: ignore
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS shards from the message_embeddings table")
+    parser.add_argument('--metric', choices=['cosine', 'l2'], default=Config.FAISS_METRIC, help="Target metric")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default=Config.FAISS_INDEX_TYPE, help="Target vector encoding")
+    parser.add_argument('--train-size', type=int, default=20000, help="Vectors sampled to train sq8/pq codecs")
+    parser.add_argument('--pq-m', type=int, default=Config.FAISS_PQ_M, help="PQ sub-quantizers (bytes per vector); must divide the dimension")
+    parser.add_argument('--chunk-rows', type=int, default=10000, help="Rows decoded and added per bulk add")
+    parser.add_argument('--after-id', type=int, default=0, help="Only rebuild messages with a larger id (resume)")
+    return parser.parse_args()
+
+
+def unpack_chunk(rows, dimension):
+    """One float32 matrix for a chunk of (..., dimension, float16 bytes) rows"""
+    blob = b''.join(bytes(row[6]) for row in rows)
+    return np.frombuffer(blob, dtype='<f2').reshape(len(rows), dimension).astype(np.float32)
+
+
+def add_chunk(service, db, rows):
+    """Bulk add one chunk of embedding rows and mark their messages as indexed"""
+    vectors = unpack_chunk(rows, service.dimension)
+    entries = [
+        {
+            "vector": vector,
+            "message_id": message_id,
+            "user_id": user_id,
+            "text": content,
+            "intent": intent,
+            "domain": domain
+        }
+        for (message_id, user_id, content, intent, domain, _, _), vector in zip(rows, vectors)
+    ]
+    service.apply_operations([{"op": "add", "entries": entries}])
+    db.mark_vectors_saved([entry["message_id"] for entry in entries])
+
+
+def main():
+    """Rebuild the shard store from the database"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Vector Rebuild")
+    print("=" * 60)
+    print()
+
+    if not Config.DATABASE_URL:
+        print("❌ ERROR: DATABASE_URL not configured in .env file")
+        sys.exit(1)
+
+    service = FAISSService(mode='writer')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards for writing (see the log above)")
+        sys.exit(1)
+
+    db = DatabaseService()
+    total = db.count_message_embeddings()
+    store = service.store
+    print(f"📦 {total} stored embeddings -> {Config.FAISS_SHARD_DIR} ({store.total_vectors()} vectors now)")
+
+    added = skipped = 0
+    chunk = []
+    try:
+        for row in db.iter_message_embeddings(after_id=args.after_id, chunk_size=args.chunk_rows):
+            if row[5] != service.dimension:
+                skipped += 1
+                continue
+            chunk.append(row)
+            if len(chunk) >= args.chunk_rows:
+                add_chunk(service, db, chunk)
+                added += len(chunk)
+                chunk = []
+                print(f"   {added}/{total} vectors (last message {row[0]})")
+        if chunk:
+            add_chunk(service, db, chunk)
+            added += len(chunk)
+        service.save_index()
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        # Keep what was added; adds replace by message_id, so resuming from the last reported id is safe
+        service.save_index()
+        print("   Resume with --after-id <last message id above>")
+        sys.exit(1)
+
+    print(f"✅ Added {added} vectors" + (f", skipped {skipped} with another dimension" if skipped else ""))
+
+    # Trained encodings need a codec fitted on the rebuilt vectors
+    codec_missing = args.index_type in TRAINED_INDEX_TYPES and not os.path.exists(os.path.join(Config.FAISS_SHARD_DIR, CODEC_FILE))
+    if store.metric != args.metric or store.index_type != args.index_type or codec_missing:
+        print(f"🔄 Converting to {args.metric} / {args.index_type}...")
+        try:
+            converted = store.convert(args.metric, args.index_type, train_size=args.train_size, pq_m=args.pq_m)
+        except Exception as e:
+            print(f"❌ Conversion failed: {e}")
+            sys.exit(1)
+        print(f"✅ Converted {converted} shards")
+
+    print(f"📦 The store now holds {store.total_vectors()} vectors")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify
-from services.prompt_engine import PromptEngine
+from services.prompt_engine import get_prompt_engine
+from services.faiss_service import get_faiss_service
+from services.openai_service import get_openai_service
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
 chat_bp = Blueprint('chat', __name__)
-prompt_engine = PromptEngine()
 
 
 @chat_bp.route('/api/chat', methods=['POST'])
@@ -33,12 +35,70 @@ def chat():
             }), 400
 
         # Process message through prompt engine
-        result = prompt_engine.process_user_message(user_id, message, conversation_id)
+        result = get_prompt_engine().process_user_message(user_id, message, conversation_id)
 
         return jsonify(result), 200
 
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.error("Error in chat endpoint: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+
+@chat_bp.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Batch chat endpoint for processing many prompts in one request"""
+    try:
+        data = request.get_json()
+
+        # Validate input
+        if not data or not isinstance(data.get('items'), list) or not data['items']:
+            return jsonify({
+                "success": False,
+                "error": "Items are required"
+            }), 400
+
+        items = data['items']
+        if len(items) > Config.BATCH_CHAT_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {Config.BATCH_CHAT_MAX_ITEMS} items are allowed per batch"
+            }), 400
+
+        # Invalid items get a per-item error instead of failing the whole batch
+        results = [None] * len(items)
+        valid_items = []
+        positions = []
+        for position, item in enumerate(items):
+            message = item.get('message') if isinstance(item, dict) else None
+            if not isinstance(message, str) or not message.strip():
+                results[position] = {
+                    "success": False,
+                    "error": "Message cannot be empty"
+                }
+                continue
+
+            valid_items.append({
+                "user_id": item.get('user_id', 1),  # Default to demo user
+                "message": message,
+                "conversation_id": item.get('conversation_id')
+            })
+            positions.append(position)
+
+        # Process valid items through the batch pipeline
+        for position, result in zip(positions, get_prompt_engine().process_batch(valid_items)):
+            results[position] = result
+
+        return jsonify({
+            "success": True,
+            "results": results,
+            "count": len(results)
+        }), 200
+
+    except Exception as e:
+        logger.error("Error in batch chat endpoint: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -49,14 +109,14 @@ def chat():
 def get_insights(user_id):
     """Get user insights and analytics"""
     try:
-        insights = prompt_engine.get_user_insights(user_id)
+        insights = get_prompt_engine().get_user_insights(user_id)
         return jsonify({
             "success": True,
             "insights": insights
         }), 200
 
     except Exception as e:
-        logger.error(f"Error getting insights: {e}")
+        logger.error("Error getting insights: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -67,14 +127,50 @@ def get_insights(user_id):
 def faiss_stats():
     """Get FAISS index statistics"""
     try:
-        stats = prompt_engine.faiss.get_index_stats()
+        stats = get_faiss_service().get_index_stats()
+        return jsonify({
+            "success": True,
+            "stats": stats
+        }), 200
+
+    except Exception as e:
+        logger.error("Error getting FAISS stats: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+
+@chat_bp.route('/api/chat/speculation-stats', methods=['GET'])
+def speculation_stats():
+    """Get speculative completion hit rate and latency saved"""
+    try:
+        stats = get_prompt_engine().get_speculation_stats()
+        return jsonify({
+            "success": True,
+            "stats": stats
+        }), 200
+
+    except Exception as e:
+        logger.error("Error getting speculation stats: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+
+@chat_bp.route('/api/chat/openai-stats', methods=['GET'])
+def openai_stats():
+    """Get OpenAI client health, retry counters and latency statistics"""
+    try:
+        stats = get_openai_service().get_stats()
         return jsonify({
             "success": True,
             "stats": stats
         }), 200
 
     except Exception as e:
-        logger.error(f"Error getting FAISS stats: {e}")
+        logger.error("Error getting OpenAI stats: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -1,13 +1,27 @@
-from flask import Blueprint, request, jsonify
-from services.db_service import DatabaseService
-from services.openai_service import OpenAIService
+from flask import Blueprint, current_app, request, jsonify, Response
+from itertools import chain
+from services.db_service import GENERIC_CONVERSATION_TITLES, get_db_service
+from services.conversation_cache import conversation_list_cache
+from services.title_service import get_title_service
+from services.faiss_service import get_faiss_service
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
 conversations_bp = Blueprint('conversations', __name__)
-db_service = DatabaseService()
-openai_service = OpenAIService()
+db_service = get_db_service()
+
+
+def _matching_etag(etag):
+    """
+    The If-None-Match tag that matches etag, as sent by the client
+    Compressed responses carry the tag with the encoding appended ("<etag>:br")
+    """
+    for candidate in [etag] + [f"{etag}:{algorithm.strip()}" for algorithm in Config.COMPRESS_ALGORITHM.split(',')]:
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
 
 
 @conversations_bp.route('/api/conversations/new', methods=['POST'])
@@ -33,7 +47,7 @@ def create_conversation():
             }), 500
 
     except Exception as e:
-        logger.error(f"Error creating conversation: {e}")
+        logger.error("Error creating conversation: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -42,17 +56,36 @@ def create_conversation():
 
 @conversations_bp.route('/api/conversations/<int:user_id>', methods=['GET'])
 def get_conversations(user_id):
-    """Get all conversations for a user"""
+    """
+    Get all conversations for a user
+    Supports If-None-Match: an unchanged list returns 304 without querying the database
+    """
     try:
+        cached_etag = conversation_list_cache.get(user_id)
+        client_etag = _matching_etag(cached_etag) if cached_etag else None
+        if client_etag:
+            response = Response(status=304)
+            response.set_etag(client_etag)
+            response.cache_control.no_cache = True
+            return response
+
+        token = conversation_list_cache.begin(user_id)
         conversations = db_service.get_user_conversations(user_id)
 
-        return jsonify({
+        response = jsonify({
             "success": True,
             "conversations": conversations
-        }), 200
+        })
+        response.add_etag()
+        response.cache_control.no_cache = True
+        # Empty lists are cheap to rebuild and may come from a failed query, so they are not cached
+        if conversations:
+            conversation_list_cache.set(user_id, response.get_etag()[0], token)
+
+        return response.make_conditional(request)
 
     except Exception as e:
-        logger.error(f"Error fetching conversations: {e}")
+        logger.error("Error fetching conversations: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -61,18 +94,92 @@ def get_conversations(user_id):
 
 @conversations_bp.route('/api/conversations/<int:conversation_id>/messages', methods=['GET'])
 def get_conversation_messages(conversation_id):
-    """Get all messages in a conversation"""
+    """
+    Get one page of messages in a conversation, newest page first
+    Pass the returned next_cursor as ?before= to load older messages
+    """
+    try:
+        # Get pagination parameters
+        limit = request.args.get('limit', Config.MESSAGES_PAGE_SIZE, type=int)
+        before = request.args.get('before', type=int)
+        include_enhanced = request.args.get('include_enhanced', 'false').lower() == 'true'
+
+        # Validate parameters
+        if limit > Config.MESSAGES_MAX_PAGE_SIZE:
+            limit = Config.MESSAGES_MAX_PAGE_SIZE
+        if limit < 1:
+            limit = 1
+
+        page = db_service.get_conversation_messages_page(
+            conversation_id,
+            before_id=before,
+            limit=limit,
+            include_enhanced=include_enhanced
+        )
+
+        return jsonify({
+            "success": True,
+            "messages": page["messages"],
+            "count": len(page["messages"]),
+            "has_more": page["has_more"],
+            "next_cursor": page["next_cursor"]
+        }), 200
+
+    except Exception as e:
+        logger.error("Error fetching conversation messages: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+
+@conversations_bp.route('/api/conversations/<int:conversation_id>/messages/all', methods=['GET'])
+def stream_conversation_messages(conversation_id):
+    """
+    Stream every message of a conversation, oldest first, without building the list in memory
+    Rows come from a server-side cursor and are serialized in batches; the body ends with
+    count and complete (false, with an error, if the stream broke off)
+    """
+    try:
+        include_enhanced = request.args.get('include_enhanced', 'false').lower() == 'true'
+        messages = db_service.iter_conversation_messages(conversation_id, include_enhanced=include_enhanced)
+
+        # Run the query before the 200 goes out so connection errors still get a 500
+        first = next(messages, None)
+        rows = chain([first], messages) if first is not None else iter(())
+
+        return Response(
+            current_app.json.stream_list({"success": True, "conversation_id": conversation_id}, "messages", rows),
+            mimetype='application/json'
+        )
+
+    except Exception as e:
+        logger.error("Error streaming conversation messages: %s", e)
+        return jsonify({
+            "success": False,
+            "error": "Internal server error"
+        }), 500
+
+
+@conversations_bp.route('/api/conversations/<int:conversation_id>/messages/<int:message_id>/details', methods=['GET'])
+def get_message_details(conversation_id, message_id):
+    """Get the original/enhanced prompt and metadata of a single message"""
     try:
-        messages = db_service.get_conversation_messages(conversation_id)
+        details = db_service.get_message_details(conversation_id, message_id)
+
+        if not details:
+            return jsonify({
+                "success": False,
+                "error": "Message not found"
+            }), 404
 
         return jsonify({
             "success": True,
-            "messages": messages,
-            "count": len(messages)
+            "message": details
         }), 200
 
     except Exception as e:
-        logger.error(f"Error fetching conversation messages: {e}")
+        logger.error("Error fetching message details: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -107,7 +214,7 @@ def update_conversation_title(conversation_id):
             }), 500
 
     except Exception as e:
-        logger.error(f"Error updating conversation title: {e}")
+        logger.error("Error updating conversation title: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -116,69 +223,34 @@ def update_conversation_title(conversation_id):
 
 @conversations_bp.route('/api/conversations/<int:conversation_id>/generate-title', methods=['POST'])
 def generate_conversation_title(conversation_id):
-    """Auto-generate a title for the conversation based on its messages"""
+    """
+    Return the current conversation title immediately
+    A generic title triggers (deduplicated) background generation from the first user message
+    """
     try:
-        # Get first few messages
-        messages = db_service.get_conversation_messages(conversation_id)
-
-        if not messages:
-            return jsonify({
-                "success": False,
-                "error": "No messages found in conversation"
-            }), 404
-
-        # Get first user message
-        first_user_message = next((m for m in messages if m['role'] == 'user'), None)
+        conversation = db_service.get_conversation(conversation_id)
 
-        if not first_user_message:
+        if not conversation:
             return jsonify({
                 "success": False,
-                "error": "No user messages found"
+                "error": "Conversation not found"
             }), 404
 
-        # Generate title using OpenAI
-        try:
-            response = openai_service.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Generate a short, concise title (3-6 words max) for a conversation based on the first message. Return ONLY the title, nothing else."
-                    },
-                    {
-                        "role": "user",
-                        "content": first_user_message['content']
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=20
-            )
-            content = response.choices[0].message.content
-            if content:
-                title = content.strip().strip('"\'')
-            else:
-                title = first_user_message['content'][:50] + ('...' if len(first_user_message['content']) > 50 else '')
-        except:
-            # Fallback: use first 50 chars of message
-            title = first_user_message['content'][:50] + ('...' if len(first_user_message['content']) > 50 else '')
-
-        # Update the conversation title
-        success = db_service.update_conversation_title(conversation_id, title)
+        pending = False
+        if conversation['title'] in GENERIC_CONVERSATION_TITLES:
+            title_service = get_title_service()
+            title_service.schedule(conversation_id)
+            pending = title_service.is_pending(conversation_id)
 
-        if success:
-            return jsonify({
-                "success": True,
-                "conversation_id": conversation_id,
-                "title": title
-            }), 200
-        else:
-            return jsonify({
-                "success": False,
-                "error": "Failed to update title"
-            }), 500
+        return jsonify({
+            "success": True,
+            "conversation_id": conversation_id,
+            "title": conversation['title'],
+            "pending": pending
+        }), 200
 
     except Exception as e:
-        logger.error(f"Error generating conversation title: {e}")
+        logger.error("Error generating conversation title: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -189,9 +261,11 @@ def generate_conversation_title(conversation_id):
 def delete_conversation(conversation_id):
     """Delete a conversation"""
     try:
-        success = db_service.delete_conversation(conversation_id)
+        deleted = db_service.delete_conversation(conversation_id)
 
-        if success:
+        if deleted is not None:
+            if deleted["vector_message_ids"]:
+                get_faiss_service().remove_vectors(deleted["user_id"], deleted["vector_message_ids"])
             return jsonify({
                 "success": True,
                 "message": "Conversation deleted"
@@ -203,7 +277,7 @@ def delete_conversation(conversation_id):
             }), 500
 
     except Exception as e:
-        logger.error(f"Error deleting conversation: {e}")
+        logger.error("Error deleting conversation: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -1,11 +1,11 @@
 from flask import Blueprint, request, jsonify
-from services.db_service import DatabaseService
+from services.db_service import get_db_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 history_bp = Blueprint('history', __name__)
-db_service = DatabaseService()
+db_service = get_db_service()
 
 
 @history_bp.route('/api/history/<int:user_id>', methods=['GET'])
@@ -33,7 +33,7 @@ def get_history(user_id):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error fetching history: {e}")
+        logger.error("Error fetching history: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -54,7 +54,7 @@ def get_recent_context(user_id):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error fetching recent context: {e}")
+        logger.error("Error fetching recent context: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -63,7 +63,7 @@ def get_recent_context(user_id):
 
 @history_bp.route('/api/user/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    """Get user profile"""
+    """Get user profile (with an ETag; If-None-Match gets a 304)"""
     try:
         user = db_service.get_user(user_id)
 
@@ -73,13 +73,16 @@ def get_user(user_id):
                 "error": "User not found"
             }), 404
 
-        return jsonify({
+        response = jsonify({
             "success": True,
             "user": user
-        }), 200
+        })
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     except Exception as e:
-        logger.error(f"Error fetching user: {e}")
+        logger.error("Error fetching user: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -88,7 +91,7 @@ def get_user(user_id):
 
 @history_bp.route('/api/users', methods=['GET'])
 def get_users():
-    """Get all demo users"""
+    """Get all demo users (with an ETag; If-None-Match gets a 304)"""
     try:
         with db_service.get_connection() as conn:
             with conn.cursor() as cur:
@@ -104,13 +107,16 @@ def get_users():
                         "preferences": user[3]
                     })
 
-                return jsonify({
+                response = jsonify({
                     "success": True,
                     "users": user_list
-                }), 200
+                })
+                response.add_etag()
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
 
     except Exception as e:
-        logger.error(f"Error fetching users: {e}")
+        logger.error("Error fetching users: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -1,24 +1,27 @@
 from flask import Blueprint, request, jsonify
-from services.db_service import DatabaseService
+from services.db_service import get_db_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 users_bp = Blueprint('users', __name__)
-db_service = DatabaseService()
+db_service = get_db_service()
 
 
 @users_bp.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    """Get user information and preferences"""
+    """Get user information and preferences (with an ETag; If-None-Match gets a 304)"""
     try:
         user = db_service.get_user(user_id)
 
         if user:
-            return jsonify({
+            response = jsonify({
                 "success": True,
                 "user": user
-            }), 200
+            })
+            response.add_etag()
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
         else:
             return jsonify({
                 "success": False,
@@ -26,7 +29,7 @@ def get_user(user_id):
             }), 404
 
     except Exception as e:
-        logger.error(f"Error fetching user: {e}")
+        logger.error("Error fetching user: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
@@ -96,7 +99,7 @@ def update_preferences(user_id):
             }), 500
 
     except Exception as e:
-        logger.error(f"Error updating preferences: {e}")
+        logger.error("Error updating preferences: %s", e)
         return jsonify({
             "success": False,
             "error": "Internal server error"
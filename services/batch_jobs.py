@@ -0,0 +1,255 @@
+from openai import OpenAI
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+from services.db_service import DatabaseService
+from services.openai_service import OpenAIService
+from config import Config
+import logging
+import json
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Batch API limit on requests per input file
+MAX_REQUESTS_PER_FILE = 50000
+
+# Rows written per UPDATE ... FROM (VALUES ...) statement
+APPLY_CHUNK_SIZE = 1000
+
+# Batch statuses after which no more polling is needed
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+JOB_KINDS = ('intent', 'domain', 'title')
+
+
+class OpenAIBatchBackend:
+    """Submits JSONL request files through the OpenAI Batch API"""
+
+    def __init__(self):
+        # A base URL override lets the Batch API be replaced by a local stub server
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BATCH_BASE_URL)
+
+    def submit(self, jsonl_path: str) -> str:
+        """Upload a request file and create a batch for it"""
+        with open(jsonl_path, 'rb') as f:
+            batch_file = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h'
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Tuple[str, Optional[str]]:
+        """Return the batch status and its output file id once available"""
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status, batch.output_file_id
+
+    def download(self, output_file_id: str) -> Iterator[str]:
+        """Yield the lines of a batch output file"""
+        content = self.client.files.content(output_file_id)
+        for line in content.text.splitlines():
+            if line.strip():
+                yield line
+
+
+class LocalBatchBackend:
+    """
+    Runs request files synchronously through the regular chat completions endpoint
+    Produces Batch API shaped output so the rest of the job runs unchanged
+    """
+
+    def __init__(self, openai_service: OpenAIService, job_dir: str):
+        self.openai = openai_service
+        self.job_dir = job_dir
+
+    def submit(self, jsonl_path: str) -> str:
+        """Execute every request in the file and store the output locally"""
+        batch_id = f"local_{uuid.uuid4().hex}"
+        output_path = os.path.join(self.job_dir, f"{batch_id}_output.jsonl")
+
+        with open(jsonl_path, 'r', encoding='utf-8') as src, open(output_path, 'w', encoding='utf-8') as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                record = {"id": uuid.uuid4().hex, "custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    response = self.openai.chat_completion('background', **request["body"])
+                    record["response"] = {"status_code": 200, "body": response.model_dump()}
+                except Exception as e:
+                    record["error"] = {"message": str(e)}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        return batch_id
+
+    def status(self, batch_id: str) -> Tuple[str, Optional[str]]:
+        """Local batches complete during submit"""
+        return 'completed', batch_id
+
+    def download(self, output_file_id: str) -> Iterator[str]:
+        """Yield the lines of a locally stored output file"""
+        output_path = os.path.join(self.job_dir, f"{output_file_id}_output.jsonl")
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+class BatchJobRunner:
+    """Offline re-classification and re-titling through the OpenAI Batch API"""
+
+    def __init__(self, backend: Optional[str] = None):
+        self.db = DatabaseService()
+        self.openai = OpenAIService()
+        self.job_dir = Config.BATCH_JOB_DIR
+        os.makedirs(self.job_dir, exist_ok=True)
+
+        backend = backend or Config.OPENAI_BATCH_BACKEND
+        if backend == 'local':
+            self.backend = LocalBatchBackend(self.openai, self.job_dir)
+        else:
+            self.backend = OpenAIBatchBackend()
+
+    def build_requests(
+        self,
+        kinds: Iterable[str],
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        all_titles: bool = False
+    ) -> Iterator[Dict]:
+        """Yield Batch API request lines built from the messages and conversations tables"""
+        kinds = set(kinds)
+
+        if kinds & {'intent', 'domain'}:
+            for message in self.db.iter_user_messages(since=since, limit=limit):
+                if 'intent' in kinds:
+                    yield self._request_line(f"intent-{message['id']}", self.openai.build_intent_request(message['content']))
+                if 'domain' in kinds:
+                    yield self._request_line(f"domain-{message['id']}", self.openai.build_domain_request(message['content']))
+
+        if 'title' in kinds:
+            for conversation in self.db.iter_conversation_first_messages(
+                generic_only=not all_titles,
+                since=since,
+                limit=limit
+            ):
+                yield self._request_line(
+                    f"title-{conversation['conversation_id']}",
+                    self.openai.build_title_request(conversation['content'])
+                )
+
+    def write_request_files(self, requests: Iterable[Dict]) -> List[str]:
+        """Write request lines into JSONL files of at most MAX_REQUESTS_PER_FILE lines"""
+        paths: List[str] = []
+        out = None
+        count = 0
+        try:
+            for request in requests:
+                if out is None or count >= MAX_REQUESTS_PER_FILE:
+                    if out:
+                        out.close()
+                    path = os.path.join(self.job_dir, f"requests_{int(time.time())}_{len(paths)}.jsonl")
+                    out = open(path, 'w', encoding='utf-8')
+                    paths.append(path)
+                    count = 0
+                out.write(json.dumps(request, ensure_ascii=False) + "\n")
+                count += 1
+        finally:
+            if out:
+                out.close()
+        return paths
+
+    def submit(
+        self,
+        kinds: Iterable[str],
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        all_titles: bool = False
+    ) -> List[str]:
+        """Build request files and submit each as a batch"""
+        paths = self.write_request_files(self.build_requests(kinds, since, limit, all_titles))
+        batch_ids = []
+        for path in paths:
+            batch_id = self.backend.submit(path)
+            logger.info("Submitted batch %s from %s", batch_id, path)
+            batch_ids.append(batch_id)
+        return batch_ids
+
+    def wait(self, batch_id: str, interval: Optional[int] = None) -> Optional[str]:
+        """Poll a batch until it finishes; returns the output file id when it completed"""
+        interval = interval or Config.BATCH_JOB_POLL_INTERVAL
+        while True:
+            status, output_file_id = self.backend.status(batch_id)
+            if status in TERMINAL_STATUSES:
+                if status != 'completed':
+                    logger.error("Batch %s finished with status %s", batch_id, status)
+                    return None
+                return output_file_id
+            logger.info("Batch %s is %s, checking again in %ss", batch_id, status, interval)
+            time.sleep(interval)
+
+    def apply_results(self, lines: Iterable[str]) -> Dict[str, int]:
+        """Parse output lines and bulk-apply them in chunks, one UPDATE per chunk and kind"""
+        pending: Dict[str, List[Tuple[int, str]]] = {kind: [] for kind in JOB_KINDS}
+        applied = {kind: 0 for kind in JOB_KINDS}
+        failed = 0
+
+        for line in lines:
+            record = json.loads(line)
+            kind, _, raw_id = record["custom_id"].partition('-')
+            response = record.get("response") or {}
+            if kind not in pending or record.get("error") or response.get("status_code") != 200:
+                failed += 1
+                continue
+
+            content = response["body"]["choices"][0]["message"].get("content")
+            if kind == 'intent':
+                value = self.openai.parse_intent(content)
+            elif kind == 'domain':
+                value = self.openai.parse_domain(content)
+            else:
+                # Without a generated title the existing one is kept
+                if not content or not content.strip().strip('"\''):
+                    failed += 1
+                    continue
+                value = self.openai.parse_title(content, '')
+
+            pending[kind].append((int(raw_id), value))
+            if len(pending[kind]) >= APPLY_CHUNK_SIZE:
+                applied[kind] += self._apply_chunk(kind, pending[kind])
+                pending[kind] = []
+
+        for kind, rows in pending.items():
+            applied[kind] += self._apply_chunk(kind, rows)
+
+        if failed:
+            logger.warning("%s batch results could not be applied", failed)
+        return applied
+
+    def collect(self, batch_id: str, interval: Optional[int] = None) -> Dict[str, int]:
+        """Wait for a batch and apply its results"""
+        output_file_id = self.wait(batch_id, interval)
+        if not output_file_id:
+            return {kind: 0 for kind in JOB_KINDS}
+        return self.apply_results(self.backend.download(output_file_id))
+
+    def _apply_chunk(self, kind: str, rows: List[Tuple[int, str]]) -> int:
+        """Write one chunk of results"""
+        if not rows:
+            return 0
+        if kind == 'title':
+            return self.db.bulk_update_conversation_titles(rows)
+        return self.db.bulk_update_message_field(kind, rows)
+
+    def _request_line(self, custom_id: str, body: Dict) -> Dict:
+        """Wrap a chat completion request body as a Batch API input line"""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": body
+        }
@@ -0,0 +1,52 @@
+from typing import Dict, Optional, Tuple
+from config import Config
+import threading
+import time
+
+
+class ConversationListCache:
+    """
+    Per-process ETags of users' conversation lists
+    Writes made through DatabaseService invalidate the entry; a TTL bounds staleness
+    from writes made by other worker processes
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._etags: Dict[int, Tuple[str, float]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[str]:
+        """Get the cached ETag of a user's list if it is still fresh"""
+        with self._lock:
+            entry = self._etags.get(user_id)
+            if not entry:
+                return None
+            etag, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._etags[user_id]
+                return None
+            return etag
+
+    def begin(self, user_id: int) -> int:
+        """Get a token to pass to set() that detects writes made while the list was being read"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def set(self, user_id: int, etag: str, token: int):
+        """Cache an ETag unless the list was invalidated since begin()"""
+        with self._lock:
+            if self._generations.get(user_id, 0) == token:
+                self._etags[user_id] = (etag, time.monotonic())
+
+    def invalidate(self, user_id: Optional[int]):
+        """Drop the cached ETag after a write to the user's conversations"""
+        if user_id is None:
+            return
+        with self._lock:
+            self._etags.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+conversation_list_cache = ConversationListCache(ttl=Config.CONVERSATION_LIST_ETAG_TTL)
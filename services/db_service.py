@@ -1,19 +1,43 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
-from typing import List, Dict, Optional
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from typing import List, Dict, Optional, Iterator, Tuple
+from services.conversation_cache import conversation_list_cache
 from config import Config
 import logging
 import json
+import struct
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+# Message columns that offline reprocessing jobs are allowed to rewrite
+RECLASSIFIABLE_MESSAGE_FIELDS = ('intent', 'domain')
+
+# Columns returned for conversation messages; prompt details are only loaded on request
+SLIM_MESSAGE_COLUMNS = (
+    "id, conversation_id, role, content, intent, domain, timestamp, "
+    "enhanced_prompt IS NOT NULL AS has_enhanced_prompt"
+)
+DETAIL_MESSAGE_COLUMNS = "original_prompt, enhanced_prompt, metadata"
+
+# Titles given to conversations before one is generated
+GENERIC_CONVERSATION_TITLES = ('New Conversation', 'Previous Conversation')
+
+
+def pack_embedding(vector: List[float]) -> bytes:
+    """Embedding as little-endian float16 bytes for the message_embeddings table"""
+    return struct.pack(f'<{len(vector)}e', *vector)
+
 
 class DatabaseService:
     """Service for Postgres database operations"""
 
     def __init__(self):
         self.connection_string = Config.DATABASE_URL
+        # Whether message_embeddings exists; checked on the first embedding write
+        self._embeddings_table: Optional[bool] = None
 
     def get_connection(self, retries=3, delay=1):
         """Get a database connection with retry logic"""
@@ -33,21 +57,21 @@ class DatabaseService:
             except psycopg2.OperationalError as e:
                 if "server closed the connection unexpectedly" in str(e) or "server terminated abnormally" in str(e):
                     if attempt < retries - 1:
-                        logger.warning(f"Connection lost, retrying attempt {attempt + 2}/{retries}...")
+                        logger.warning("Connection lost, retrying attempt %s/%s...", attempt + 2, retries)
                         time.sleep(delay * (attempt + 1))  # Exponential backoff
                         continue
                 if attempt < retries - 1:
-                    logger.warning(f"Database connection attempt {attempt + 1} failed, retrying in {delay}s: {e}")
+                    logger.warning("Database connection attempt %s failed, retrying in %ss: %s", attempt + 1, delay, e)
                     time.sleep(delay)
                 else:
-                    logger.error(f"Database connection error after {retries} attempts: {e}")
+                    logger.error("Database connection error after %s attempts: %s", retries, e)
                     raise
             except Exception as e:
                 if attempt < retries - 1:
-                    logger.warning(f"Database connection attempt {attempt + 1} failed, retrying in {delay}s: {e}")
+                    logger.warning("Database connection attempt %s failed, retrying in %ss: %s", attempt + 1, delay, e)
                     time.sleep(delay)
                 else:
-                    logger.error(f"Database connection error after {retries} attempts: {e}")
+                    logger.error("Database connection error after %s attempts: %s", retries, e)
                     raise
 
     def get_user(self, user_id: int) -> Optional[Dict]:
@@ -62,7 +86,7 @@ class DatabaseService:
                     user = cur.fetchone()
                     return dict(user) if user else None
         except Exception as e:
-            logger.error(f"Error fetching user: {e}")
+            logger.error("Error fetching user: %s", e)
             return None
 
     def get_user_by_email(self, email: str) -> Optional[Dict]:
@@ -77,7 +101,7 @@ class DatabaseService:
                     user = cur.fetchone()
                     return dict(user) if user else None
         except Exception as e:
-            logger.error(f"Error fetching user by email: {e}")
+            logger.error("Error fetching user by email: %s", e)
             return None
 
     def save_message(
@@ -91,9 +115,10 @@ class DatabaseService:
         intent: Optional[str] = None,
         domain: Optional[str] = None,
         vector_saved: bool = False,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        embedding: Optional[List[float]] = None
     ) -> Optional[int]:
-        """Save a message to database"""
+        """Save a message to database (and its embedding, in the same transaction, when EMBEDDINGS_IN_DB)"""
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
@@ -112,12 +137,91 @@ class DatabaseService:
                     if not result:
                         return None
                     message_id = result[0]
+                    if embedding and Config.EMBEDDINGS_IN_DB:
+                        self._insert_embeddings(cur, [(message_id, embedding)])
                     conn.commit()
+                    if conversation_id is not None:
+                        conversation_list_cache.invalidate(user_id)
                     return message_id
         except Exception as e:
-            logger.error(f"Error saving message: {e}")
+            logger.error("Error saving message: %s", e)
             return None
 
+    def save_messages_bulk(self, messages: List[Dict]) -> List[int]:
+        """
+        Save many messages with a single multi-row INSERT
+        Each dict holds the save_message arguments; ids are returned in input order
+        """
+        if not messages:
+            return []
+
+        try:
+            rows = [
+                (msg['user_id'], msg['role'], msg['content'], msg.get('conversation_id'),
+                 msg.get('original_prompt'), msg.get('enhanced_prompt'), msg.get('intent'),
+                 msg.get('domain'), msg.get('vector_saved', False), Json(msg.get('metadata') or {}))
+                for msg in messages
+            ]
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    # One page keeps this a single statement so RETURNING follows VALUES order
+                    result = execute_values(
+                        cur,
+                        """
+                        INSERT INTO messages
+                        (user_id, role, content, conversation_id, original_prompt, enhanced_prompt,
+                         intent, domain, vector_saved, metadata)
+                        VALUES %s
+                        RETURNING id
+                        """,
+                        rows,
+                        page_size=len(rows),
+                        fetch=True
+                    )
+                    if Config.EMBEDDINGS_IN_DB:
+                        self._insert_embeddings(cur, [
+                            (row[0], msg['embedding'])
+                            for row, msg in zip(result, messages)
+                            if msg.get('embedding')
+                        ])
+                    conn.commit()
+                    for user_id in {msg['user_id'] for msg in messages if msg.get('conversation_id') is not None}:
+                        conversation_list_cache.invalidate(user_id)
+                    return [row[0] for row in result]
+        except Exception as e:
+            logger.error("Error saving messages batch: %s", e)
+            return []
+
+    def _insert_embeddings(self, cur, rows: List[Tuple[int, List[float]]]):
+        """Store (message_id, embedding) pairs as float16 bytes on the caller's transaction"""
+        if not rows or not self._has_embeddings_table(cur):
+            return
+        execute_values(
+            cur,
+            """
+            INSERT INTO message_embeddings (message_id, dimension, embedding)
+            VALUES %s
+            ON CONFLICT (message_id) DO UPDATE
+            SET dimension = EXCLUDED.dimension, embedding = EXCLUDED.embedding
+            """,
+            [(message_id, len(vector), psycopg2.Binary(pack_embedding(vector))) for message_id, vector in rows]
+        )
+
+    def _has_embeddings_table(self, cur) -> bool:
+        """
+        Whether the message_embeddings table exists (checked once). Without it, embeddings are
+        skipped with an error instead of failing every message insert
+        """
+        if self._embeddings_table is None:
+            cur.execute("SELECT to_regclass('message_embeddings') IS NOT NULL")
+            self._embeddings_table = bool(cur.fetchone()[0])
+            if not self._embeddings_table:
+                logger.error(
+                    "EMBEDDINGS_IN_DB is on but the message_embeddings table does not exist; "
+                    "embeddings are not stored until you run: python migrate.py message_embeddings (and restart)"
+                )
+        return self._embeddings_table
+
     def get_user_history(
         self,
         user_id: int,
@@ -140,7 +244,7 @@ class DatabaseService:
                     messages = cur.fetchall()
                     return [dict(msg) for msg in messages]
         except Exception as e:
-            logger.error(f"Error fetching user history: {e}")
+            logger.error("Error fetching user history: %s", e)
             return []
 
     def get_recent_context(self, user_id: int, limit: int = 5) -> List[Dict]:
@@ -161,7 +265,50 @@ class DatabaseService:
                     messages = cur.fetchall()
                     return [dict(msg) for msg in reversed(messages)]
         except Exception as e:
-            logger.error(f"Error fetching recent context: {e}")
+            logger.error("Error fetching recent context: %s", e)
+            return []
+
+    def get_conversation_history(
+        self,
+        conversation_id: int,
+        max_messages: int,
+        block_messages: int,
+        max_tokens: int
+    ) -> List[Dict]:
+        """
+        Messages of a conversation for the prompt, oldest first
+        The window only grows until it exceeds max_messages or about max_tokens (4 characters per
+        token), then its start moves forward by whole blocks of block_messages, so consecutive
+        turns share the same leading messages
+        """
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("SELECT message_count FROM conversations WHERE id = %s", (conversation_id,))
+                    row = cur.fetchone()
+                    if not row or not row['message_count']:
+                        return []
+                    overflow = max(0, row['message_count'] - max_messages)
+                    start = -(-overflow // block_messages) * block_messages
+                    cur.execute(
+                        """
+                        SELECT role, content, intent, domain, timestamp
+                        FROM messages
+                        WHERE conversation_id = %s
+                        ORDER BY id
+                        OFFSET %s
+                        """,
+                        (conversation_id, start)
+                    )
+                    messages = [dict(msg) for msg in cur.fetchall()]
+                    tokens = sum(len(msg['content'] or '') for msg in messages) // 4
+                    dropped = 0
+                    while tokens > max_tokens and dropped < len(messages):
+                        tokens -= sum(len(msg['content'] or '') for msg in messages[dropped:dropped + block_messages]) // 4
+                        dropped += block_messages
+                    return messages[dropped:]
+        except Exception as e:
+            logger.error("Error fetching conversation history: %s", e)
             return []
 
     def mark_vector_saved(self, message_id: int) -> bool:
@@ -176,30 +323,45 @@ class DatabaseService:
                     conn.commit()
                     return True
         except Exception as e:
-            logger.error(f"Error marking vector as saved: {e}")
+            logger.error("Error marking vector as saved: %s", e)
             return False
 
-    def get_user_domains(self, user_id: int, limit: int = 10) -> List[str]:
-        """Get most common domains for a user"""
+    def mark_vectors_saved(self, message_ids: List[int]) -> bool:
+        """Mark many messages as having their vectors saved"""
+        if not message_ids:
+            return True
+
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE messages SET vector_saved = TRUE WHERE id = ANY(%s)",
+                        (list(message_ids),)
+                    )
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error("Error marking vectors as saved: %s", e)
+            return False
+
+    def get_user_stats(self, user_id: int) -> Optional[Dict]:
+        """Get the trigger-maintained counters for a user"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     cur.execute(
                         """
-                        SELECT domain, COUNT(*) as count
-                        FROM messages
-                        WHERE user_id = %s AND domain IS NOT NULL
-                        GROUP BY domain
-                        ORDER BY count DESC
-                        LIMIT %s
+                        SELECT total_messages, vector_count, intent_counts, domain_counts
+                        FROM user_stats
+                        WHERE user_id = %s
                         """,
-                        (user_id, limit)
+                        (user_id,)
                     )
-                    domains = cur.fetchall()
-                    return [domain[0] for domain in domains]
+                    stats = cur.fetchone()
+                    return dict(stats) if stats else None
         except Exception as e:
-            logger.error(f"Error fetching user domains: {e}")
-            return []
+            logger.error("Error fetching user stats: %s", e)
+            return None
 
     def update_user_preferences(self, user_id: int, preferences: Dict) -> bool:
         """Update user preferences"""
@@ -217,7 +379,7 @@ class DatabaseService:
                     conn.commit()
                     return cur.rowcount > 0
         except Exception as e:
-            logger.error(f"Error updating user preferences: {e}")
+            logger.error("Error updating user preferences: %s", e)
             return False
 
     def initialize_database(self):
@@ -233,7 +395,7 @@ class DatabaseService:
                     logger.info("Database initialized successfully")
                     return True
         except Exception as e:
-            logger.error(f"Error initializing database: {e}")
+            logger.error("Error initializing database: %s", e)
             return False
 
     # Conversation Management Methods
@@ -256,96 +418,365 @@ class DatabaseService:
                         return None
                     conversation_id = result[0]
                     conn.commit()
+                    conversation_list_cache.invalidate(user_id)
                     return conversation_id
         except Exception as e:
-            logger.error(f"Error creating conversation: {e}")
+            logger.error("Error creating conversation: %s", e)
             return None
 
     def get_user_conversations(self, user_id: int, limit: int = 50) -> List[Dict]:
-        """Get all conversations for a user"""
+        """Get all conversations for a user (counts and previews are maintained by trigger)"""
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     cur.execute(
                         """
-                        SELECT c.id, c.title, c.created_at, c.updated_at,
-                               COUNT(m.id) as message_count
-                        FROM conversations c
-                        LEFT JOIN messages m ON c.id = m.conversation_id
-                        WHERE c.user_id = %s
-                        GROUP BY c.id
-                        ORDER BY c.updated_at DESC
+                        SELECT id, title, created_at, updated_at,
+                               message_count, last_message_preview
+                        FROM conversations
+                        WHERE user_id = %s
+                        ORDER BY updated_at DESC
                         LIMIT %s
                         """,
                         (user_id, limit)
                     )
-                    conversations = cur.fetchall()
-                    result = []
-                    for conv in conversations:
-                        conv_dict = dict(conv)
-                        # Convert timestamps to ISO format
-                        if conv_dict.get('created_at'):
-                            conv_dict['created_at'] = conv_dict['created_at'].isoformat()
-                        if conv_dict.get('updated_at'):
-                            conv_dict['updated_at'] = conv_dict['updated_at'].isoformat()
-                        result.append(conv_dict)
-                    return result
+                    # Timestamps stay datetimes; the JSON provider writes them as ISO 8601
+                    return [dict(conv) for conv in cur.fetchall()]
         except Exception as e:
-            logger.error(f"Error fetching conversations: {e}")
+            logger.error("Error fetching conversations: %s", e)
             return []
 
-    def get_conversation_messages(self, conversation_id: int) -> List[Dict]:
-        """Get all messages in a conversation"""
+    def get_conversation_messages_page(
+        self,
+        conversation_id: int,
+        before_id: Optional[int] = None,
+        limit: int = 50,
+        include_enhanced: bool = False
+    ) -> Dict:
+        """
+        Get one page of a conversation, newest page first (keyset pagination on message id)
+        Returns: Dict with messages (oldest first within the page), has_more and next_cursor
+        """
         try:
+            columns = SLIM_MESSAGE_COLUMNS
+            if include_enhanced:
+                columns += ", " + DETAIL_MESSAGE_COLUMNS
+
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     cur.execute(
-                        """
-                        SELECT * FROM messages
+                        f"""
+                        SELECT {columns} FROM messages
                         WHERE conversation_id = %s
-                        ORDER BY timestamp ASC
+                          AND (%s::integer IS NULL OR id < %s)
+                        ORDER BY id DESC
+                        LIMIT %s
+                        """,
+                        (conversation_id, before_id, before_id, limit + 1)
+                    )
+                    rows = cur.fetchall()
+
+            has_more = len(rows) > limit
+            messages = [dict(msg) for msg in reversed(rows[:limit])]
+
+            return {
+                "messages": messages,
+                "has_more": has_more,
+                "next_cursor": messages[0]['id'] if has_more and messages else None
+            }
+        except Exception as e:
+            logger.error("Error fetching conversation messages page: %s", e)
+            return {"messages": [], "has_more": False, "next_cursor": None}
+
+    def iter_conversation_messages(
+        self,
+        conversation_id: int,
+        include_enhanced: bool = False,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        """Stream every message of a conversation, oldest first, with a server-side cursor"""
+        columns = SLIM_MESSAGE_COLUMNS
+        if include_enhanced:
+            columns += ", " + DETAIL_MESSAGE_COLUMNS
+
+        with self.get_connection() as conn:
+            with conn.cursor(name='iter_conversation_messages', cursor_factory=RealDictCursor) as cur:
+                cur.itersize = chunk_size
+                cur.execute(
+                    f"""
+                    SELECT {columns} FROM messages
+                    WHERE conversation_id = %s
+                    ORDER BY id
+                    """,
+                    (conversation_id,)
+                )
+                for row in cur:
+                    yield dict(row)
+
+    def get_message_details(self, conversation_id: int, message_id: int) -> Optional[Dict]:
+        """Get the prompt details left out of the slim message projection"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        f"""
+                        SELECT id, {DETAIL_MESSAGE_COLUMNS} FROM messages
+                        WHERE id = %s AND conversation_id = %s
                         """,
+                        (message_id, conversation_id)
+                    )
+                    message = cur.fetchone()
+                    return dict(message) if message else None
+        except Exception as e:
+            logger.error("Error fetching message details: %s", e)
+            return None
+
+    def get_conversation(self, conversation_id: int) -> Optional[Dict]:
+        """Get a conversation by ID"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        "SELECT id, user_id, title, created_at, updated_at FROM conversations WHERE id = %s",
                         (conversation_id,)
                     )
-                    messages = cur.fetchall()
-                    result = []
-                    for msg in messages:
-                        msg_dict = dict(msg)
-                        # Convert timestamp to ISO format
-                        if msg_dict.get('timestamp'):
-                            msg_dict['timestamp'] = msg_dict['timestamp'].isoformat()
-                        result.append(msg_dict)
-                    return result
+                    conversation = cur.fetchone()
+                    return dict(conversation) if conversation else None
         except Exception as e:
-            logger.error(f"Error fetching conversation messages: {e}")
-            return []
+            logger.error("Error fetching conversation: %s", e)
+            return None
 
-    def update_conversation_title(self, conversation_id: int, title: str) -> bool:
-        """Update conversation title"""
+    def get_first_user_message(self, conversation_id: int) -> Optional[Dict]:
+        """Get only the first user message of a conversation"""
         try:
             with self.get_connection() as conn:
-                with conn.cursor() as cur:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     cur.execute(
-                        "UPDATE conversations SET title = %s WHERE id = %s",
-                        (title, conversation_id)
+                        """
+                        SELECT id, content FROM messages
+                        WHERE conversation_id = %s AND role = 'user'
+                        ORDER BY id ASC
+                        LIMIT 1
+                        """,
+                        (conversation_id,)
                     )
+                    message = cur.fetchone()
+                    return dict(message) if message else None
+        except Exception as e:
+            logger.error("Error fetching first user message: %s", e)
+            return None
+
+    def update_conversation_title(self, conversation_id: int, title: str, only_if_generic: bool = False) -> bool:
+        """Update conversation title (optionally only while it still has a generic title)"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    if only_if_generic:
+                        cur.execute(
+                            "UPDATE conversations SET title = %s WHERE id = %s AND title = ANY(%s) RETURNING user_id",
+                            (title, conversation_id, list(GENERIC_CONVERSATION_TITLES))
+                        )
+                    else:
+                        cur.execute(
+                            "UPDATE conversations SET title = %s WHERE id = %s RETURNING user_id",
+                            (title, conversation_id)
+                        )
+                    result = cur.fetchone()
                     conn.commit()
+                    if result:
+                        conversation_list_cache.invalidate(result[0])
                     return True
         except Exception as e:
-            logger.error(f"Error updating conversation title: {e}")
+            logger.error("Error updating conversation title: %s", e)
             return False
 
-    def delete_conversation(self, conversation_id: int) -> bool:
-        """Delete a conversation and all its messages"""
+    def delete_conversation(self, conversation_id: int) -> Optional[Dict]:
+        """
+        Delete a conversation and all its messages
+        Returns the owner and the ids of deleted messages that had a saved vector, or None on error
+        """
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
+                    # The sub-select sees the messages as they were before the cascading delete
                     cur.execute(
-                        "DELETE FROM conversations WHERE id = %s",
-                        (conversation_id,)
+                        """
+                        WITH deleted AS (
+                            DELETE FROM conversations WHERE id = %s RETURNING user_id
+                        )
+                        SELECT
+                            (SELECT user_id FROM deleted),
+                            ARRAY(
+                                SELECT id FROM messages
+                                WHERE conversation_id = %s AND vector_saved = TRUE
+                            )
+                        """,
+                        (conversation_id, conversation_id)
                     )
+                    user_id, vector_message_ids = cur.fetchone()
                     conn.commit()
-                    return True
+                    if user_id is not None:
+                        conversation_list_cache.invalidate(user_id)
+                    return {
+                        "user_id": user_id,
+                        "vector_message_ids": vector_message_ids if user_id is not None else []
+                    }
         except Exception as e:
-            logger.error(f"Error deleting conversation: {e}")
-            return False
+            logger.error("Error deleting conversation: %s", e)
+            return None
+
+    # Offline Reprocessing Methods
+
+    def iter_user_messages(
+        self,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        """Stream user messages (id, content) with a server-side cursor"""
+        with self.get_connection() as conn:
+            with conn.cursor(name='iter_user_messages', cursor_factory=RealDictCursor) as cur:
+                cur.itersize = chunk_size
+                cur.execute(
+                    """
+                    SELECT id, content
+                    FROM messages
+                    WHERE role = 'user'
+                      AND (%s::timestamp IS NULL OR timestamp >= %s::timestamp)
+                    ORDER BY id
+                    LIMIT %s
+                    """,
+                    (since, since, limit)
+                )
+                for row in cur:
+                    yield dict(row)
+
+    def iter_conversation_first_messages(
+        self,
+        generic_only: bool = True,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict]:
+        """Stream (conversation_id, content) of each conversation's first user message"""
+        with self.get_connection() as conn:
+            with conn.cursor(name='iter_conversation_first_messages', cursor_factory=RealDictCursor) as cur:
+                cur.itersize = chunk_size
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (m.conversation_id) m.conversation_id, m.content
+                    FROM messages m
+                    JOIN conversations c ON c.id = m.conversation_id
+                    WHERE m.role = 'user'
+                      AND (NOT %s OR c.title = ANY(%s))
+                      AND (%s::timestamp IS NULL OR c.updated_at >= %s::timestamp)
+                    ORDER BY m.conversation_id, m.id
+                    LIMIT %s
+                    """,
+                    (generic_only, list(GENERIC_CONVERSATION_TITLES), since, since, limit)
+                )
+                for row in cur:
+                    yield dict(row)
+
+    def count_message_embeddings(self) -> int:
+        """Number of stored message embeddings"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(*) FROM message_embeddings")
+                    return cur.fetchone()[0]
+        except Exception as e:
+            logger.error("Error counting message embeddings: %s", e)
+            return 0
+
+    def iter_message_embeddings(
+        self,
+        after_id: int = 0,
+        chunk_size: int = 5000
+    ) -> Iterator[Tuple[int, int, str, Optional[str], Optional[str], int, memoryview]]:
+        """
+        Stream (message_id, user_id, content, intent, domain, dimension, embedding bytes) in
+        message_id order with a server-side cursor; rows are plain tuples to keep decoding cheap
+        """
+        with self.get_connection() as conn:
+            with conn.cursor(name='iter_message_embeddings') as cur:
+                cur.itersize = chunk_size
+                cur.execute(
+                    """
+                    SELECT e.message_id, m.user_id, m.content, m.intent, m.domain, e.dimension, e.embedding
+                    FROM message_embeddings e
+                    JOIN messages m ON m.id = e.message_id
+                    WHERE e.message_id > %s
+                    ORDER BY e.message_id
+                    """,
+                    (after_id,)
+                )
+                yield from cur
+
+    def bulk_update_message_field(self, field: str, rows: List[Tuple[int, str]]) -> int:
+        """Rewrite one classification column for many messages with a single UPDATE ... FROM (VALUES ...)"""
+        if field not in RECLASSIFIABLE_MESSAGE_FIELDS:
+            raise ValueError(f"Field {field} cannot be bulk updated")
+        if not rows:
+            return 0
+
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    query = sql.SQL(
+                        """
+                        UPDATE messages AS m
+                        SET {field} = v.value
+                        FROM (VALUES %s) AS v(id, value)
+                        WHERE m.id = v.id
+                        """
+                    ).format(field=sql.Identifier(field))
+                    execute_values(cur, query.as_string(conn), rows, page_size=len(rows))
+                    updated = cur.rowcount
+                    conn.commit()
+                    return updated
+        except Exception as e:
+            logger.error("Error bulk updating message %s: %s", field, e)
+            return 0
+
+    def bulk_update_conversation_titles(self, rows: List[Tuple[int, str]]) -> int:
+        """Rewrite many conversation titles with a single UPDATE ... FROM (VALUES ...)"""
+        if not rows:
+            return 0
+
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    result = execute_values(
+                        cur,
+                        """
+                        UPDATE conversations AS c
+                        SET title = v.title
+                        FROM (VALUES %s) AS v(id, title)
+                        WHERE c.id = v.id
+                        RETURNING c.user_id
+                        """,
+                        rows,
+                        page_size=len(rows),
+                        fetch=True
+                    )
+                    conn.commit()
+                    for user_id in {row[0] for row in result}:
+                        conversation_list_cache.invalidate(user_id)
+                    return len(result)
+        except Exception as e:
+            logger.error("Error bulk updating conversation titles: %s", e)
+            return 0
+
+
+_db_service: Optional[DatabaseService] = None
+_db_service_lock = threading.Lock()
+
+
+def get_db_service() -> DatabaseService:
+    """Get the database service shared by this process"""
+    global _db_service
+    with _db_service_lock:
+        if _db_service is None:
+            _db_service = DatabaseService()
+        return _db_service
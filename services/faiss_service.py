@@ -1,43 +1,118 @@
-import faiss  # type: ignore
-import numpy as np  # type: ignore
-import json
+import atexit
 import os
-from typing import List, Dict, Optional, Tuple, Any
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
 from config import Config
 import logging
+import threading
+
+from services.lexical_index import matching_enough_terms, reciprocal_rank_fusion
+from services.search_batcher import SearchBatcher
+
+if TYPE_CHECKING:
+    from services.vector_shards import ShardedVectorStore, VectorShard
+    from services.vector_spool import VectorSpool
 
 logger = logging.getLogger(__name__)
 
+# Save a shard after this many unsaved additions
+SAVE_EVERY = 10
+
+
+def above_min_score(results: List[Dict], min_score: Optional[float]) -> List[Dict]:
+    """Vector hits whose cosine similarity reaches min_score"""
+    if min_score is None:
+        return results
+    return [result for result in results if result["similarity_score"] >= min_score]
+
 
 class FAISSService:
-    """Service for FAISS vector similarity search"""
+    """
+    Service for FAISS vector similarity search over per-user-bucket shards
+    In 'writer' mode this process owns the shards. In 'reader' mode (multi-worker deployments)
+    shards are memory-mapped read-only and writes are spooled for the vector_indexer.py process.
+    In 'remote' mode get_faiss_service() returns a client of vector_server.py instead
+    """
 
-    def __init__(self):
+    def __init__(self, load_in_background: bool = False, mode: Optional[str] = None):
         self.dimension = Config.EMBEDDING_DIMENSION
         self.index_path = Config.FAISS_INDEX_PATH
         self.metadata_path = Config.FAISS_METADATA_PATH
-        self.index: Any = None  # FAISS Index type
-        self.metadata: List[Dict] = []
-        self.initialize_index()
+        self.mode = mode or Config.FAISS_MODE
+        self.store: Optional["ShardedVectorStore"] = None
+        self.spool: Optional["VectorSpool"] = None
+        self.search_batcher: Optional[SearchBatcher] = None
+        self.status = 'loading'  # 'loading', 'ready' or 'error'
+        self._loaded = threading.Event()
+
+        if load_in_background:
+            threading.Thread(target=self.initialize_index, name='faiss-init', daemon=True).start()
+        else:
+            self.initialize_index()
 
     def initialize_index(self):
-        """Initialize or load FAISS index"""
+        """Open the shard store (no shard is read until it is used)"""
         try:
-            if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-                # Load existing index
-                self.index = faiss.read_index(self.index_path)
-                with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                    self.metadata = json.load(f)
-                logger.info(f"Loaded FAISS index with {self.index.ntotal} vectors")
+            # faiss and numpy are only imported here, off the import path of the web app
+            from services.vector_shards import MANIFEST_FILE, ShardedVectorStore
+            from services.vector_spool import VectorSpool
+
+            read_only = self.mode == 'reader'
+            first_run = not os.path.exists(os.path.join(Config.FAISS_SHARD_DIR, MANIFEST_FILE))
+            store = ShardedVectorStore(
+                directory=Config.FAISS_SHARD_DIR,
+                shard_count=Config.FAISS_SHARD_COUNT,
+                dimension=self.dimension,
+                memory_budget_bytes=Config.FAISS_MEMORY_BUDGET_MB * 1024 * 1024,
+                read_only=read_only,
+                reload_interval=Config.FAISS_RELOAD_INTERVAL,
+                metric=Config.FAISS_METRIC,
+                index_type=Config.FAISS_INDEX_TYPE,
+                rerank_factor=Config.FAISS_RERANK_FACTOR
+            )
+
+            if read_only:
+                self.spool = VectorSpool(Config.FAISS_SPOOL_DIR)
             else:
-                # Create new index
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.metadata = []
-                logger.info("Created new FAISS index")
+                if first_run and os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+                    try:
+                        imported = store.import_legacy(self.index_path, self.metadata_path)
+                        logger.info("Split legacy FAISS index into shards (%s vectors)", imported)
+                    except Exception as e:
+                        logger.error("Error importing legacy FAISS index: %s", e)
+                atexit.register(self.save_index)
+
+            if Config.VECTOR_SEARCH_BATCH_SIZE > 1:
+                self.search_batcher = SearchBatcher(
+                    self.search_similar_batch,
+                    max_batch_size=Config.VECTOR_SEARCH_BATCH_SIZE,
+                    window=Config.VECTOR_SEARCH_BATCH_WINDOW_MS / 1000
+                )
+
+            self.store = store
+            self.status = 'ready'
+            logger.info("Opened FAISS shard store in %s mode with %s shards", self.mode, store.shard_count)
         except Exception as e:
-            logger.error(f"Error initializing FAISS index: {e}")
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.metadata = []
+            logger.error("Error initializing FAISS index: %s", e)
+            self.status = 'error'
+        finally:
+            self._loaded.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the store is open"""
+        return self.status == 'ready'
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until background loading finished; returns whether the store is usable"""
+        self._loaded.wait(timeout)
+        return self.ready
+
+    def _ready_for_write(self) -> bool:
+        """Writes wait for loading to finish rather than being dropped"""
+        if self.wait_until_ready(Config.FAISS_READY_TIMEOUT):
+            return True
+        logger.error("FAISS index not available (%s), skipping write", self.status)
+        return False
 
     def add_vector(
         self,
@@ -49,128 +124,430 @@ class FAISSService:
         domain: Optional[str] = None
     ) -> bool:
         """Add a vector to the index with metadata"""
+        if not self._ready_for_write():
+            return False
+
+        entry = {
+            "vector": vector,
+            "user_id": user_id,
+            "message_id": message_id,
+            "text": text,
+            "intent": intent,
+            "domain": domain
+        }
         try:
-            # Convert to numpy array and add to index
-            vector_array = np.array([vector], dtype=np.float32)
-            self.index.add(vector_array)
-
-            # Store metadata
-            metadata_entry = {
-                "user_id": user_id,
-                "message_id": message_id,
-                "text": text,
-                "intent": intent,
-                "domain": domain,
-                "index_position": len(self.metadata)
-            }
-            self.metadata.append(metadata_entry)
-
-            # Save periodically (every 10 additions)
-            if len(self.metadata) % 10 == 0:
-                self.save_index()
+            if self.spool:
+                self.spool.append([{"op": "add", "entries": [entry]}])
+            else:
+                # Save periodically (every 10 additions to the shard)
+                self._apply_add([entry], save_threshold=SAVE_EVERY)
+            return True
+        except Exception as e:
+            logger.error("Error adding vector: %s", e)
+            return False
 
+    def add_vectors(self, entries: List[Dict]) -> bool:
+        """
+        Add many vectors with a single index.add call per shard and save each touched shard once
+        Each entry holds the add_vector arguments (vector, user_id, message_id, text, intent, domain)
+        """
+        if not entries:
+            return True
+        if not self._ready_for_write():
+            return False
+
+        try:
+            if self.spool:
+                self.spool.append([{"op": "add", "entries": entries}])
+            else:
+                self._apply_add(entries, save_threshold=1)
             return True
         except Exception as e:
-            logger.error(f"Error adding vector: {e}")
+            logger.error("Error adding vectors batch: %s", e)
             return False
 
+    def apply_operations(self, operations: List[Dict]) -> Dict[str, int]:
+        """
+        Apply spooled write operations in writer mode (used by vector_indexer.py)
+        Shards are not saved here; the caller publishes them with save_index()
+        """
+        counts = {"added": 0, "removed": 0}
+        for operation in operations:
+            kind = operation.get("op")
+            if kind == "add":
+                self._apply_add(operation["entries"], save_threshold=None)
+                counts["added"] += len(operation["entries"])
+            elif kind == "remove":
+                counts["removed"] += self._apply_remove(operation["user_id"], operation["message_ids"], save=False)
+            elif kind == "clear_user":
+                counts["removed"] += self._apply_clear(operation["user_id"], save=False)
+            else:
+                logger.warning("Skipping unknown vector operation %r", kind)
+        return counts
+
+    def _apply_add(self, entries: List[Dict], save_threshold: Optional[int]):
+        """Add entries to their shards; a shard is saved once it has save_threshold unsaved additions"""
+        for shard_id, shard_entries in self._group_by_shard(entries, [entry["user_id"] for entry in entries]):
+            with self.store.use(shard_id) as shard:
+                shard.add(
+                    [entry["vector"] for entry in shard_entries],
+                    [{
+                        "user_id": entry["user_id"],
+                        "message_id": entry["message_id"],
+                        "text": entry["text"],
+                        "intent": entry.get("intent"),
+                        "domain": entry.get("domain")
+                    } for entry in shard_entries]
+                )
+                if save_threshold is not None and shard.unsaved_additions >= save_threshold:
+                    self.store.save_shard(shard)
+
+    def _apply_remove(self, user_id: int, message_ids: List[int], save: bool) -> int:
+        """Remove vectors from the user's shard"""
+        with self.store.use(self.store.shard_id_for_user(user_id)) as shard:
+            removed = shard.remove(message_ids)
+            if removed and save:
+                self.store.save_shard(shard)
+        return removed
+
+    def _apply_clear(self, user_id: int, save: bool) -> int:
+        """Remove every vector of a user"""
+        with self.store.use(self.store.shard_id_for_user(user_id)) as shard:
+            removed = shard.remove_user(user_id)
+            if removed and save:
+                self.store.save_shard(shard)
+        return removed
+
     def search_similar(
         self,
         query_vector: List[float],
         k: int = 5,
-        user_id: Optional[int] = None
+        user_id: Optional[int] = None,
+        min_score: Optional[float] = None
     ) -> List[Dict]:
-        """Search for similar vectors"""
+        """
+        Search for similar vectors (only the user's shard when user_id is given)
+        similarity_score is the cosine similarity; hits below min_score are dropped
+        Concurrent calls are coalesced by the search batcher into one multi-query search
+        """
+        try:
+            if self.search_batcher and self.ready:
+                return above_min_score(self.search_batcher.search(query_vector, k, user_id), min_score)
+            return self.search_similar_batch([query_vector], k, [user_id], min_score)[0]
+        except Exception as e:
+            logger.error("Error searching similar vectors: %s", e)
+            return []
+
+    def search_similar_batch(
+        self,
+        query_vectors: List[List[float]],
+        k: int = 5,
+        user_ids: Optional[List[Optional[int]]] = None,
+        min_score: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for similar vectors for many queries with one multi-query search per shard
+        Returns no matches while the store is still loading
+        """
         try:
-            if self.index.ntotal == 0:
-                return []
+            if not query_vectors or not self.ready:
+                return [[] for _ in query_vectors]
 
-            # Convert query to numpy array
-            query_array = np.array([query_vector], dtype=np.float32)
+            if user_ids is None:
+                user_ids = [None] * len(query_vectors)
 
-            # Search
-            distances, indices = self.index.search(query_array, min(k * 3, self.index.ntotal))
+            results: List[List[Dict]] = [[] for _ in query_vectors]
+            positions = list(range(len(query_vectors)))
 
-            # Filter results
-            results = []
-            for distance, idx in zip(distances[0], indices[0]):
-                if idx == -1:  # No more results
-                    break
+            # Queries scoped to a user only touch that user's shard
+            scoped = [position for position in positions if user_ids[position]]
+            for shard_id, shard_positions in self._group_by_shard(scoped, [user_ids[p] for p in scoped]):
+                with self.store.use(shard_id) as shard:
+                    for position, row in zip(shard_positions, self._search_shard(shard, query_vectors, shard_positions, k, user_ids, min_score)):
+                        results[position] = row
 
-                meta = self.metadata[idx]
+            # Unscoped queries search every shard and merge by similarity
+            unscoped = [position for position in positions if not user_ids[position]]
+            if unscoped:
+                for shard_id in self.store.shard_ids():
+                    with self.store.use(shard_id) as shard:
+                        rows = self._search_shard(shard, query_vectors, unscoped, k, user_ids, min_score)
+                    for position, row in zip(unscoped, rows):
+                        results[position] = sorted(results[position] + row, key=lambda r: -r["similarity_score"])[:k]
+
+            return results
+        except Exception as e:
+            logger.error("Error searching similar vectors batch: %s", e)
+            return [[] for _ in query_vectors]
 
-                # Filter by user if specified
-                if user_id and meta['user_id'] != user_id:
-                    continue
+    def _search_shard(
+        self,
+        shard: "VectorShard",
+        query_vectors: List[List[float]],
+        positions: List[int],
+        k: int,
+        user_ids: List[Optional[int]],
+        min_score: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """Run one multi-query search on a shard for the given query positions"""
+        if shard.ntotal == 0:
+            return [[] for _ in positions]
+
+        scores, indices = shard.search([query_vectors[position] for position in positions], k * 3)
+        return [
+            self._collect_results(shard, row_scores, row_indices, k, user_ids[position], min_score)
+            for row_scores, row_indices, position in zip(scores, indices, positions)
+        ]
+
+    def _collect_results(
+        self,
+        shard: "VectorShard",
+        scores,
+        indices,
+        k: int,
+        user_id: Optional[int],
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """Turn one row of search output (best first) into filtered result dicts"""
+        results = []
+        for score, idx in zip(scores, indices):
+            if idx == -1:  # No more results
+                break
 
-                results.append({
-                    "text": meta["text"],
-                    "intent": meta["intent"],
-                    "domain": meta["domain"],
-                    "similarity_score": float(distance),
-                    "message_id": meta["message_id"]
-                })
+            if min_score is not None and score < min_score:  # The rest are weaker still
+                break
 
-                if len(results) >= k:
-                    break
+            meta = shard.metadata.get(int(idx))
+            if meta is None:
+                continue
+
+            # Shards are shared by several users, so filter by user if specified
+            if user_id and meta['user_id'] != user_id:
+                continue
+
+            results.append(self._result(meta, similarity_score=float(score)))
+
+            if len(results) >= k:
+                break
+
+        return results
+
+    def _result(self, meta: Dict, **scores) -> Dict:
+        """Search hit for a metadata entry"""
+        return {
+            "text": meta["text"],
+            "intent": meta["intent"],
+            "domain": meta["domain"],
+            **scores,
+            "message_id": meta["message_id"]
+        }
+
+    def search_lexical(self, query_text: str, k: int = 5, user_id: Optional[int] = None) -> List[Dict]:
+        """BM25 keyword search over stored message texts; needs no embedding"""
+        return self.search_lexical_batch([query_text], k, [user_id])[0]
+
+    def search_lexical_batch(
+        self,
+        query_texts: List[str],
+        k: int = 5,
+        user_ids: Optional[List[Optional[int]]] = None
+    ) -> List[List[Dict]]:
+        """BM25 keyword search for many queries, touching each shard once"""
+        try:
+            if not query_texts or not self.ready:
+                return [[] for _ in query_texts]
+
+            if user_ids is None:
+                user_ids = [None] * len(query_texts)
+
+            results: List[List[Dict]] = [[] for _ in query_texts]
+            positions = list(range(len(query_texts)))
+
+            scoped = [position for position in positions if user_ids[position]]
+            for shard_id, shard_positions in self._group_by_shard(scoped, [user_ids[p] for p in scoped]):
+                with self.store.use(shard_id) as shard:
+                    for position in shard_positions:
+                        results[position] = [
+                            self._result(shard.metadata[message_id], lexical_score=score)
+                            for message_id, score in shard.search_lexical(query_texts[position], k, user_ids[position])
+                        ]
+
+            unscoped = [position for position in positions if not user_ids[position]]
+            if unscoped:
+                for shard_id in self.store.shard_ids():
+                    with self.store.use(shard_id) as shard:
+                        rows = [
+                            [
+                                self._result(shard.metadata[message_id], lexical_score=score)
+                                for message_id, score in shard.search_lexical(query_texts[position], k)
+                            ]
+                            for position in unscoped
+                        ]
+                    for position, row in zip(unscoped, rows):
+                        results[position] = sorted(results[position] + row, key=lambda r: -r["lexical_score"])[:k]
 
             return results
         except Exception as e:
-            logger.error(f"Error searching similar vectors: {e}")
-            return []
+            logger.error("Error in lexical search: %s", e)
+            return [[] for _ in query_texts]
+
+    def search_hybrid(
+        self,
+        query_text: str,
+        query_vector: Optional[List[float]] = None,
+        k: int = 5,
+        user_id: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Vector and BM25 hits merged with reciprocal-rank fusion. min_score applies to the vector hits;
+        BM25 hits must contain HYBRID_MIN_TERM_MATCH of the query's terms
+        Without a query vector (the embedding call failed or timed out) only the lexical index is searched
+        """
+        candidates = max(k, Config.HYBRID_CANDIDATES)
+        lexical = matching_enough_terms(
+            query_text, self.search_lexical(query_text, candidates, user_id), Config.HYBRID_MIN_TERM_MATCH
+        )
+        if not query_vector:
+            return lexical[:k]
+        vector = self.search_similar(query_vector, candidates, user_id, min_score)
+        return reciprocal_rank_fusion([vector, lexical], k, Config.HYBRID_RRF_K)
+
+    def search_hybrid_batch(
+        self,
+        query_texts: List[str],
+        query_vectors: List[Optional[List[float]]],
+        k: int = 5,
+        user_ids: Optional[List[Optional[int]]] = None,
+        min_score: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """search_hybrid for many queries: one lexical pass and one multi-query vector search"""
+        if user_ids is None:
+            user_ids = [None] * len(query_texts)
+
+        candidates = max(k, Config.HYBRID_CANDIDATES)
+        lexical = [
+            matching_enough_terms(query_text, rows, Config.HYBRID_MIN_TERM_MATCH)
+            for query_text, rows in zip(query_texts, self.search_lexical_batch(query_texts, candidates, user_ids))
+        ]
+        embedded = [position for position, vector in enumerate(query_vectors) if vector]
+        vector_rows = self.search_similar_batch(
+            [query_vectors[position] for position in embedded],
+            candidates,
+            [user_ids[position] for position in embedded],
+            min_score
+        )
+
+        results = [rows[:k] for rows in lexical]
+        for position, vector_row in zip(embedded, vector_rows):
+            results[position] = reciprocal_rank_fusion([vector_row, lexical[position]], k, Config.HYBRID_RRF_K)
+        return results
+
+    def _group_by_shard(self, items: List, user_ids: List[int]) -> List[Tuple[int, List]]:
+        """Group items by the shard of their user, keeping input order within a shard"""
+        groups: Dict[int, List] = {}
+        for item, user_id in zip(items, user_ids):
+            groups.setdefault(self.store.shard_id_for_user(user_id), []).append(item)
+        return list(groups.items())
 
     def get_user_query_history(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Get user's query history from FAISS metadata"""
+        if not self.ready:
+            return []
+
         try:
-            user_queries = [
-                meta for meta in self.metadata
-                if meta['user_id'] == user_id
-            ]
+            with self.store.use(self.store.shard_id_for_user(user_id)) as shard:
+                user_queries = [
+                    meta for meta in shard.metadata.values()
+                    if meta['user_id'] == user_id
+                ]
             return user_queries[-limit:]
         except Exception as e:
-            logger.error(f"Error getting user query history: {e}")
+            logger.error("Error getting user query history: %s", e)
             return []
 
     def save_index(self):
-        """Save FAISS index and metadata to disk"""
+        """Save every shard with unsaved changes to disk (readers have nothing to save)"""
+        if not self.store or self.store.read_only:
+            return False
+
         try:
-            faiss.write_index(self.index, self.index_path)
-            with open(self.metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-            logger.info("FAISS index saved successfully")
+            self.store.flush()
+            logger.info("FAISS shards saved successfully")
             return True
         except Exception as e:
-            logger.error(f"Error saving FAISS index: {e}")
+            logger.error("Error saving FAISS shards: %s", e)
             return False
 
     def get_index_stats(self) -> Dict:
         """Get statistics about the index"""
-        return {
-            "total_vectors": self.index.ntotal if self.index else 0,
+        total = self.store.total_vectors() if self.store else 0
+        stats = {
+            "status": self.status,
+            "total_vectors": total,
             "dimension": self.dimension,
-            "metadata_count": len(self.metadata)
+            "metadata_count": total
         }
+        if self.store:
+            stats.update(self.store.get_stats())
+        if self.spool:
+            stats["spooled_writes"] = self.spool.depth()
+        if self.search_batcher:
+            stats["search_batcher"] = self.search_batcher.get_stats()
+        return stats
+
+    def remove_vectors(self, user_id: int, message_ids: List[int]) -> int:
+        """Delete the vectors of some of a user's messages; returns the number removed"""
+        if not message_ids or not self._ready_for_write():
+            return 0
+
+        try:
+            if self.spool:
+                self.spool.append([{"op": "remove", "user_id": user_id, "message_ids": list(message_ids)}])
+                return len(message_ids)
+            return self._apply_remove(user_id, message_ids, save=True)
+        except Exception as e:
+            logger.error("Error removing vectors: %s", e)
+            return 0
 
     def clear_user_vectors(self, user_id: int):
-        """Clear all vectors for a specific user (requires rebuilding index)"""
+        """Clear all vectors for a specific user"""
+        if not self._ready_for_write():
+            return False
+
         try:
-            # Filter metadata
-            filtered_metadata = [
-                meta for meta in self.metadata
-                if meta['user_id'] != user_id
-            ]
-
-            if len(filtered_metadata) == len(self.metadata):
-                logger.info(f"No vectors found for user {user_id}")
+            if self.spool:
+                self.spool.append([{"op": "clear_user", "user_id": user_id}])
+                logger.info("Queued clearing vectors for user %s", user_id)
                 return True
 
-            # Rebuild index
-            self.index = faiss.IndexFlatL2(self.dimension)
-            self.metadata = []
+            removed = self._apply_clear(user_id, save=True)
+            if not removed:
+                logger.info("No vectors found for user %s", user_id)
+                return True
 
-            logger.info(f"Cleared vectors for user {user_id}")
-            self.save_index()
+            logger.info("Cleared %s vectors for user %s", removed, user_id)
             return True
         except Exception as e:
-            logger.error(f"Error clearing user vectors: {e}")
+            logger.error("Error clearing user vectors: %s", e)
             return False
+
+
+_faiss_service: Optional[FAISSService] = None
+_faiss_service_lock = threading.Lock()
+
+
+def get_faiss_service() -> FAISSService:
+    """
+    Get the vector store shared by this process (shards must have a single owner)
+    The first call returns immediately and opens the store in the background
+    """
+    global _faiss_service
+    with _faiss_service_lock:
+        if _faiss_service is None:
+            if Config.FAISS_MODE == 'remote':
+                from services.vector_client import RemoteFAISSService
+                _faiss_service = RemoteFAISSService(load_in_background=True)
+            else:
+                _faiss_service = FAISSService(load_in_background=True)
+        return _faiss_service
@@ -0,0 +1,77 @@
+from flask.json.provider import DefaultJSONProvider
+from typing import Any, Dict, Iterable, Iterator, Union
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows serialized per chunk of a streamed list
+STREAM_BATCH_ROWS = 500
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson
+    datetime/date values are written natively as ISO 8601 (the same strings as .isoformat()),
+    so routes can return database rows as they come. Output is always UTF-8 (no ensure_ascii)
+    """
+
+    def _options(self, indent: bool = False) -> int:
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """Serialize to UTF-8 bytes; types orjson does not know go through Flask's default"""
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # json.dumps keyword arguments (used by some extensions) keep the standard encoder
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+    def stream_list(self, fields: Dict, key: str, items: Iterable[Dict], batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+        """
+        Yield a JSON object made of fields, then key: [items...], then the item count, serializing
+        items a batch at a time so a long list never sits in memory as dicts or one string
+        If the items fail part way, the list is closed with "complete": false and an error
+        """
+        # Open the list after the other fields: {"a":1} -> {"a":1,"key":[
+        head = self.dumps_bytes(fields)[:-1]
+        yield head + (b',' if fields else b'') + self.dumps_bytes(key) + b':['
+
+        count = 0
+        batch = []
+        complete = True
+        try:
+            for item in items:
+                batch.append(self.dumps_bytes(item))
+                if len(batch) >= batch_rows:
+                    yield (b',' if count else b'') + b','.join(batch)
+                    count += len(batch)
+                    batch = []
+        except Exception as e:
+            logger.error("Error streaming %s: %s", key, e)
+            complete = False
+        if batch:
+            yield (b',' if count else b'') + b','.join(batch)
+            count += len(batch)
+
+        tail = {"count": count, "complete": complete}
+        if not complete:
+            tail["error"] = "Internal server error"
+        yield b'],' + self.dumps_bytes(tail)[1:] + b"\n"
@@ -0,0 +1,122 @@
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import re
+
+# Words joined by '-', '.' or '_' stay one token so error codes, versions and product names match exactly
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it me my of on or "
+    "so that the this to was what when where which who why will with you your".split()
+)
+
+# Rough cost of one posting (term -> message_id -> frequency) in the dicts below
+POSTING_BYTES = 120
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over message texts, keyed by message_id
+    Kept next to a shard's vector metadata and updated with every add and remove
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.posting_count = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, message_id: int, text: str):
+        """Index a message, replacing its previous text"""
+        self.remove(message_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[message_id] = frequency
+        self.doc_terms[message_id] = tuple(counts)
+        self.doc_lengths[message_id] = len(tokens)
+        self.total_length += len(tokens)
+        self.posting_count += len(counts)
+
+    def add_many(self, documents: Iterable[Tuple[int, str]]):
+        for message_id, text in documents:
+            self.add(message_id, text)
+
+    def remove(self, message_id: int) -> bool:
+        """Drop a message from the index; returns whether it was indexed"""
+        terms = self.doc_terms.pop(message_id, None)
+        if terms is None:
+            return False
+
+        for term in terms:
+            postings = self.postings[term]
+            del postings[message_id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(message_id)
+        self.posting_count -= len(terms)
+        return True
+
+    def search(self, query: str, k: int, accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """Top k (message_id, BM25 score) pairs for a query, optionally filtered by message_id"""
+        terms = set(tokenize(query))
+        if not terms or not self.doc_lengths:
+            return []
+
+        documents = len(self.doc_lengths)
+        average_length = self.total_length / documents or 1.0
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for message_id, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[message_id] / average_length
+                scores[message_id] = scores.get(message_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        if accept is not None:
+            scores = {message_id: score for message_id, score in scores.items() if accept(message_id)}
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the postings"""
+        return self.posting_count * POSTING_BYTES
+
+
+def matching_enough_terms(query: str, hits: List[Dict], min_fraction: float) -> List[Dict]:
+    """Hits whose text contains at least min_fraction of the query's terms (at least one)"""
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    needed = max(1, math.ceil(min_fraction * len(terms)))
+    return [hit for hit in hits if len(terms.intersection(tokenize(hit["text"]))) >= needed]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int, rrf_k: int = 60) -> List[Dict]:
+    """
+    Merge ranked result lists by message_id with reciprocal-rank fusion (sum of 1 / (rrf_k + rank))
+    Fields of every list a hit appears in are kept, so fused hits carry both similarity_score and lexical_score
+    """
+    fused: Dict[int, Dict] = {}
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            fused.setdefault(hit["message_id"], {}).update(hit)
+            scores[hit["message_id"]] = scores.get(hit["message_id"], 0.0) + 1.0 / (rrf_k + rank)
+
+    top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    return [dict(fused[message_id], fusion_score=score) for message_id, score in top]
@@ -1,109 +1,349 @@
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
-from typing import List, Optional, Dict, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Dict, Iterable
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, LatencyTracker, call_with_retries, hedged_call, is_retryable
+)
+from services.rate_limiter import get_rate_limiter
+from services.prompt_templates import prefix_cache_stats
 from config import Config
 import logging
 import json
+import threading
+import time
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of inputs accepted by a single embeddings request
+EMBEDDING_BATCH_SIZE = 2048
+
+INTENT_SYSTEM_PROMPT = """Analyze the user message and classify the intent into ONE of these categories:
+- learning: User wants to learn or understand something
+- problem_solving: User needs help solving a specific problem
+- creative: User wants to create, write, or generate something
+- analysis: User wants analysis or insights on data/topic
+- conversation: General conversation or chitchat
+- clarification: User is asking for clarification
+
+Respond with ONLY the category name, nothing else."""
+
+DOMAIN_SYSTEM_PROMPT = """Analyze the user message and classify it into ONE primary domain:
+- technology: Programming, software, hardware, IT
+- science: Physics, chemistry, biology, research
+- business: Finance, marketing, management, entrepreneurship
+- creative: Writing, art, design, music
+- education: Learning, teaching, academic topics
+- health: Medical, fitness, wellness
+- travel: Tourism, geography, culture
+- general: Everyday topics, chitchat
+
+Respond with ONLY the domain name, nothing else."""
+
+TITLE_SYSTEM_PROMPT = "Generate a short, concise title (3-6 words max) for a conversation based on the first message. Return ONLY the title, nothing else."
+
+STYLE_SYSTEM_PROMPT = """Analyze these user messages and determine:
+1. Tone: formal, casual, friendly, or professional
+2. Complexity preference: simple, medium, or advanced
+
+Return ONLY a JSON object with 'tone' and 'complexity' keys."""
+
+# Built once: every request starts with the same system message, only the user message varies
+INTENT_SYSTEM_MESSAGE = {"role": "system", "content": INTENT_SYSTEM_PROMPT}
+DOMAIN_SYSTEM_MESSAGE = {"role": "system", "content": DOMAIN_SYSTEM_PROMPT}
+TITLE_SYSTEM_MESSAGE = {"role": "system", "content": TITLE_SYSTEM_PROMPT}
+STYLE_SYSTEM_MESSAGE = {"role": "system", "content": STYLE_SYSTEM_PROMPT}
+
+# Endpoint that this thread's OpenAI calls are attributed to in the prompt token stats
+_usage_endpoint: ContextVar[str] = ContextVar('usage_endpoint', default='background')
+
+
+def set_usage_endpoint(endpoint: Optional[str]):
+    """Attribute this thread's following OpenAI calls to endpoint (None: 'background')"""
+    _usage_endpoint.set(endpoint or 'background')
+
+
+def current_usage_endpoint() -> str:
+    return _usage_endpoint.get()
+
+
+def estimate_tokens(request: Dict) -> int:
+    """Rough token estimate of a request (about 4 characters per token) plus its output budget"""
+    chars = 0
+    for message in request.get('messages') or []:
+        chars += len(str(message.get('content') or ''))
+    text_input = request.get('input')
+    if isinstance(text_input, str):
+        chars += len(text_input)
+    elif text_input:
+        chars += sum(len(text) for text in text_input)
+    return chars // 4 + int(request.get('max_tokens') or 0)
+
 
 class OpenAIService:
     """Service for OpenAI API interactions"""
 
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        # The SDK and HTTP client are imported here so that importing this module stays cheap
+        import httpx
+        from openai import OpenAI
+
+        # Keep-alive pool sized to the number of concurrent callers; retries are handled here
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=Config.OPENAI_POOL_SIZE,
+                max_keepalive_connections=Config.OPENAI_POOL_SIZE,
+                keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(Config.OPENAI_TIMEOUTS['response'], connect=Config.OPENAI_CONNECT_TIMEOUT)
+        )
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY, http_client=self.http_client, max_retries=0)
         self.embedding_model = Config.EMBEDDING_MODEL
         self.llm_model = Config.LLM_MODEL
 
+        self.breaker = CircuitBreaker(
+            failure_threshold=Config.OPENAI_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.OPENAI_BREAKER_RESET_TIMEOUT
+        )
+        self.latency = {kind: LatencyTracker() for kind in Config.OPENAI_TIMEOUTS}
+        self.rate_limiter = get_rate_limiter()
+        self.hedge_executor = ThreadPoolExecutor(max_workers=Config.OPENAI_POOL_SIZE, thread_name_prefix='openai-hedge')
+        self.counters = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0}
+        # Prompt tokens billed per call kind and per endpoint, and how many of them OpenAI
+        # served from its prompt prefix cache
+        self.prompt_tokens = {kind: {"prompt": 0, "cached": 0} for kind in Config.OPENAI_TIMEOUTS}
+        self.endpoint_prompt_tokens: Dict[str, Dict[str, int]] = {}
+        self._counters_lock = threading.Lock()
+
+    def _request(self, kind: str, create: Callable[..., Any], **kwargs) -> Any:
+        """
+        Run one API call with the circuit breaker, a per-call timeout and jittered retries
+        Every attempt first waits its turn in the process-wide priority rate limiter
+        Classification calls are optionally hedged once they run past the observed p95 latency
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"OpenAI circuit open, skipping {kind} call")
+
+        kwargs.setdefault('timeout', Config.OPENAI_TIMEOUTS[kind])
+        if 'messages' in kwargs:
+            kwargs['messages'] = list(kwargs['messages'])
+        tracker = self.latency[kind]
+        estimated_tokens = estimate_tokens(kwargs)
+
+        def attempt():
+            self.rate_limiter.acquire(kind, estimated_tokens, timeout=kwargs['timeout'])
+            started = time.monotonic()
+            result = create(**kwargs)
+            tracker.record(time.monotonic() - started)
+            usage = getattr(result, 'usage', None)
+            if usage is not None:
+                self.rate_limiter.adjust(estimated_tokens, usage.total_tokens)
+                self._record_prompt_tokens(kind, usage)
+            return result
+
+        call = attempt
+        if kind == 'classification' and Config.OPENAI_HEDGE_CLASSIFICATION:
+            hedge_after = tracker.percentile(95, min_samples=Config.OPENAI_HEDGE_MIN_SAMPLES)
+            if hedge_after is not None:
+                call = lambda: hedged_call(attempt, hedge_after, self.hedge_executor, on_hedge=lambda: self._count("hedges"))
+
+        self._count("calls")
+        try:
+            result = call_with_retries(
+                call,
+                max_retries=Config.OPENAI_MAX_RETRIES,
+                base_delay=Config.OPENAI_BACKOFF_BASE,
+                max_delay=Config.OPENAI_BACKOFF_MAX,
+                on_retry=lambda e: self._count("retries")
+            )
+        except Exception as e:
+            self._count("failures")
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_ignored()
+            raise
+
+        self.breaker.record_success()
+        return result
+
+    def chat_completion(self, kind: str, **kwargs) -> Any:
+        """Create a chat completion through the resilient request path"""
+        return self._request(kind, self.client.chat.completions.create, **kwargs)
+
+    def _count(self, name: str):
+        """Increment a call counter"""
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _record_prompt_tokens(self, kind: str, usage: Any):
+        """Add a response's prompt and cached prompt tokens (usage.prompt_tokens_details) to its kind"""
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) or 0
+        prompt = getattr(usage, 'prompt_tokens', None) or 0
+        with self._counters_lock:
+            endpoint = self.endpoint_prompt_tokens.setdefault(current_usage_endpoint(), {"prompt": 0, "cached": 0})
+            for tokens in (self.prompt_tokens[kind], endpoint):
+                tokens["prompt"] += prompt
+                tokens["cached"] += cached
+
+    def get_stats(self) -> Dict:
+        """Get circuit breaker state, call counters and per-kind latency percentiles"""
+        latency = {}
+        for kind, tracker in self.latency.items():
+            p50 = tracker.percentile(50)
+            p95 = tracker.percentile(95)
+            latency[kind] = {
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+            }
+        def summary(tokens):
+            return {
+                "prompt": tokens["prompt"],
+                "cached": tokens["cached"],
+                "uncached": tokens["prompt"] - tokens["cached"],
+                "cached_ratio": round(tokens["cached"] / tokens["prompt"], 3) if tokens["prompt"] else None
+            }
+
+        with self._counters_lock:
+            prompt_cache = {kind: summary(tokens) for kind, tokens in self.prompt_tokens.items()}
+            endpoint_prompt_cache = {endpoint: summary(tokens) for endpoint, tokens in self.endpoint_prompt_tokens.items()}
+        return {
+            "circuit_breaker": self.breaker.get_stats(),
+            "counters": dict(self.counters),
+            "latency": latency,
+            "prompt_cache": prompt_cache,
+            "prompt_cache_by_endpoint": endpoint_prompt_cache,
+            "prompt_templates": prefix_cache_stats(),
+            "rate_limiter": self.rate_limiter.get_stats()
+        }
+
     def generate_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding vector for text"""
         try:
-            response = self.client.embeddings.create(
+            response = self._request(
+                'embedding',
+                self.client.embeddings.create,
                 input=text,
                 model=self.embedding_model
             )
             return response.data[0].embedding
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
+            logger.error("Error generating embedding: %s", e)
             return None
 
+    def generate_embeddings(self, texts: List[str], kind: str = 'embedding') -> List[Optional[List[float]]]:
+        """
+        Generate embedding vectors for many texts in as few API calls as possible
+        Background jobs such as reindexing pass kind='background' to yield to user-facing calls
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            chunk = texts[start:start + EMBEDDING_BATCH_SIZE]
+            try:
+                response = self._request(
+                    kind,
+                    self.client.embeddings.create,
+                    input=chunk,
+                    model=self.embedding_model,
+                    timeout=Config.OPENAI_TIMEOUTS['background']
+                )
+                # Results carry their input position, which is not guaranteed to be ordered
+                for item in response.data:
+                    embeddings[start + item.index] = item.embedding
+            except Exception as e:
+                logger.error("Error generating embeddings batch: %s", e)
+        return embeddings
+
+    def build_intent_request(self, text: str) -> Dict:
+        """Build the chat completion request used to detect intent"""
+        return {
+            "model": self.llm_model,
+            "messages": [
+                INTENT_SYSTEM_MESSAGE,
+                {"role": "user", "content": text}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 20
+        }
+
+    def parse_intent(self, content: Optional[str]) -> str:
+        """Turn a completion into an intent label"""
+        if not content:
+            return "conversation"
+        return content.strip().lower()
+
     def detect_intent(self, text: str) -> str:
         """Detect user intent from the message"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Analyze the user message and classify the intent into ONE of these categories:
-- learning: User wants to learn or understand something
-- problem_solving: User needs help solving a specific problem
-- creative: User wants to create, write, or generate something
-- analysis: User wants analysis or insights on data/topic
-- conversation: General conversation or chitchat
-- clarification: User is asking for clarification
-
-Respond with ONLY the category name, nothing else."""
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=20
-            )
-            content = response.choices[0].message.content
-            if not content:
-                return "conversation"
-            intent = content.strip().lower()
-            return intent
+            response = self.chat_completion('classification', **self.build_intent_request(text))
+            return self.parse_intent(response.choices[0].message.content)
         except Exception as e:
-            logger.error(f"Error detecting intent: {e}")
+            logger.error("Error detecting intent: %s", e)
             return "conversation"
 
+    def build_domain_request(self, text: str) -> Dict:
+        """Build the chat completion request used to detect the domain"""
+        return {
+            "model": self.llm_model,
+            "messages": [
+                DOMAIN_SYSTEM_MESSAGE,
+                {"role": "user", "content": text}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 20
+        }
+
+    def parse_domain(self, content: Optional[str]) -> str:
+        """Turn a completion into a domain label"""
+        if not content:
+            return "general"
+        return content.strip().lower()
+
     def detect_domain(self, text: str) -> str:
         """Detect domain/topic from the message"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Analyze the user message and classify it into ONE primary domain:
-- technology: Programming, software, hardware, IT
-- science: Physics, chemistry, biology, research
-- business: Finance, marketing, management, entrepreneurship
-- creative: Writing, art, design, music
-- education: Learning, teaching, academic topics
-- health: Medical, fitness, wellness
-- travel: Tourism, geography, culture
-- general: Everyday topics, chitchat
-
-Respond with ONLY the domain name, nothing else."""
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=20
-            )
-            content = response.choices[0].message.content
-            if not content:
-                return "general"
-            domain = content.strip().lower()
-            return domain
+            response = self.chat_completion('classification', **self.build_domain_request(text))
+            return self.parse_domain(response.choices[0].message.content)
         except Exception as e:
-            logger.error(f"Error detecting domain: {e}")
+            logger.error("Error detecting domain: %s", e)
             return "general"
 
-    def generate_response(self, messages: Iterable[ChatCompletionMessageParam]) -> Optional[str]:
+    def build_title_request(self, first_message: str) -> Dict:
+        """Build the chat completion request used to title a conversation"""
+        return {
+            "model": self.llm_model,
+            "messages": [
+                TITLE_SYSTEM_MESSAGE,
+                {"role": "user", "content": first_message}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 20
+        }
+
+    def parse_title(self, content: Optional[str], first_message: str) -> str:
+        """Turn a completion into a title, falling back to the start of the first message"""
+        title = content.strip().strip('"\'') if content else ''
+        if title:
+            return title
+        return first_message[:50] + ('...' if len(first_message) > 50 else '')
+
+    def generate_title(self, first_message: str) -> str:
+        """Generate a short conversation title from the first user message"""
+        try:
+            response = self.chat_completion('background', **self.build_title_request(first_message))
+            return self.parse_title(response.choices[0].message.content, first_message)
+        except Exception as e:
+            logger.error("Error generating title: %s", e)
+            return self.parse_title(None, first_message)
+
+    def generate_response(self, messages: Iterable["ChatCompletionMessageParam"]) -> Optional[str]:
         """Generate LLM response given conversation messages"""
         try:
-            response = self.client.chat.completions.create(
+            response = self.chat_completion(
+                'response',
                 model=self.llm_model,
                 messages=messages,
                 temperature=0.7,
@@ -114,7 +354,7 @@ Respond with ONLY the domain name, nothing else."""
                 return None
             return content
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            logger.error("Error generating response: %s", e)
             return None
 
     def analyze_user_style(self, recent_messages: List[str]) -> Dict[str, str]:
@@ -124,17 +364,11 @@ Respond with ONLY the domain name, nothing else."""
 
         try:
             sample_text = "\n".join(recent_messages[-5:])
-            response = self.client.chat.completions.create(
+            response = self.chat_completion(
+                'classification',
                 model=self.llm_model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": """Analyze these user messages and determine:
-1. Tone: formal, casual, friendly, or professional
-2. Complexity preference: simple, medium, or advanced
-
-Return ONLY a JSON object with 'tone' and 'complexity' keys."""
-                    },
+                    STYLE_SYSTEM_MESSAGE,
                     {
                         "role": "user",
                         "content": sample_text
@@ -150,5 +384,18 @@ Return ONLY a JSON object with 'tone' and 'complexity' keys."""
             result = json.loads(content)
             return result
         except Exception as e:
-            logger.error(f"Error analyzing user style: {e}")
+            logger.error("Error analyzing user style: %s", e)
             return {"tone": "neutral", "complexity": "medium"}
+
+
+_openai_service: Optional[OpenAIService] = None
+_openai_service_lock = threading.Lock()
+
+
+def get_openai_service() -> OpenAIService:
+    """Get the OpenAI client shared by this process (one connection pool and circuit breaker)"""
+    global _openai_service
+    with _openai_service_lock:
+        if _openai_service is None:
+            _openai_service = OpenAIService()
+        return _openai_service
@@ -1,10 +1,22 @@
-from typing import Dict, List, Optional, cast
-from openai.types.chat import ChatCompletionMessageParam
-from services.db_service import DatabaseService
-from services.openai_service import OpenAIService
-from services.faiss_service import FAISSService
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, cast
+from concurrent.futures import ThreadPoolExecutor
+from services.db_service import get_db_service
+from services.openai_service import current_usage_endpoint, get_openai_service, set_usage_endpoint
+from services.faiss_service import get_faiss_service
+from services.title_service import get_title_service
+from services.speculation import SpeculationStats, queries_equivalent
+from services.prompt_templates import (
+    REFINEMENT_SYSTEM_PROMPT, REFINEMENT_TEMPLATE, SYSTEM_PROMPT,
+    context_block, custom_instructions_of, prefix_for, query_block
+)
 from config import Config
+from logging_config import mark_stage
 import logging
+import threading
+import time
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +25,13 @@ class PromptEngine:
     """Core engine for context-aware prompt personalization"""
 
     def __init__(self):
-        self.db = DatabaseService()
-        self.openai = OpenAIService()
-        self.faiss = FAISSService()
+        self.db = get_db_service()
+        self.openai = get_openai_service()
+        self.faiss = get_faiss_service()
+        self.titles = get_title_service()
+        # Speculative completions run here while the request thread refines the query
+        self.speculation_executor = ThreadPoolExecutor(max_workers=Config.SPECULATION_WORKERS, thread_name_prefix='speculation')
+        self.speculation = SpeculationStats()
 
     def process_user_message(self, user_id: int, message: str, conversation_id: Optional[int] = None) -> Dict:
         """
@@ -31,46 +47,44 @@ class PromptEngine:
             # Step 1: Get user profile and preferences
             user = self.db.get_user(user_id)
             if not user:
-                logger.warning(f"User {user_id} not found")
+                logger.warning("User %s not found", user_id)
                 user = {"preferences": {}}
 
-            # Step 2: Detect intent and domain
-            intent = self.openai.detect_intent(message)
-            domain = self.openai.detect_domain(message)
-
-            # Step 3: Get conversation history
-            recent_context = self.db.get_recent_context(user_id, limit=5)
+            # Step 2: Get conversation history
+            recent_context = self.db.get_conversation_history(
+                conversation_id, Config.HISTORY_MAX_MESSAGES,
+                Config.HISTORY_BLOCK_MESSAGES, Config.HISTORY_MAX_TOKENS
+            )
+            mark_stage('context')
 
-            # Step 4: Generate embedding and search similar queries
+            # Step 3: Generate embedding and search similar queries
+            # (keyword matches alone when the embedding call fails)
             embedding = self.openai.generate_embedding(message)
+            mark_stage('embedding')
             similar_queries = []
-            if embedding:
+            if Config.HYBRID_SEARCH_ENABLED:
+                similar_queries = self.faiss.search_hybrid(
+                    message,
+                    embedding,
+                    k=Config.SIMILAR_QUERIES_LIMIT,
+                    user_id=user_id,
+                    min_score=Config.SIMILARITY_MIN_SCORE
+                )
+            elif embedding:
                 similar_queries = self.faiss.search_similar(
                     embedding,
                     k=Config.SIMILAR_QUERIES_LIMIT,
-                    user_id=user_id
+                    user_id=user_id,
+                    min_score=Config.SIMILARITY_MIN_SCORE
                 )
+            mark_stage('search')
 
-            # Step 5: Build personalized prompt
-            enhanced_prompt = self.build_personalized_prompt(
-                user_message=message,
-                user_preferences=user.get('preferences', {}),
-                intent=intent,
-                domain=domain,
-                recent_context=recent_context,
-                similar_queries=similar_queries
-            )
-
-            # Step 6: Generate LLM response
-            conversation_messages = self.prepare_conversation_messages(
-                enhanced_prompt,
-                recent_context
-            )
-            response = self.openai.generate_response(conversation_messages)
-
-            # Handle case where response generation fails
-            if not response:
-                raise Exception("Failed to generate response from OpenAI")
+            # Steps 4-6: Detect intent/domain, build personalized prompt, generate response
+            turn = self._generate_turn(message, user, recent_context, similar_queries)
+            intent = turn["intent"]
+            domain = turn["domain"]
+            enhanced_prompt = turn["enhanced_prompt"]
+            response = turn["response"]
 
             # Step 7: Save to database
             user_msg_id = self.db.save_message(
@@ -84,7 +98,8 @@ class PromptEngine:
                 domain=domain,
                 metadata={
                     "similar_queries_count": len(similar_queries)
-                }
+                },
+                embedding=embedding
             )
 
             assistant_msg_id = self.db.save_message(
@@ -95,6 +110,7 @@ class PromptEngine:
                 intent=intent,
                 domain=domain
             )
+            mark_stage('save')
 
             # Step 8: Add to FAISS index (async in production)
             if embedding and user_msg_id:
@@ -107,6 +123,10 @@ class PromptEngine:
                     domain=domain
                 )
                 self.db.mark_vector_saved(user_msg_id)
+                mark_stage('index')
+
+            # Step 9: Title the conversation in the background after its first turn
+            self.titles.schedule(conversation_id)
 
             return {
                 "success": True,
@@ -123,100 +143,323 @@ class PromptEngine:
             }
 
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "response": "I encountered an error processing your request. Please try again."
-            }
+            logger.error("Error processing message: %s", e)
+            return self._error_result(str(e))
 
-    def build_personalized_prompt(
-        self,
-        user_message: str,
-        user_preferences: Dict,
-        intent: str,
-        domain: str,
-        recent_context: List[Dict],
-        similar_queries: List[Dict]
-    ) -> str:
-        """Build a personalized, context-rich prompt"""
-
-        # Extract preferences
-        tone = user_preferences.get('tone', 'professional')
-        expertise_level = user_preferences.get('expertise_level', 'intermediate')
-        preferred_domains = user_preferences.get('preferred_domains', [])
+    def process_batch(self, items: List[Dict]) -> List[Dict]:
+        """
+        Batch processing pipeline for many user messages
+        Embeddings and similarity searches run as single batched calls, completions
+        run with bounded concurrency and all messages are persisted in one insert.
+        Returns: List of per-item results in input order
+        """
+        results: List[Dict] = [{} for _ in items]
+        turns: List[Dict] = []
 
-        # Build context sections
-        prompt_parts = []
+        # Step 1: Resolve conversations
+        for index, item in enumerate(items):
+            conversation_id = item.get('conversation_id')
+            if conversation_id is None:
+                conversation_id = self.db.create_conversation(item['user_id'])
+                if not conversation_id:
+                    results[index] = self._error_result("Failed to create conversation")
+                    continue
+            turns.append({
+                "index": index,
+                "user_id": item['user_id'],
+                "message": item['message'],
+                "conversation_id": conversation_id
+            })
 
-        # User profile context
-        prompt_parts.append(f"[User Profile: {expertise_level} level, prefers {tone} tone]")
+        if not turns:
+            return results
 
-        # Domain and intent context
-        prompt_parts.append(f"[Detected Domain: {domain}, Intent: {intent}]")
+        try:
+            # Step 2: Get profiles once per distinct user and history once per conversation
+            users: Dict[int, Dict] = {}
+            contexts: Dict[int, List[Dict]] = {}
+            for turn in turns:
+                user_id = turn["user_id"]
+                if user_id not in users:
+                    users[user_id] = self.db.get_user(user_id) or {"preferences": {}}
+                if turn["conversation_id"] not in contexts:
+                    contexts[turn["conversation_id"]] = self.db.get_conversation_history(
+                        turn["conversation_id"], Config.HISTORY_MAX_MESSAGES,
+                        Config.HISTORY_BLOCK_MESSAGES, Config.HISTORY_MAX_TOKENS
+                    )
+
+            # Step 3: One embeddings call and one multi-query search for all messages
+            embeddings = self.openai.generate_embeddings([turn["message"] for turn in turns])
+            embedded = [turn for turn, embedding in zip(turns, embeddings) if embedding]
+            for turn, embedding in zip(turns, embeddings):
+                turn["embedding"] = embedding
+                turn["similar_queries"] = []
+
+            if Config.HYBRID_SEARCH_ENABLED:
+                search_results = self.faiss.search_hybrid_batch(
+                    [turn["message"] for turn in turns],
+                    [turn["embedding"] for turn in turns],
+                    k=Config.SIMILAR_QUERIES_LIMIT,
+                    user_ids=[turn["user_id"] for turn in turns],
+                    min_score=Config.SIMILARITY_MIN_SCORE
+                )
+                for turn, similar_queries in zip(turns, search_results):
+                    turn["similar_queries"] = similar_queries
+            else:
+                search_results = self.faiss.search_similar_batch(
+                    [turn["embedding"] for turn in embedded],
+                    k=Config.SIMILAR_QUERIES_LIMIT,
+                    user_ids=[turn["user_id"] for turn in embedded],
+                    min_score=Config.SIMILARITY_MIN_SCORE
+                )
+                for turn, similar_queries in zip(embedded, search_results):
+                    turn["similar_queries"] = similar_queries
+
+            # Step 4: Classification, prompt building and completions with bounded concurrency
+            endpoint = current_usage_endpoint()
+            with ThreadPoolExecutor(max_workers=Config.BATCH_CHAT_CONCURRENCY) as executor:
+                futures = [
+                    executor.submit(
+                        self._generate_turn_for,
+                        endpoint,
+                        turn["message"],
+                        users[turn["user_id"]],
+                        contexts[turn["conversation_id"]],
+                        turn["similar_queries"]
+                    )
+                    for turn in turns
+                ]
+                completed = []
+                for turn, future in zip(turns, futures):
+                    try:
+                        turn.update(future.result())
+                        completed.append(turn)
+                    except Exception as e:
+                        logger.error("Error processing batch item %s: %s", turn['index'], e)
+                        results[turn["index"]] = self._error_result(str(e))
+
+            # Step 5: Persist every user/assistant message pair in one insert
+            rows = []
+            for turn in completed:
+                rows.append({
+                    "user_id": turn["user_id"],
+                    "role": "user",
+                    "content": turn["message"],
+                    "conversation_id": turn["conversation_id"],
+                    "original_prompt": turn["message"],
+                    "enhanced_prompt": turn["enhanced_prompt"],
+                    "intent": turn["intent"],
+                    "domain": turn["domain"],
+                    "metadata": {
+                        "similar_queries_count": len(turn["similar_queries"])
+                    },
+                    "embedding": turn["embedding"]
+                })
+                rows.append({
+                    "user_id": turn["user_id"],
+                    "role": "assistant",
+                    "content": turn["response"],
+                    "conversation_id": turn["conversation_id"],
+                    "intent": turn["intent"],
+                    "domain": turn["domain"]
+                })
+            message_ids = self.db.save_messages_bulk(rows)
+            if completed and len(message_ids) != len(rows):
+                # Nothing was persisted: the responses are not part of any conversation
+                for turn in completed:
+                    results[turn["index"]] = self._error_result("Failed to save messages")
+                return results
+
+            # Step 6: Add all new vectors to FAISS at once
+            if message_ids:
+                vector_entries = [
+                    {
+                        "vector": turn["embedding"],
+                        "user_id": turn["user_id"],
+                        "message_id": message_ids[2 * position],
+                        "text": turn["message"],
+                        "intent": turn["intent"],
+                        "domain": turn["domain"]
+                    }
+                    for position, turn in enumerate(completed)
+                    if turn["embedding"]
+                ]
+                if self.faiss.add_vectors(vector_entries):
+                    self.db.mark_vectors_saved([entry["message_id"] for entry in vector_entries])
+
+            for turn in completed:
+                self.titles.schedule(turn["conversation_id"])
+                results[turn["index"]] = {
+                    "success": True,
+                    "response": turn["response"],
+                    "conversation_id": turn["conversation_id"],
+                    "original_prompt": turn["message"],
+                    "enhanced_prompt": turn["enhanced_prompt"],
+                    "metadata": {
+                        "intent": turn["intent"],
+                        "domain": turn["domain"],
+                        "similar_queries": turn["similar_queries"],
+                        "context_used": len(contexts[turn["conversation_id"]]) > 0
+                    }
+                }
+            return results
 
-        # Similar past queries context
-        if similar_queries:
-            similar_texts = [q['text'] for q in similar_queries[:2]]
-            prompt_parts.append(
-                f"[User previously asked similar questions: {', '.join(similar_texts)}]"
+        except Exception as e:
+            logger.error("Error processing batch: %s", e)
+            for turn in turns:
+                if not results[turn["index"]]:
+                    results[turn["index"]] = self._error_result(str(e))
+            return results
+
+    def _generate_turn_for(self, endpoint: str, *args) -> Dict:
+        """_generate_turn() in a worker thread, with its token usage attributed to endpoint"""
+        set_usage_endpoint(endpoint)
+        return self._generate_turn(*args)
+
+    def _generate_turn(
+        self,
+        message: str,
+        user: Dict,
+        recent_context: List[Dict],
+        similar_queries: List[Dict]
+    ) -> Dict:
+        """Detect intent and domain, build the personalized prompt and generate the response"""
+        intent = self.openai.detect_intent(message)
+        domain = self.openai.detect_domain(message)
+        mark_stage('classification')
+
+        preferences = user.get('preferences', {})
+        profile_prefix = prefix_for(preferences)
+        if Config.SPECULATIVE_COMPLETION:
+            context = context_block(domain, intent, similar_queries, recent_context, custom_instructions_of(preferences))
+            turn_prompt, response = self._speculative_completion(
+                message, domain, intent, context, profile_prefix, recent_context
             )
+        else:
+            turn_prompt = self.build_turn_prompt(
+                user_message=message,
+                user_preferences=preferences,
+                intent=intent,
+                domain=domain,
+                recent_context=recent_context,
+                similar_queries=similar_queries
+            )
+            conversation_messages = self.prepare_conversation_messages(
+                turn_prompt,
+                recent_context,
+                profile_prefix=profile_prefix
+            )
+            response = self.openai.generate_response(conversation_messages)
+        enhanced_prompt = profile_prefix + "\n" + turn_prompt
+        mark_stage('completion')
 
-        # Recent conversation context
-        if recent_context:
-            recent_topics = [ctx.get('domain', 'general') for ctx in recent_context[-3:]]
-            unique_topics = list(set(recent_topics))
-            if unique_topics:
-                prompt_parts.append(f"[Recent conversation topics: {', '.join(unique_topics)}]")
-
-        # Personalization instructions
-        instructions = []
+        # Handle case where response generation fails
+        if not response:
+            raise Exception("Failed to generate response from OpenAI")
 
-        # Check for custom instructions first
-        custom_instructions = user_preferences.get('custom_instructions', '').strip()
+        return {
+            "intent": intent,
+            "domain": domain,
+            "enhanced_prompt": enhanced_prompt,
+            "response": response
+        }
 
-        if custom_instructions:
-            # Use custom instructions if provided
-            instructions.append(custom_instructions)
+    def _speculative_completion(
+        self,
+        message: str,
+        domain: str,
+        intent: str,
+        context: str,
+        profile_prefix: str,
+        recent_context: List[Dict]
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Start the completion on the unrefined query and refine the query meanwhile
+        The speculative response is kept when the refined query is equivalent to the original
+        (SPECULATION_MAX_DISTANCE); otherwise it is cancelled and the completion restarts on the
+        refined prompt. Returns the turn prompt that produced the response, and the response
+        """
+        speculative_prompt = context + "\n" + query_block(message, message)
+        started = time.monotonic()
+        future = self.speculation_executor.submit(
+            self._timed_response,
+            current_usage_endpoint(),
+            self.prepare_conversation_messages(speculative_prompt, recent_context, profile_prefix=profile_prefix)
+        )
+
+        refined_query = self.refine_user_query(message, domain, intent)
+        refine_seconds = time.monotonic() - started
+
+        if queries_equivalent(message, refined_query, Config.SPECULATION_MAX_DISTANCE):
+            response, completion_seconds = future.result()
+            if response:
+                # Sequentially the turn would have taken refinement + completion
+                self.speculation.record_hit(min(refine_seconds, completion_seconds))
+                return speculative_prompt, response
+            self.speculation.record_failure()
         else:
-            # Fall back to default instructions based on preferences
-            if expertise_level == "beginner":
-                instructions.append("Explain concepts in simple terms with examples")
-            elif expertise_level == "advanced":
-                instructions.append("Provide detailed technical information")
-            else:
-                instructions.append("Balance detail with clarity")
-
-            if tone == "friendly":
-                instructions.append("Use a warm, approachable tone")
-            elif tone == "professional":
-                instructions.append("Maintain a professional, concise tone")
-            elif tone == "casual":
-                instructions.append("Use a relaxed, conversational tone")
+            # A call already in flight cannot be aborted; its result is dropped
+            self.speculation.record_miss(wasted=not future.cancel())
+
+        turn_prompt = context + "\n" + query_block(message, refined_query)
+        response = self.openai.generate_response(
+            self.prepare_conversation_messages(turn_prompt, recent_context, profile_prefix=profile_prefix)
+        )
+        return turn_prompt, response
+
+    def _timed_response(self, endpoint: str, messages: List["ChatCompletionMessageParam"]) -> Tuple[Optional[str], float]:
+        """generate_response() in a speculation worker; returns the response and its duration"""
+        set_usage_endpoint(endpoint)
+        started = time.monotonic()
+        response = self.openai.generate_response(messages)
+        return response, time.monotonic() - started
+
+    def get_speculation_stats(self) -> Dict:
+        """Speculative completion outcomes, hit rate and latency saved"""
+        return dict(self.speculation.snapshot(), enabled=Config.SPECULATIVE_COMPLETION)
+
+    def _error_result(self, error: str) -> Dict:
+        """Build the error payload returned for a failed message"""
+        return {
+            "success": False,
+            "error": error,
+            "response": "I encountered an error processing your request. Please try again."
+        }
 
-            if intent == "learning":
-                instructions.append("Focus on educational value and understanding")
-            elif intent == "problem_solving":
-                instructions.append("Provide actionable solutions and steps")
-            elif intent == "creative":
-                instructions.append("Be creative and offer diverse ideas")
+    def build_personalized_prompt(
+        self,
+        user_message: str,
+        user_preferences: Dict,
+        intent: str,
+        domain: str,
+        recent_context: List[Dict],
+        similar_queries: List[Dict]
+    ) -> str:
+        """
+        Build a personalized, context-rich prompt
+        The profile/instruction block comes first and is cached per (tone, expertise, custom
+        instructions), so it is byte-identical for every message with the same settings
+        """
+        return prefix_for(user_preferences) + "\n" + self.build_turn_prompt(
+            user_message, user_preferences, intent, domain, recent_context, similar_queries
+        )
 
-        prompt_parts.append(f"[Instructions: {'. '.join(instructions)}]")
+    def build_turn_prompt(
+        self,
+        user_message: str,
+        user_preferences: Dict,
+        intent: str,
+        domain: str,
+        recent_context: List[Dict],
+        similar_queries: List[Dict]
+    ) -> str:
+        """The per-message part of the prompt: detected context and the (refined) query"""
+        context = context_block(domain, intent, similar_queries, recent_context, custom_instructions_of(user_preferences))
 
         # Enhance/refine the user query
         refined_query = self.refine_user_query(user_message, domain, intent)
 
-        # Show both original and refined if they differ significantly
-        if refined_query.lower() != user_message.lower():
-            prompt_parts.append(f"\nOriginal Query: {user_message}")
-            prompt_parts.append(f"Refined Query: {refined_query}")
-        else:
-            prompt_parts.append(f"\nUser Query: {user_message}")
-
-        # Combine all parts
-        enhanced_prompt = "\n".join(prompt_parts)
-
-        return enhanced_prompt
+        return context + "\n" + query_block(user_message, refined_query)
 
     def refine_user_query(self, user_message: str, domain: str, intent: str) -> str:
         """
@@ -226,24 +469,13 @@ class PromptEngine:
         - Adding relevant context based on domain/intent
         """
         try:
-            # Use GPT to refine the query
-            refinement_prompt = f"""You are a query refinement assistant. Your job is to improve user queries by:
-1. Correcting any spelling or grammar errors
-2. Making vague questions more specific
-3. Adding relevant context when needed
-4. Keeping the core intent intact
-
-Domain: {domain}
-Intent: {intent}
-Original Query: {user_message}
-
-Provide ONLY the refined query, nothing else. If the query is already clear and has no errors, return it as-is."""
-
-            refined = self.openai.client.chat.completions.create(
+            # Constant instructions first, the per-message fields last
+            refined = self.openai.chat_completion(
+                'refinement',
                 model="gpt-4o-mini",
                 messages=[
-                    {"role": "system", "content": "You are a query refinement expert."},
-                    {"role": "user", "content": refinement_prompt}
+                    {"role": "system", "content": REFINEMENT_SYSTEM_PROMPT},
+                    {"role": "user", "content": REFINEMENT_TEMPLATE.format(domain=domain, intent=intent, query=user_message)}
                 ],
                 temperature=0.3,
                 max_tokens=150
@@ -263,33 +495,43 @@ Provide ONLY the refined query, nothing else. If the query is already clear and
             return refined_query
 
         except Exception as e:
-            logger.error(f"Error refining query: {e}")
+            logger.error("Error refining query: %s", e)
             # Fall back to original message if refinement fails
             return user_message
 
     def prepare_conversation_messages(
         self,
         enhanced_prompt: str,
-        recent_context: List[Dict]
-    ) -> List[ChatCompletionMessageParam]:
-        """Prepare messages array for OpenAI API"""
+        recent_context: List[Dict],
+        profile_prefix: Optional[str] = None
+    ) -> List["ChatCompletionMessageParam"]:
+        """
+        Prepare messages array for OpenAI API, most stable content first so OpenAI's prompt
+        cache can reuse it: the constant system prompt, the user's profile block (same for every
+        turn), the conversation history (append-only, see get_conversation_history), then the
+        per-message prompt
+        """
 
-        messages: List[ChatCompletionMessageParam] = [
-            cast(ChatCompletionMessageParam, {
+        messages: List["ChatCompletionMessageParam"] = [
+            cast("ChatCompletionMessageParam", {
                 "role": "system",
-                "content": "You are PromptSense, an intelligent assistant that provides personalized, context-aware responses. Pay attention to the user profile, intent, and context provided in the enhanced prompt."
+                "content": SYSTEM_PROMPT
             })
         ]
+        if profile_prefix:
+            messages.append(cast("ChatCompletionMessageParam", {
+                "role": "system",
+                "content": profile_prefix
+            }))
 
-        # Add recent context (last 3 exchanges)
-        for ctx in recent_context[-6:]:
-            messages.append(cast(ChatCompletionMessageParam, {
+        for ctx in recent_context:
+            messages.append(cast("ChatCompletionMessageParam", {
                 "role": ctx['role'],
                 "content": ctx['content']
             }))
 
         # Add current enhanced prompt
-        messages.append(cast(ChatCompletionMessageParam, {
+        messages.append(cast("ChatCompletionMessageParam", {
             "role": "user",
             "content": enhanced_prompt
         }))
@@ -297,22 +539,37 @@ Provide ONLY the refined query, nothing else. If the query is already clear and
         return messages
 
     def get_user_insights(self, user_id: int) -> Dict:
-        """Get insights about user's interaction patterns"""
+        """Get insights about user's interaction patterns from the per-user stats row"""
         try:
-            history = self.db.get_user_history(user_id, limit=50)
-            domains = self.db.get_user_domains(user_id, limit=10)
-
-            intents = {}
-            for msg in history:
-                if msg.get('intent'):
-                    intents[msg['intent']] = intents.get(msg['intent'], 0) + 1
+            stats = self.db.get_user_stats(user_id) or {}
+            intent_counts = stats.get('intent_counts') or {}
+            domain_counts = stats.get('domain_counts') or {}
+
+            common_domains = sorted(domain_counts, key=domain_counts.get, reverse=True)[:10]
+            common_intents = {
+                intent: intent_counts[intent]
+                for intent in sorted(intent_counts, key=intent_counts.get, reverse=True)
+            }
 
             return {
-                "total_messages": len(history),
-                "common_domains": domains,
-                "common_intents": intents,
-                "faiss_vectors": len(self.faiss.get_user_query_history(user_id))
+                "total_messages": stats.get('total_messages', 0),
+                "common_domains": common_domains,
+                "common_intents": common_intents,
+                "faiss_vectors": stats.get('vector_count', 0)
             }
         except Exception as e:
-            logger.error(f"Error getting user insights: {e}")
+            logger.error("Error getting user insights: %s", e)
             return {}
+
+
+_prompt_engine: Optional[PromptEngine] = None
+_prompt_engine_lock = threading.Lock()
+
+
+def get_prompt_engine() -> PromptEngine:
+    """Get the prompt engine shared by this process, building it on first use"""
+    global _prompt_engine
+    with _prompt_engine_lock:
+        if _prompt_engine is None:
+            _prompt_engine = PromptEngine()
+        return _prompt_engine
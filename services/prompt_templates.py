@@ -0,0 +1,111 @@
+from functools import lru_cache
+from typing import Dict, List
+
+# Sent unchanged with every response request so OpenAI's prompt-prefix cache can match it
+SYSTEM_PROMPT = (
+    "You are PromptSense, an intelligent assistant that provides personalized, context-aware responses. "
+    "Pay attention to the user profile, intent, and context provided in the enhanced prompt."
+)
+
+PROFILE_TEMPLATE = "[User Profile: {expertise_level} level, prefers {tone} tone]"
+INSTRUCTIONS_TEMPLATE = "[Instructions: {instructions}]"
+DOMAIN_TEMPLATE = "[Detected Domain: {domain}, Intent: {intent}]"
+FOCUS_TEMPLATE = "[Focus: {instruction}]"
+SIMILAR_TEMPLATE = "[User previously asked similar questions: {queries}]"
+TOPICS_TEMPLATE = "[Recent conversation topics: {topics}]"
+
+# Default instructions when the user has no custom instructions
+EXPERTISE_INSTRUCTIONS = {
+    "beginner": "Explain concepts in simple terms with examples",
+    "advanced": "Provide detailed technical information"
+}
+DEFAULT_EXPERTISE_INSTRUCTION = "Balance detail with clarity"
+TONE_INSTRUCTIONS = {
+    "friendly": "Use a warm, approachable tone",
+    "professional": "Maintain a professional, concise tone",
+    "casual": "Use a relaxed, conversational tone"
+}
+INTENT_INSTRUCTIONS = {
+    "learning": "Focus on educational value and understanding",
+    "problem_solving": "Provide actionable solutions and steps",
+    "creative": "Be creative and offer diverse ideas"
+}
+
+REFINEMENT_SYSTEM_PROMPT = """You are a query refinement expert. Your job is to improve user queries by:
+1. Correcting any spelling or grammar errors
+2. Making vague questions more specific
+3. Adding relevant context when needed
+4. Keeping the core intent intact
+
+Provide ONLY the refined query, nothing else. If the query is already clear and has no errors, return it as-is."""
+REFINEMENT_TEMPLATE = "Domain: {domain}\nIntent: {intent}\nOriginal Query: {query}"
+
+# Distinct (tone, expertise, custom instructions) prefixes kept compiled
+PREFIX_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def static_prefix(tone: str, expertise_level: str, custom_instructions: str = '') -> str:
+    """
+    Profile and instruction block; identical bytes for identical preferences, so it stays the
+    same across the turns of a conversation (the intent-specific instruction is per message)
+    """
+    if custom_instructions:
+        instructions = [custom_instructions]
+    else:
+        instructions = [EXPERTISE_INSTRUCTIONS.get(expertise_level, DEFAULT_EXPERTISE_INSTRUCTION)]
+        if tone in TONE_INSTRUCTIONS:
+            instructions.append(TONE_INSTRUCTIONS[tone])
+
+    return "\n".join([
+        PROFILE_TEMPLATE.format(expertise_level=expertise_level, tone=tone),
+        INSTRUCTIONS_TEMPLATE.format(instructions='. '.join(instructions))
+    ])
+
+
+def prefix_for(preferences: Dict) -> str:
+    """static_prefix() for a user's stored preferences"""
+    return static_prefix(
+        preferences.get('tone', 'professional'),
+        preferences.get('expertise_level', 'intermediate'),
+        custom_instructions_of(preferences)
+    )
+
+
+def custom_instructions_of(preferences: Dict) -> str:
+    return (preferences.get('custom_instructions') or '').strip()
+
+
+def context_block(
+    domain: str,
+    intent: str,
+    similar_queries: List[Dict],
+    recent_context: List[Dict],
+    custom_instructions: str = ''
+) -> str:
+    """
+    Per-message context: detected domain/intent, the intent's instruction (unless the user has
+    custom instructions), similar past queries and recent topics
+    """
+    parts = [DOMAIN_TEMPLATE.format(domain=domain, intent=intent)]
+    if not custom_instructions and intent in INTENT_INSTRUCTIONS:
+        parts.append(FOCUS_TEMPLATE.format(instruction=INTENT_INSTRUCTIONS[intent]))
+    if similar_queries:
+        parts.append(SIMILAR_TEMPLATE.format(queries=', '.join(q['text'] for q in similar_queries[:2])))
+    if recent_context:
+        # Ordered de-duplication keeps the text stable for the same history
+        topics = dict.fromkeys(ctx.get('domain') or 'general' for ctx in recent_context[-3:])
+        parts.append(TOPICS_TEMPLATE.format(topics=', '.join(topics)))
+    return "\n".join(parts)
+
+
+def query_block(user_message: str, refined_query: str) -> str:
+    """The user's query, with the refined version when refinement changed it"""
+    if refined_query.lower() != user_message.lower():
+        return f"\nOriginal Query: {user_message}\nRefined Query: {refined_query}"
+    return f"\nUser Query: {user_message}"
+
+
+def prefix_cache_stats() -> Dict:
+    info = static_prefix.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
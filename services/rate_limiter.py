@@ -0,0 +1,178 @@
+from typing import Dict, List, Optional, Tuple
+from services.resilience import LatencyTracker
+from config import Config
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first: user-facing completions, then classification,
+# then query refinement, then background work such as titles and reindexing
+KIND_PRIORITIES = {
+    'response': 0,
+    'embedding': 1,
+    'classification': 1,
+    'refinement': 2,
+    'background': 3
+}
+LOWEST_PRIORITY = max(KIND_PRIORITIES.values())
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call waited in the rate limiter queue for longer than allowed"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, per_minute: int, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        """Add the tokens accrued since the last refill"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount can be taken (requests larger than the bucket only wait for a full bucket)"""
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for OpenAI requests per minute and tokens per minute
+    Waiters are served strictly by priority, so background work never delays user-facing calls
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, burst_seconds: float):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int, str]] = []
+        self._sequence = itertools.count()
+        self.wait_times = {kind: LatencyTracker() for kind in KIND_PRIORITIES}
+        self.wait_stats = {kind: {"calls": 0, "throttled": 0, "total_wait": 0.0, "max_wait": 0.0} for kind in KIND_PRIORITIES}
+
+    def acquire(self, kind: str, tokens: int, timeout: float) -> float:
+        """Block until one request and the estimated tokens are available; returns seconds waited"""
+        if not self.requests and not self.tokens:
+            return 0.0
+
+        ticket = (KIND_PRIORITIES.get(kind, LOWEST_PRIORITY), next(self._sequence), kind)
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    delay: Optional[float] = None
+                    if self._waiters[0] == ticket:
+                        delay = self._time_until(tokens)
+                        if delay <= 0:
+                            self._consume(tokens)
+                            break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"Waited {timeout:.1f}s in the rate limiter queue for a {kind} call")
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        self._record_wait(kind, waited)
+        return waited
+
+    def adjust(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage of a call is known"""
+        if not self.tokens or actual is None:
+            return
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+            self._cond.notify_all()
+
+    def _time_until(self, tokens: int) -> float:
+        """Seconds until both buckets can serve the request"""
+        now = time.monotonic()
+        delay = 0.0
+        if self.requests:
+            self.requests.refill(now)
+            delay = max(delay, self.requests.time_until(1))
+        if self.tokens:
+            self.tokens.refill(now)
+            delay = max(delay, self.tokens.time_until(tokens))
+        return delay
+
+    def _consume(self, tokens: int):
+        """Take one request and the estimated tokens (the token bucket may go into debt)"""
+        if self.requests:
+            self.requests.level -= 1
+        if self.tokens:
+            self.tokens.level -= tokens
+
+    def _record_wait(self, kind: str, waited: float):
+        """Update queue-wait metrics for a call kind"""
+        kind = kind if kind in self.wait_stats else 'background'
+        self.wait_times[kind].record(waited)
+        with self._cond:
+            stats = self.wait_stats[kind]
+            stats["calls"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+            if waited > 0.001:
+                stats["throttled"] += 1
+
+    def get_stats(self) -> Dict:
+        """Get bucket levels, queue depth and per-kind queue-wait statistics"""
+        with self._cond:
+            queued: Dict[str, int] = {}
+            for _, _, kind in self._waiters:
+                queued[kind] = queued.get(kind, 0) + 1
+            stats = {kind: dict(values) for kind, values in self.wait_stats.items()}
+            buckets = {
+                "requests_available": round(self.requests.level, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.level) if self.tokens else None
+            }
+
+        queue_wait = {}
+        for kind, values in stats.items():
+            p95 = self.wait_times[kind].percentile(95)
+            queue_wait[kind] = {
+                "priority": KIND_PRIORITIES[kind],
+                "calls": values["calls"],
+                "throttled": values["throttled"],
+                "queued": queued.get(kind, 0),
+                "avg_wait_ms": round(values["total_wait"] / values["calls"] * 1000, 1) if values["calls"] else 0.0,
+                "p95_wait_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "max_wait_ms": round(values["max_wait"] * 1000, 1)
+            }
+        return {"buckets": buckets, "queue_wait": queue_wait}
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the limiter shared by every OpenAIService in this process"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(
+                requests_per_minute=Config.OPENAI_RPM_LIMIT,
+                tokens_per_minute=Config.OPENAI_TPM_LIMIT,
+                burst_seconds=Config.OPENAI_RATE_LIMIT_BURST_SECONDS
+            )
+        return _rate_limiter
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from typing import Callable, Dict, Optional, TypeVar
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an OpenAI error is transient (timeouts, connection errors, 429 and 5xx)"""
+    import openai  # Deferred so importing this module stays cheap
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures and probes again after a cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        # Thread running the half-open probe: only its outcome may close the circuit
+        self._probe_thread: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream; lets a single probe through after the cooldown"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            self.rejected += 1
+            return False
+
+    def _is_probe(self) -> bool:
+        return self._probe_in_flight and self._probe_thread == threading.get_ident()
+
+    def _release_probe(self):
+        self._probe_in_flight = False
+        self._probe_thread = None
+
+    def record_success(self):
+        """
+        Reset the failure count; a successful half-open probe closes the circuit
+        Successes of calls that started before the circuit opened arrive late and are ignored
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                self.consecutive_failures = 0
+            elif self._is_probe():
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                self._release_probe()
+
+    def record_failure(self):
+        """Count an upstream failure and open the circuit past the threshold"""
+        with self._lock:
+            self.consecutive_failures += 1
+            probe = self._is_probe()
+            if probe:
+                self._release_probe()
+            if probe or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %s failures", self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """Release a half-open probe whose outcome says nothing about upstream health"""
+        with self._lock:
+            if self._is_probe():
+                self._release_probe()
+
+    def get_stats(self) -> Dict:
+        """Get breaker state for monitoring"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected
+        }
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used for percentile estimates"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Add one latency sample"""
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        """Latency at percentile p, or None until enough samples exist"""
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        position = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[position]
+
+
+def call_with_retries(
+    fn: Callable[[], T],
+    max_retries: int,
+    base_delay: float,
+    max_delay: float,
+    on_retry: Optional[Callable[[Exception], None]] = None
+) -> T:
+    """Call fn, retrying transient errors with full-jitter exponential backoff"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            attempt += 1
+            if on_retry:
+                on_retry(e)
+            logger.warning("Transient OpenAI error, retry %s/%s in %.2fs: %s", attempt, max_retries, delay, e)
+            time.sleep(delay)
+
+
+def hedged_call(
+    fn: Callable[[], T],
+    hedge_after: float,
+    executor: ThreadPoolExecutor,
+    on_hedge: Optional[Callable[[], None]] = None
+) -> T:
+    """
+    Call fn and fire a second identical request if the first has not finished after hedge_after seconds
+    Returns the first successful result; the slower request is left to finish in the background
+    """
+    primary = executor.submit(fn)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    if on_hedge:
+        on_hedge()
+    pending = {primary, executor.submit(fn)}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error  # type: ignore[misc]
@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# search_batch(query_vectors, k, user_ids) -> one result list per query
+SearchBatchFn = Callable[[List, int, List[Optional[int]]], List[List[Dict]]]
+
+
+class SearchBatcher:
+    """
+    Coalesces concurrent searches into one multi-query search call
+    Queries that queue up while a search runs form the next batch; when the previous batch had company, the
+    first waiting query also opens a window and the batch runs once it closes or max_batch_size queries are queued.
+    A lone caller is never held back by the window
+    """
+
+    def __init__(self, search_batch: SearchBatchFn, max_batch_size: int, window: float):
+        self.search_batch = search_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window)
+        self._queue: List[Tuple[List[float], int, Optional[int], Future]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._last_batch_size = 0
+        self.stats = {"batches": 0, "queries": 0, "max_batch": 0}
+
+    def search(self, query_vector: List[float], k: int, user_id: Optional[int] = None, timeout: Optional[float] = None) -> List[Dict]:
+        """Queue one query and wait for its results"""
+        return self.submit(query_vector, k, user_id).result(timeout)
+
+    def submit(self, query_vector: List[float], k: int, user_id: Optional[int] = None) -> Future:
+        """Queue one query; the future resolves to its result list"""
+        future: Future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-batcher', daemon=True)
+                self._thread.start()
+            self._queue.append((query_vector, k, user_id, future))
+            self._cond.notify_all()
+        return future
+
+    def get_stats(self) -> Dict:
+        """Batch counts and average batch size"""
+        with self._cond:
+            stats = dict(self.stats)
+            queued = len(self._queue)
+        stats["avg_batch"] = round(stats["queries"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queued"] = queued
+        stats["max_batch_size"] = self.max_batch_size
+        stats["window_ms"] = round(self.window * 1000, 2)
+        return stats
+
+    def _run(self):
+        """Dispatcher loop: collect a batch, run it, repeat"""
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+
+                # Only wait for company when the traffic is concurrent
+                concurrent = len(self._queue) > 1 or self._last_batch_size > 1
+                deadline = time.monotonic() + self.window
+                while concurrent and len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._queue[:self.max_batch_size]
+                del self._queue[:self.max_batch_size]
+                self._last_batch_size = len(batch)
+
+                self.stats["batches"] += 1
+                self.stats["queries"] += len(batch)
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[List[float], int, Optional[int], Future]]):
+        """Run one batch with the largest requested k and hand each caller its own top k"""
+        k = max(item[1] for item in batch)
+        try:
+            rows = self.search_batch([item[0] for item in batch], k, [item[2] for item in batch])
+        except Exception as e:
+            logger.error("Error in batched search: %s", e)
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, query_k, _, future), row in zip(batch, rows):
+            future.set_result(row[:query_k])
@@ -0,0 +1,107 @@
+from typing import Dict
+import threading
+
+
+def within_edit_distance(a: str, b: str, max_edits: int) -> bool:
+    """
+    Whether the Levenshtein distance of a and b is at most max_edits
+    The common prefix and suffix are skipped, only the diagonal band |i - j| <= max_edits is
+    computed, and the scan stops once a whole band row exceeds max_edits
+    """
+    if abs(len(a) - len(b)) > max_edits:
+        return False
+
+    # Refinements usually touch a few words: drop the unchanged ends first
+    prefix = 0
+    shortest = min(len(a), len(b))
+    while prefix < shortest and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < shortest - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    if not a or not b:
+        return max(len(a), len(b)) <= max_edits
+
+    beyond = max_edits + 1
+    previous = [j if j <= max_edits else beyond for j in range(len(b) + 1)]
+    current = [beyond] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_edits)
+        high = min(len(b), i + max_edits)
+        current[low - 1] = i if low == 1 and i <= max_edits else beyond
+        if high == i + max_edits:
+            previous[high] = beyond  # Outside the previous row's band
+        char_a = a[i - 1]
+        row_min = current[low - 1]
+        for j in range(low, high + 1):
+            value = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if value > beyond:
+                value = beyond
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_edits:
+            return False
+        previous, current = current, previous
+    return previous[len(b)] <= max_edits
+
+
+def queries_equivalent(original: str, refined: str, max_distance: float) -> bool:
+    """
+    Whether refinement left the query essentially unchanged: a Levenshtein distance of at most
+    max_distance times the longer length, rounded down (case and whitespace are ignored)
+    The edit-distance band is that same floor(max_distance * len)
+    """
+    original = ' '.join(original.lower().split())
+    refined = ' '.join(refined.lower().split())
+    max_edits = int(max_distance * max(len(original), len(refined)))
+    return within_edit_distance(original, refined, max_edits)
+
+
+class SpeculationStats:
+    """Outcomes of speculative completions and the latency the hits saved"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_hit(self, saved_seconds: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+
+    def record_miss(self, wasted: bool):
+        """A refined query that differed; wasted when the speculative call had already started"""
+        with self._lock:
+            self.misses += 1
+            if wasted:
+                self.wasted += 1
+
+    def record_failure(self):
+        """Equivalent query but the speculative call produced no response"""
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            attempts = self.hits + self.misses + self.failures
+            return {
+                "attempts": attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failures": self.failures,
+                "wasted_completions": self.wasted,
+                "hit_rate": round(self.hits / attempts, 3) if attempts else None,
+                "latency_saved_ms": round(self.saved_seconds * 1000, 1),
+                "avg_saved_ms_per_hit": round(self.saved_seconds * 1000 / self.hits, 1) if self.hits else None
+            }
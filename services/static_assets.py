@@ -0,0 +1,41 @@
+from typing import Dict, Optional, Tuple
+from werkzeug.security import safe_join
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Hex digits of the content hash used as a static file's version
+VERSION_LENGTH = 12
+
+# path -> (mtime_ns, version); a changed file gets a new version on its next lookup
+_versions: Dict[str, Tuple[int, str]] = {}
+
+
+def asset_version(static_folder: str, filename: str) -> Optional[str]:
+    """Content hash of a static file, or None if it does not exist"""
+    path = safe_join(static_folder, filename)
+    if path is None:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _versions.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+    except OSError as e:
+        logger.error("Error hashing static file %s: %s", filename, e)
+        return None
+
+    version = digest.hexdigest()[:VERSION_LENGTH]
+    _versions[path] = (mtime, version)
+    return version
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Optional, Set
+from services.db_service import DatabaseService, GENERIC_CONVERSATION_TITLES, get_db_service
+from services.openai_service import OpenAIService, get_openai_service
+from config import Config
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TitleService:
+    """Generates conversation titles in the background, at most once per conversation"""
+
+    def __init__(self, db: Optional[DatabaseService] = None, openai_service: Optional[OpenAIService] = None):
+        self.db = db or get_db_service()
+        self.openai = openai_service or get_openai_service()
+        self.executor = ThreadPoolExecutor(max_workers=Config.TITLE_WORKERS, thread_name_prefix='title')
+        self._in_flight: Set[int] = set()
+        # Conversations already handled by this process (bounded, oldest forgotten first)
+        self._done: "OrderedDict[int, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def schedule(self, conversation_id: int) -> bool:
+        """Queue title generation unless it already ran or is running; returns True when queued"""
+        with self._lock:
+            if conversation_id in self._in_flight or conversation_id in self._done:
+                return False
+            self._in_flight.add(conversation_id)
+
+        self.executor.submit(self._generate, conversation_id)
+        return True
+
+    def is_pending(self, conversation_id: int) -> bool:
+        """Whether a title is currently being generated for the conversation"""
+        with self._lock:
+            return conversation_id in self._in_flight
+
+    def _generate(self, conversation_id: int):
+        """Generate and store a title from the first user message"""
+        done = True
+        try:
+            conversation = self.db.get_conversation(conversation_id)
+            if not conversation or conversation['title'] not in GENERIC_CONVERSATION_TITLES:
+                return
+
+            first_message = self.db.get_first_user_message(conversation_id)
+            if not first_message:
+                # Nothing to title yet; allow a later turn to schedule again
+                done = False
+                return
+
+            title = self.openai.generate_title(first_message['content'])
+            # A title set by the user in the meantime wins
+            self.db.update_conversation_title(conversation_id, title, only_if_generic=True)
+        except Exception as e:
+            logger.error("Error generating title for conversation %s: %s", conversation_id, e)
+            done = False
+        finally:
+            with self._lock:
+                self._in_flight.discard(conversation_id)
+                if done:
+                    self._done[conversation_id] = True
+                    if len(self._done) > Config.TITLE_DONE_CACHE_SIZE:
+                        self._done.popitem(last=False)
+
+
+_title_service: Optional[TitleService] = None
+_title_service_lock = threading.Lock()
+
+
+def get_title_service() -> TitleService:
+    """Get the title generator shared by this process"""
+    global _title_service
+    with _title_service_lock:
+        if _title_service is None:
+            _title_service = TitleService()
+        return _title_service
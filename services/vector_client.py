@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, Optional
+from services.faiss_service import FAISSService
+from services.vector_rpc import encode_vector
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteFAISSService(FAISSService):
+    """FAISSService that forwards every call to a vector_server.py process (FAISS_MODE=remote)"""
+
+    def __init__(self, load_in_background: bool = False, url: Optional[str] = None):
+        self.url = url or Config.VECTOR_SERVER_URL
+        self.client: Any = None
+        super().__init__(load_in_background=load_in_background, mode='remote')
+
+    def initialize_index(self):
+        """Create the keep-alive HTTP client (the server owns and loads the shards)"""
+        try:
+            import httpx
+
+            self.client = httpx.Client(
+                base_url=self.url,
+                timeout=Config.VECTOR_SERVER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=Config.WORKER_THREADS * 2,
+                    max_keepalive_connections=Config.WORKER_THREADS * 2
+                )
+            )
+            self.status = 'ready'
+            logger.info("Using vector server at %s", self.url)
+        except Exception as e:
+            logger.error("Error creating vector server client: %s", e)
+            self.status = 'error'
+        finally:
+            self._loaded.set()
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        response = self.client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def _get(self, path: str, params: Optional[Dict] = None) -> Dict:
+        response = self.client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def add_vector(
+        self,
+        vector: List[float],
+        user_id: int,
+        message_id: int,
+        text: str,
+        intent: Optional[str] = None,
+        domain: Optional[str] = None
+    ) -> bool:
+        """Add a vector to the index with metadata"""
+        return self.add_vectors([{
+            "vector": vector,
+            "user_id": user_id,
+            "message_id": message_id,
+            "text": text,
+            "intent": intent,
+            "domain": domain
+        }])
+
+    def add_vectors(self, entries: List[Dict]) -> bool:
+        """Add many vectors in one request"""
+        if not entries:
+            return True
+        if not self._ready_for_write():
+            return False
+
+        try:
+            payload = {"entries": [dict(entry, vector=encode_vector(entry["vector"])) for entry in entries]}
+            return bool(self._post('/add', payload).get("success"))
+        except Exception as e:
+            logger.error("Error adding vectors on vector server: %s", e)
+            return False
+
+    def search_similar_batch(
+        self,
+        query_vectors: List[List[float]],
+        k: int = 5,
+        user_ids: Optional[List[Optional[int]]] = None,
+        min_score: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """Search for many queries in one request"""
+        try:
+            if not query_vectors or not self.ready:
+                return [[] for _ in query_vectors]
+
+            if user_ids is None:
+                user_ids = [None] * len(query_vectors)
+
+            payload = {"min_score": min_score, "queries": [
+                {"vector": encode_vector(vector), "k": k, "user_id": user_id}
+                for vector, user_id in zip(query_vectors, user_ids)
+            ]}
+            return self._post('/search', payload)["results"]
+        except Exception as e:
+            logger.error("Error searching on vector server: %s", e)
+            return [[] for _ in query_vectors]
+
+    def search_lexical_batch(
+        self,
+        query_texts: List[str],
+        k: int = 5,
+        user_ids: Optional[List[Optional[int]]] = None
+    ) -> List[List[Dict]]:
+        """Keyword search for many queries in one request"""
+        try:
+            if not query_texts or not self.ready:
+                return [[] for _ in query_texts]
+
+            if user_ids is None:
+                user_ids = [None] * len(query_texts)
+
+            payload = {"k": k, "queries": [
+                {"text": text, "user_id": user_id}
+                for text, user_id in zip(query_texts, user_ids)
+            ]}
+            return self._post('/search_lexical', payload)["results"]
+        except Exception as e:
+            logger.error("Error in lexical search on vector server: %s", e)
+            return [[] for _ in query_texts]
+
+    def get_user_query_history(self, user_id: int, limit: int = 10) -> List[Dict]:
+        """Get user's query history from the server's metadata"""
+        if not self.ready:
+            return []
+
+        try:
+            return self._get('/history', {"user_id": user_id, "limit": limit})["history"]
+        except Exception as e:
+            logger.error("Error getting user query history from vector server: %s", e)
+            return []
+
+    def remove_vectors(self, user_id: int, message_ids: List[int]) -> int:
+        """Delete the vectors of some of a user's messages; returns the number removed"""
+        if not message_ids or not self._ready_for_write():
+            return 0
+
+        try:
+            return int(self._post('/remove', {"user_id": user_id, "message_ids": list(message_ids)})["removed"])
+        except Exception as e:
+            logger.error("Error removing vectors on vector server: %s", e)
+            return 0
+
+    def clear_user_vectors(self, user_id: int):
+        """Clear all vectors for a specific user"""
+        if not self._ready_for_write():
+            return False
+
+        try:
+            return bool(self._post('/clear_user', {"user_id": user_id}).get("success"))
+        except Exception as e:
+            logger.error("Error clearing user vectors on vector server: %s", e)
+            return False
+
+    def save_index(self):
+        """Ask the server to save its shards"""
+        if not self.ready:
+            return False
+
+        try:
+            return bool(self._post('/save', {}).get("success"))
+        except Exception as e:
+            logger.error("Error saving vector server index: %s", e)
+            return False
+
+    def get_index_stats(self) -> Dict:
+        """Get statistics from the server"""
+        stats: Dict[str, Any] = {"status": self.status, "mode": "remote", "server": self.url}
+        if not self.ready:
+            return stats
+
+        try:
+            stats["server_stats"] = self._get('/stats')
+        except Exception as e:
+            logger.error("Error getting vector server stats: %s", e)
+            stats["server_stats"] = None
+        return stats
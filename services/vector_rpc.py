@@ -0,0 +1,137 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Sequence
+from services.search_batcher import SearchBatcher
+from services.faiss_service import above_min_score
+import base64
+import json
+import logging
+
+if TYPE_CHECKING:
+    from services.faiss_service import FAISSService
+
+logger = logging.getLogger(__name__)
+
+
+def encode_vector(vector: Sequence[float]) -> str:
+    """Pack a vector as base64 float32 (native byte order: client and server share the host)"""
+    return base64.b64encode(array('f', vector).tobytes()).decode('ascii')
+
+
+def decode_vector(data: str) -> Any:
+    """Unpack a vector sent with encode_vector"""
+    import numpy as np  # type: ignore  # Only the server process decodes
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+class VectorRequestHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP access to the FAISSService owned by the vector server process"""
+
+    protocol_version = 'HTTP/1.1'
+    service: "FAISSService"
+    batcher: SearchBatcher
+
+    def do_GET(self):
+        """Health, statistics and query history"""
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        try:
+            if url.path == '/health':
+                self._reply(200 if self.service.ready else 503, {"status": self.service.status})
+            elif url.path == '/stats':
+                stats = self.service.get_index_stats()
+                stats["search_batcher"] = self.batcher.get_stats()
+                self._reply(200, stats)
+            elif url.path == '/history':
+                history = self.service.get_user_query_history(
+                    int(params['user_id'][0]),
+                    int(params.get('limit', ['10'])[0])
+                )
+                self._reply(200, {"history": history})
+            else:
+                self._reply(404, {"error": "Not found"})
+        except (KeyError, ValueError) as e:
+            self._reply(400, {"error": f"Invalid request: {e}"})
+        except Exception as e:
+            logger.error("Error handling %s: %s", url.path, e)
+            self._reply(500, {"error": "Internal server error"})
+
+    def do_POST(self):
+        """Vector and keyword search, add, remove, clear and save"""
+        routes = {
+            '/search': self._search,
+            '/search_lexical': self._search_lexical,
+            '/add': self._add,
+            '/remove': self._remove,
+            '/clear_user': self._clear_user,
+            '/save': self._save
+        }
+        path = urlparse(self.path).path
+        handler = routes.get(path)
+        if handler is None:
+            self._reply(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            self._reply(200, handler(body))
+        except (KeyError, ValueError, TypeError) as e:
+            self._reply(400, {"error": f"Invalid request: {e}"})
+        except Exception as e:
+            logger.error("Error handling %s: %s", path, e)
+            self._reply(500, {"error": "Internal server error"})
+
+    def _search(self, body: Dict) -> Dict:
+        """Queue every query with the batcher so concurrent requests share one index search"""
+        futures = [
+            self.batcher.submit(decode_vector(query["vector"]), int(query.get("k", 5)), query.get("user_id"))
+            for query in body["queries"]
+        ]
+        min_score = body.get("min_score")
+        return {"results": [above_min_score(future.result(), min_score) for future in futures]}
+
+    def _search_lexical(self, body: Dict) -> Dict:
+        queries = body["queries"]
+        return {"results": self.service.search_lexical_batch(
+            [query["text"] for query in queries],
+            int(body.get("k", 5)),
+            [query.get("user_id") for query in queries]
+        )}
+
+    def _add(self, body: Dict) -> Dict:
+        entries = [dict(entry, vector=decode_vector(entry["vector"])) for entry in body["entries"]]
+        return {"success": self.service.add_vectors(entries)}
+
+    def _remove(self, body: Dict) -> Dict:
+        return {"removed": self.service.remove_vectors(int(body["user_id"]), [int(i) for i in body["message_ids"]])}
+
+    def _clear_user(self, body: Dict) -> Dict:
+        return {"success": self.service.clear_user_vectors(int(body["user_id"]))}
+
+    def _save(self, body: Dict) -> Dict:
+        return {"success": self.service.save_index()}
+
+    def _reply(self, status: int, payload: Dict):
+        """Send a JSON response on the kept-alive connection"""
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args):
+        logger.debug(format % args)
+
+
+def make_server(service: "FAISSService", host: str, port: int, max_batch_size: int, window: float) -> ThreadingHTTPServer:
+    """HTTP server bound to one FAISSService, coalescing concurrent searches with its batcher"""
+    batcher = service.search_batcher or SearchBatcher(service.search_similar_batch, max_batch_size, window)
+    batcher.max_batch_size = max(1, max_batch_size)
+    batcher.window = max(0.0, window)
+    handler = type('BoundVectorRequestHandler', (VectorRequestHandler,), {"service": service, "batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
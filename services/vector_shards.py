@@ -0,0 +1,816 @@
+import faiss  # type: ignore
+import numpy as np  # type: ignore
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from services.lexical_index import LexicalIndex
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer lock is not enforced
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+WRITER_LOCK_FILE = 'writer.lock'
+CODEC_FILE = 'codec.index'
+
+# 'flat' stores float32 vectors; the others are compressed codes, with the float32 vectors
+# kept in a memory-mapped file next to the shard for exact re-ranking
+INDEX_TYPES = ('flat', 'fp16', 'sq8', 'pq')
+
+# Index types whose codes need a codec trained on sample vectors
+TRAINED_INDEX_TYPES = ('sq8', 'pq')
+
+# Rough per-vector cost of a metadata entry besides its text
+METADATA_OVERHEAD_BYTES = 200
+
+# Per-vector cost of the id and reverse id map kept by IndexIDMap2
+ID_MAP_BYTES = 24
+
+# Per-vector cost of the message_id -> row map of full-precision vectors
+ROW_MAP_BYTES = 100
+
+# Rows copied at a time when writing full-precision vectors
+COPY_CHUNK_ROWS = 4096
+
+# Readers map the flat vector storage of snapshots instead of copying it, so every worker
+# shares the same page cache (flat and quantized indexes need IO_FLAG_MMAP_IFC, from faiss 1.11)
+MMAP_FLAT_FLAG = getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+READER_IO_FLAGS = faiss.IO_FLAG_MMAP | MMAP_FLAT_FLAG | getattr(faiss, 'IO_FLAG_READ_ONLY', 0)
+
+
+def atomic_write_json(path: str, data: Any):
+    """Write JSON to a temporary file and move it into place"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def new_codes_index(dimension: int, metric: str = 'cosine', index_type: str = 'flat', pq_m: int = 64) -> Any:
+    """Empty (untrained for sq8/pq) index storing vectors as index_type codes"""
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == 'cosine' else faiss.METRIC_L2
+    if index_type == 'fp16':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss_metric)
+    if index_type == 'sq8':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+    if index_type == 'pq':
+        return faiss.IndexPQ(dimension, pq_m, 8, faiss_metric)
+    if metric == 'cosine':
+        return faiss.IndexFlatIP(dimension)
+    return faiss.IndexFlatL2(dimension)
+
+
+def new_index(dimension: int, metric: str = 'cosine', codec: Any = None) -> Any:
+    """
+    Empty index addressed by message_id ('cosine': inner product over normalized vectors)
+    With a codec (an empty trained or training-free codes index) new shards share its encoding
+    """
+    if codec is not None:
+        return faiss.IndexIDMap2(faiss.clone_index(codec))
+    return faiss.IndexIDMap2(new_codes_index(dimension, metric))
+
+
+def index_metric(index: Any) -> str:
+    """Metric a shard index was built with"""
+    return 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+
+
+def index_type(index: Any) -> str:
+    """Vector encoding of a shard index (one of INDEX_TYPES)"""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexPQ):
+        return 'pq'
+    if isinstance(inner, faiss.IndexScalarQuantizer):
+        return 'fp16' if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'sq8'
+    return 'flat'
+
+
+def code_bytes(index: Any) -> int:
+    """Bytes stored per vector by a shard index"""
+    return faiss.downcast_index(index.index).code_size
+
+
+def normalized(vectors: Sequence) -> np.ndarray:
+    """float32 copy of the vectors scaled to unit length"""
+    array = np.array(vectors, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(array)
+    return array
+
+
+class FullPrecisionVectors:
+    """
+    float32 copies of a quantized shard's vectors, used to re-rank its approximate hits
+    Saved rows are memory-mapped from the shard's snapshot; rows added since are held in memory until the next save
+    """
+
+    def __init__(self, dimension: int, ids: Optional[np.ndarray] = None, vectors: Optional[np.ndarray] = None):
+        self.dimension = dimension
+        self.vectors = vectors if vectors is not None else np.zeros((0, dimension), dtype=np.float32)
+        self.rows: Dict[int, int] = {int(message_id): row for row, message_id in enumerate(ids if ids is not None else [])}
+        self.pending: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, dimension: int, vectors_path: str, ids_path: str) -> "FullPrecisionVectors":
+        ids = np.load(ids_path)
+        vectors = np.load(vectors_path, mmap_mode='r') if len(ids) else None
+        return cls(dimension, ids, vectors)
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.pending)
+
+    def add(self, message_ids: Sequence[int], vectors: np.ndarray):
+        for message_id, vector in zip(message_ids, vectors):
+            self.rows.pop(int(message_id), None)
+            self.pending[int(message_id)] = np.array(vector, dtype=np.float32)
+
+    def remove(self, message_ids: Sequence[int]):
+        for message_id in message_ids:
+            self.rows.pop(int(message_id), None)
+            self.pending.pop(int(message_id), None)
+
+    def get(self, message_ids: Sequence[int]) -> Optional[np.ndarray]:
+        """Vectors of the given messages in order, or None if any is missing"""
+        vectors = np.empty((len(message_ids), self.dimension), dtype=np.float32)
+        for position, message_id in enumerate(message_ids):
+            vector = self.pending.get(int(message_id))
+            if vector is None:
+                row = self.rows.get(int(message_id))
+                if row is None:
+                    return None
+                vector = self.vectors[row]
+            vectors[position] = vector
+        return vectors
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All message ids and their vectors (loaded into memory)"""
+        message_ids = np.array(list(self.rows) + list(self.pending), dtype=np.int64)
+        return message_ids, self.get(message_ids) if len(message_ids) else np.zeros((0, self.dimension), dtype=np.float32)
+
+    def save(self, vectors_path: str, ids_path: str):
+        """Write every row to new files and map them in place of the old ones"""
+        saved = list(self.rows.items())
+        message_ids = np.array([message_id for message_id, _ in saved] + list(self.pending), dtype=np.int64)
+
+        tmp_path = f"{vectors_path}.tmp"
+        if len(message_ids):
+            # Copied in chunks so a large shard is never read into memory at once
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(len(message_ids), self.dimension))
+            for start in range(0, len(saved), COPY_CHUNK_ROWS):
+                rows = [row for _, row in saved[start:start + COPY_CHUNK_ROWS]]
+                out[start:start + len(rows)] = self.vectors[rows]
+            for position, vector in enumerate(self.pending.values(), start=len(saved)):
+                out[position] = vector
+            out.flush()
+            del out
+        else:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.zeros((0, self.dimension), dtype=np.float32))
+        os.replace(tmp_path, vectors_path)
+
+        with open(f"{ids_path}.tmp", 'wb') as f:
+            np.save(f, message_ids)
+        os.replace(f"{ids_path}.tmp", ids_path)
+
+        self.vectors = np.load(vectors_path, mmap_mode='r') if len(message_ids) else np.zeros((0, self.dimension), dtype=np.float32)
+        self.rows = {int(message_id): row for row, message_id in enumerate(message_ids)}
+        self.pending = {}
+
+    def memory_bytes(self) -> int:
+        """Resident size: the row map and unsaved vectors (saved rows stay in the page cache)"""
+        return len(self.rows) * ROW_MAP_BYTES + len(self.pending) * (self.dimension * 4 + ROW_MAP_BYTES)
+
+
+class VectorShard:
+    """
+    One bucket of users: a FAISS index keyed by message_id, the metadata of its vectors
+    and a BM25 index over their texts (rebuilt from the metadata when the shard loads)
+    With re-ranking on (rerank_factor > 1) quantized shards also keep full-precision vectors and
+    re-rank rerank_factor times more candidates with them
+    """
+
+    def __init__(
+        self,
+        shard_id: int,
+        index: Any,
+        metadata: Dict[int, Dict],
+        generation: int = 0,
+        mmapped: bool = False,
+        full: Optional[FullPrecisionVectors] = None,
+        rerank_factor: int = 0
+    ):
+        self.shard_id = shard_id
+        self.index = index
+        self.metadata = metadata
+        self.generation = generation
+        self.mmapped = mmapped
+        self.metric = index_metric(index)
+        self.index_type = index_type(index)
+        self.rerank_factor = rerank_factor
+        if full is None and self.keeps_full_vectors():
+            full = FullPrecisionVectors(index.d)
+        self.full = full
+        self.lock = threading.RLock()
+        self.pins = 0
+        self.dirty = False
+        self.unsaved_additions = 0
+        self.metadata_bytes = sum(self._entry_bytes(entry) for entry in metadata.values())
+        self.lexical = LexicalIndex()
+        self.lexical.add_many((message_id, entry.get('text') or '') for message_id, entry in metadata.items())
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def keeps_full_vectors(self) -> bool:
+        """Whether the shard needs float32 copies of its vectors (quantized and re-ranking)"""
+        return self.index_type != 'flat' and self.rerank_factor > 1
+
+    def _has_all_full_vectors(self) -> bool:
+        return self.full is not None and len(self.full) == self.index.ntotal
+
+    def memory_bytes(self) -> int:
+        """Approximate private resident size (mapped vectors live in the shared page cache)"""
+        vector_bytes = 0 if self.mmapped else code_bytes(self.index)
+        full_bytes = self.full.memory_bytes() if self.full is not None else 0
+        return self.index.ntotal * (vector_bytes + ID_MAP_BYTES) + self.metadata_bytes + self.lexical.memory_bytes() + full_bytes
+
+    def add(self, vectors: Sequence, entries: List[Dict]):
+        """Add vectors and their metadata, replacing any vector already stored for a message"""
+        self.remove([entry["message_id"] for entry in entries])
+        vectors = normalized(vectors) if self.metric == 'cosine' else np.asarray(vectors, dtype=np.float32)
+        message_ids = np.array([entry["message_id"] for entry in entries], dtype=np.int64)
+        self.index.add_with_ids(vectors, message_ids)
+        if self.full is not None:
+            self.full.add(message_ids, vectors)
+        for entry in entries:
+            self.metadata[entry["message_id"]] = entry
+            self.metadata_bytes += self._entry_bytes(entry)
+            self.lexical.add(entry["message_id"], entry.get('text') or '')
+        self.dirty = True
+        self.unsaved_additions += len(entries)
+
+    def remove(self, message_ids: List[int]) -> int:
+        """Delete vectors by message_id; returns the number removed"""
+        present = [message_id for message_id in message_ids if message_id in self.metadata]
+        if not present:
+            return 0
+
+        self.index.remove_ids(np.array(present, dtype=np.int64))
+        if self.full is not None:
+            self.full.remove(present)
+        for message_id in present:
+            self.metadata_bytes -= self._entry_bytes(self.metadata.pop(message_id))
+            self.lexical.remove(message_id)
+        self.dirty = True
+        return len(present)
+
+    def remove_user(self, user_id: int) -> int:
+        """Delete every vector of one user; returns the number removed"""
+        return self.remove([message_id for message_id, meta in self.metadata.items() if meta['user_id'] == user_id])
+
+    def search(self, query_vectors: Sequence, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the shard with n query vectors; returns cosine similarities (higher is closer) and message ids
+        L2 shards hold unit-length embeddings, so their squared distances convert exactly (cos = 1 - d / 2)
+        """
+        queries = normalized(query_vectors)
+        k = min(k, self.index.ntotal)
+        if self.full is not None and self.rerank_factor > 1:
+            scores, ids = self.index.search(queries, min(k * self.rerank_factor, self.index.ntotal))
+            scores, ids = self._rerank(queries, scores, ids, k)
+        else:
+            scores, ids = self.index.search(queries, k)
+        if self.metric == 'l2':
+            scores = 1 - scores / 2
+        return scores, ids
+
+    def _rerank(self, queries: np.ndarray, scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score approximate candidates exactly with the full-precision vectors and keep the top k"""
+        top_scores = np.zeros((len(queries), k), dtype=np.float32)
+        top_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, row_ids) in enumerate(zip(queries, ids)):
+            candidates = row_ids[row_ids != -1]
+            vectors = self.full.get(candidates)
+            if vectors is None:  # Vectors missing from an older snapshot: keep the approximate order
+                top_scores[row], top_ids[row] = scores[row, :k], ids[row, :k]
+                continue
+
+            if self.metric == 'cosine':
+                exact = vectors @ query
+                order = np.argsort(-exact)[:k]
+            else:
+                exact = ((vectors - query) ** 2).sum(axis=1)
+                order = np.argsort(exact)[:k]
+            top_scores[row, :len(order)] = exact[order]
+            top_ids[row, :len(order)] = candidates[order]
+        return top_scores, top_ids
+
+    def vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Message ids and float32 vectors of the shard: exact for flat shards and from the full-precision
+        copies when every vector has one, otherwise decoded from the quantized codes
+        """
+        if self._has_all_full_vectors():
+            return self.full.items()
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        if not len(ids):
+            return ids, np.zeros((0, self.index.d), dtype=np.float32)
+        return ids, self.index.index.reconstruct_n(0, self.index.ntotal)
+
+    def iter_vectors(self, chunk_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Like vectors(), in chunks of at most chunk_rows read from the (possibly memory-mapped) storage"""
+        if self._has_all_full_vectors():
+            ids = np.array(list(self.full.rows) + list(self.full.pending), dtype=np.int64)
+            for start in range(0, len(ids), chunk_rows):
+                yield ids[start:start + chunk_rows], self.full.get(ids[start:start + chunk_rows])
+            return
+
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        for start in range(0, len(ids), chunk_rows):
+            count = min(chunk_rows, len(ids) - start)
+            yield ids[start:start + count], self.index.index.reconstruct_n(start, count)
+
+    def rebuild(self, index: Any):
+        """Move the shard's vectors into another empty index (metric and encoding come from the new index)"""
+        ids, vectors = self.vectors()
+        self.index = index
+        self.metric = index_metric(index)
+        self.index_type = index_type(index)
+        self.full = FullPrecisionVectors(index.d) if self.keeps_full_vectors() else None
+        self.mmapped = False
+        if len(ids):
+            if self.metric == 'cosine':
+                vectors = normalized(vectors)
+            self.index.add_with_ids(vectors, ids)
+            if self.full is not None:
+                self.full.add(ids, vectors)
+        self.dirty = True
+
+    def search_lexical(self, query: str, k: int, user_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """BM25 search of the shard's texts; returns (message_id, score) pairs, optionally for one user"""
+        if user_id:
+            return self.lexical.search(query, k, lambda message_id: self.metadata[message_id]['user_id'] == user_id)
+        return self.lexical.search(query, k)
+
+    def _entry_bytes(self, entry: Dict) -> int:
+        return len(entry.get('text') or '') + METADATA_OVERHEAD_BYTES
+
+
+class ShardedVectorStore:
+    """
+    User-hash sharded FAISS storage: one small index + metadata file pair per bucket
+    Shards load on first access and stay resident in an LRU bounded by a memory budget;
+    dirty shards are flushed to disk when evicted
+
+    Shards created by the store use its metric and index type (recorded in the manifest); shards
+    built differently keep working until convert() rebuilds them. With re-ranking on, quantized
+    shards keep their float32 vectors in .npy files next to the index, memory-mapped
+
+    Every save publishes a new generation of the shard's files and then switches the manifest
+    to it atomically. Only one writer may own a directory; read-only stores (other worker
+    processes) memory-map the published files and swap in new generations as they appear
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shard_count: int,
+        dimension: int,
+        memory_budget_bytes: int,
+        read_only: bool = False,
+        reload_interval: float = 1.0,
+        metric: str = 'cosine',
+        index_type: str = 'flat',
+        rerank_factor: int = 0
+    ):
+        self.directory = directory
+        self.dimension = dimension
+        self.memory_budget_bytes = memory_budget_bytes
+        self.read_only = read_only
+        self.reload_interval = reload_interval
+        self.rerank_factor = rerank_factor
+        self._codec_index: Any = None
+        self._codec_missing_logged = False
+        os.makedirs(directory, exist_ok=True)
+
+        self._writer_lock_file = None if read_only else self._acquire_writer_lock()
+        if read_only and not MMAP_FLAT_FLAG:
+            logger.warning(
+                "faiss %s cannot memory-map flat or quantized indexes (IO_FLAG_MMAP_IFC needs faiss 1.11+); "
+                "every reader process will load its own copy of the vectors", faiss.__version__
+            )
+
+        self._manifest_lock = threading.Lock()
+        self._manifest_mtime: Optional[int] = None
+        self._manifest_checked = time.monotonic()
+        self.manifest = self._load_manifest(shard_count, metric, index_type)
+        self.shard_count = self.manifest['shard_count']
+
+        self._resident: "OrderedDict[int, VectorShard]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+        self.swaps = 0
+
+    def shard_id_for_user(self, user_id: int) -> int:
+        """Bucket a user's vectors live in"""
+        return user_id % self.shard_count
+
+    def shard_ids(self) -> List[int]:
+        """Shards that hold vectors on disk or in memory"""
+        with self._lock:
+            self._refresh_if_due()
+        with self._manifest_lock:
+            ids = {int(shard_id) for shard_id, info in self.manifest['shards'].items() if info.get('ntotal')}
+        with self._lock:
+            ids.update(shard_id for shard_id, shard in self._resident.items() if shard.ntotal)
+        return sorted(ids)
+
+    @contextmanager
+    def use(self, shard_id: int) -> Iterator[VectorShard]:
+        """Pin a shard (loading it if needed) and hold its lock while in use"""
+        with self._lock:
+            self._refresh_if_due()
+            shard = self._resident.get(shard_id)
+            if shard is None:
+                shard = self._load_shard(shard_id)
+                self._resident[shard_id] = shard
+            self._resident.move_to_end(shard_id)
+            shard.pins += 1
+
+        try:
+            with shard.lock:
+                yield shard
+        finally:
+            with self._lock:
+                shard.pins -= 1
+                self._evict_over_budget()
+
+    def save_shard(self, shard: VectorShard):
+        """Write a shard as a new generation and publish it through the manifest"""
+        if self.read_only:
+            raise RuntimeError("Read-only vector store cannot save shards")
+
+        with self._manifest_lock:
+            generation = self.manifest.get('generation', 0) + 1
+            self.manifest['generation'] = generation
+
+        index_path, metadata_path = self._shard_paths(shard.shard_id, generation)
+        faiss.write_index(shard.index, f"{index_path}.tmp")
+        os.replace(f"{index_path}.tmp", index_path)
+        atomic_write_json(metadata_path, list(shard.metadata.values()))
+        if shard.full is not None:
+            shard.full.save(*self._vector_paths(shard.shard_id, generation))
+        shard.generation = generation
+        shard.dirty = False
+        shard.unsaved_additions = 0
+
+        with self._manifest_lock:
+            previous = self._generation(shard.shard_id)
+            self.manifest['shards'][str(shard.shard_id)] = {"ntotal": shard.ntotal, "generation": generation}
+            atomic_write_json(os.path.join(self.directory, MANIFEST_FILE), self.manifest)
+
+        # Readers that have not swapped yet may still open the previous generation
+        self._remove_old_generations(shard.shard_id, keep={generation, previous})
+
+    def flush(self):
+        """Save every dirty resident shard"""
+        if self.read_only:
+            return
+        with self._lock:
+            shards = list(self._resident.values())
+        for shard in shards:
+            with shard.lock:
+                if shard.dirty:
+                    self.save_shard(shard)
+
+    def published_shards(self) -> Dict[int, Dict]:
+        """Vector count and generation of every shard in the current manifest"""
+        with self._manifest_lock:
+            return {int(shard_id): dict(info) for shard_id, info in self.manifest['shards'].items()}
+
+    def total_vectors(self) -> int:
+        """Vectors across all shards, without loading any"""
+        with self._lock:
+            self._refresh_if_due()
+        with self._manifest_lock:
+            on_disk = {int(shard_id): info.get('ntotal', 0) for shard_id, info in self.manifest['shards'].items()}
+        with self._lock:
+            for shard_id, shard in self._resident.items():
+                on_disk[shard_id] = shard.ntotal
+        return sum(on_disk.values())
+
+    def get_stats(self) -> Dict:
+        """Residency statistics"""
+        with self._lock:
+            resident_bytes = sum(shard.memory_bytes() for shard in self._resident.values())
+            resident = len(self._resident)
+        return {
+            "mode": "reader" if self.read_only else "writer",
+            "metric": self.metric,
+            "index_type": self.index_type,
+            "rerank_factor": self.rerank_factor,
+            "generation": self.manifest.get('generation', 0),
+            "shard_count": self.shard_count,
+            "resident_shards": resident,
+            "resident_mb": round(resident_bytes / (1024 * 1024), 2),
+            "memory_budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 2),
+            "shard_loads": self.loads,
+            "shard_evictions": self.evictions,
+            "snapshot_swaps": self.swaps
+        }
+
+    @property
+    def metric(self) -> str:
+        """Metric of new shards (stores created before metrics were recorded are 'l2')"""
+        return self.manifest.get('metric', 'l2')
+
+    @property
+    def index_type(self) -> str:
+        """Vector encoding of new shards"""
+        return self.manifest.get('index_type', 'flat')
+
+    def convert(
+        self,
+        metric: Optional[str] = None,
+        index_type: Optional[str] = None,
+        train_size: int = 20000,
+        pq_m: int = 64
+    ) -> int:
+        """
+        Rebuild every shard with another metric and/or index type and record them for new shards
+        sq8 and pq first train a codec on up to train_size stored vectors; returns the shards converted
+        """
+        if self.read_only:
+            raise RuntimeError("Read-only vector store cannot convert shards")
+
+        metric = metric or self.metric
+        index_type = index_type or self.index_type
+        codec = new_codes_index(self.dimension, metric, index_type, pq_m)
+        if index_type in TRAINED_INDEX_TYPES:
+            sample = self._training_sample(train_size)
+            codec.train(normalized(sample) if metric == 'cosine' else sample)
+            codec_path = os.path.join(self.directory, CODEC_FILE)
+            faiss.write_index(codec, f"{codec_path}.tmp")
+            os.replace(f"{codec_path}.tmp", codec_path)
+
+        converted = 0
+        for shard_id in self.shard_ids():
+            with self.use(shard_id) as shard:
+                # Trained shards are re-encoded with the new codec even if their type is unchanged
+                if shard.metric != metric or shard.index_type != index_type or index_type in TRAINED_INDEX_TYPES:
+                    shard.rerank_factor = self.rerank_factor
+                    shard.rebuild(faiss.IndexIDMap2(faiss.clone_index(codec)))
+                    self.save_shard(shard)
+                    converted += 1
+
+        with self._manifest_lock:
+            self.manifest['metric'] = metric
+            self.manifest['index_type'] = index_type
+            atomic_write_json(os.path.join(self.directory, MANIFEST_FILE), self.manifest)
+        self._codec_index = None
+        return converted
+
+    def _training_sample(self, train_size: int) -> np.ndarray:
+        """Up to train_size stored vectors drawn evenly from every shard"""
+        total = max(self.total_vectors(), 1)
+        rng = np.random.default_rng(0)
+        samples = []
+        for shard_id in self.shard_ids():
+            with self.use(shard_id) as shard:
+                _, vectors = shard.vectors()
+            take = min(len(vectors), -(-train_size * len(vectors) // total))
+            samples.append(vectors[rng.choice(len(vectors), take, replace=False)])
+        if not samples:
+            raise ValueError("No stored vectors to train the codec on")
+        return np.ascontiguousarray(np.concatenate(samples), dtype=np.float32)
+
+    def import_legacy(self, index_path: str, metadata_path: str) -> int:
+        """Split a monolithic index and metadata file into shards; returns the vectors imported"""
+        index = faiss.read_index(index_path)
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        if index.ntotal == 0:
+            return 0
+
+        vectors = index.reconstruct_n(0, index.ntotal)
+        positions_by_shard: Dict[int, List[int]] = {}
+        for position, meta in enumerate(metadata[:index.ntotal]):
+            positions_by_shard.setdefault(self.shard_id_for_user(meta['user_id']), []).append(position)
+
+        for shard_id, positions in positions_by_shard.items():
+            with self.use(shard_id) as shard:
+                entries = [self._entry(metadata[position]) for position in positions]
+                shard.add(np.ascontiguousarray(vectors[positions]), entries)
+                self.save_shard(shard)
+
+        return sum(len(positions) for positions in positions_by_shard.values())
+
+    def _load_shard(self, shard_id: int) -> VectorShard:
+        """Read the published generation of a shard, or start an empty one"""
+        generation = self._generation(shard_id)
+        index_path, metadata_path = self._shard_paths(shard_id, generation)
+        self.loads += 1
+        if os.path.exists(index_path) and os.path.exists(metadata_path):
+            try:
+                if self.read_only:
+                    index = faiss.read_index(index_path, READER_IO_FLAGS)
+                else:
+                    index = faiss.read_index(index_path)
+                with open(metadata_path, 'r', encoding='utf-8') as f:
+                    entries = [self._entry(entry) for entry in json.load(f)]
+                if isinstance(index, faiss.IndexIDMap2):
+                    return VectorShard(
+                        shard_id,
+                        index,
+                        {entry["message_id"]: entry for entry in entries},
+                        generation=generation,
+                        mmapped=self.read_only and bool(MMAP_FLAT_FLAG),
+                        full=self._load_full_vectors(shard_id, generation, index),
+                        rerank_factor=self.rerank_factor
+                    )
+                return self._upgrade_positional_shard(shard_id, index, entries, generation)
+            except Exception as e:
+                logger.error("Error loading FAISS shard %s: %s", shard_id, e)
+        return VectorShard(shard_id, self._new_index(), {}, generation=generation, rerank_factor=self.rerank_factor)
+
+    def _upgrade_positional_shard(self, shard_id: int, index: Any, entries: List[Dict], generation: int) -> VectorShard:
+        """Re-key a shard written as a positional flat index by message_id"""
+        shard = VectorShard(shard_id, self._new_index(), {}, generation=generation, rerank_factor=self.rerank_factor)
+        if index.ntotal:
+            shard.add(index.reconstruct_n(0, index.ntotal), entries[:index.ntotal])
+        # Readers only upgrade in memory; the writer persists the new format
+        shard.dirty = not self.read_only
+        logger.info("Upgraded FAISS shard %s to message_id keys", shard_id)
+        return shard
+
+    def _load_full_vectors(self, shard_id: int, generation: int, index: Any) -> Optional[FullPrecisionVectors]:
+        """Map the float32 copies of a quantized shard's vectors (not loaded when re-ranking is off)"""
+        if index_type(index) == 'flat' or self.rerank_factor <= 1:
+            return None
+        vectors_path, ids_path = self._vector_paths(shard_id, generation)
+        if not os.path.exists(ids_path):
+            logger.warning("FAISS shard %s has no full-precision vectors, results will not be re-ranked", shard_id)
+            return None
+        return FullPrecisionVectors.load(index.d, vectors_path, ids_path)
+
+    def _new_index(self) -> Any:
+        """Empty index for a new shard, encoded like the store's other shards"""
+        if self.index_type == 'flat':
+            return new_index(self.dimension, self.metric)
+
+        if self._codec_index is None:
+            if self.index_type in TRAINED_INDEX_TYPES:
+                codec_path = os.path.join(self.directory, CODEC_FILE)
+                if not os.path.exists(codec_path):
+                    if not self._codec_missing_logged:
+                        logger.warning("No trained %s codec in %s (run convert_index.py), new shards are flat", self.index_type, self.directory)
+                        self._codec_missing_logged = True
+                    return new_index(self.dimension, self.metric)
+                self._codec_index = faiss.read_index(codec_path)
+            else:
+                self._codec_index = new_codes_index(self.dimension, self.metric, self.index_type)
+        return new_index(self.dimension, codec=self._codec_index)
+
+    def _entry(self, meta: Dict) -> Dict:
+        """Metadata entry without the positional field of older formats"""
+        return {key: value for key, value in meta.items() if key != 'index_position'}
+
+    def _evict_over_budget(self):
+        """Drop least recently used unpinned shards until the resident set fits the budget"""
+        resident_bytes = sum(shard.memory_bytes() for shard in self._resident.values())
+        for shard_id, shard in list(self._resident.items()):
+            if resident_bytes <= self.memory_budget_bytes:
+                break
+            if shard.pins:
+                continue
+            with shard.lock:
+                if shard.dirty:
+                    self.save_shard(shard)
+            resident_bytes -= shard.memory_bytes()
+            del self._resident[shard_id]
+            self.evictions += 1
+
+    def _refresh_if_due(self):
+        """Readers: pick up a newly published manifest and drop shards whose generation changed"""
+        if not self.read_only:
+            return
+        now = time.monotonic()
+        if now - self._manifest_checked < self.reload_interval:
+            return
+        self._manifest_checked = now
+
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.error("Error reading FAISS manifest: %s", e)
+            return
+
+        with self._manifest_lock:
+            self.manifest = manifest
+            self._manifest_mtime = mtime
+
+        # Callers holding an old shard finish with it; the next use loads the new generation
+        for shard_id, shard in list(self._resident.items()):
+            if shard.generation != self._generation(shard_id):
+                del self._resident[shard_id]
+                self.swaps += 1
+
+    def _generation(self, shard_id: int) -> int:
+        """Published generation of a shard (0 for files written before generations existed)"""
+        return int(self.manifest['shards'].get(str(shard_id), {}).get('generation', 0))
+
+    def _shard_paths(self, shard_id: int, generation: int) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"shard_{shard_id:04d}")
+        if generation:
+            base = f"{base}.g{generation:08d}"
+        return f"{base}.index", f"{base}.json"
+
+    def _vector_paths(self, shard_id: int, generation: int) -> Tuple[str, str]:
+        """Full-precision vectors of a quantized shard and their message ids"""
+        base = os.path.splitext(self._shard_paths(shard_id, generation)[0])[0]
+        return f"{base}.vectors.npy", f"{base}.ids.npy"
+
+    def _remove_old_generations(self, shard_id: int, keep: Set[int]):
+        """Delete snapshot files of a shard other than the kept generations"""
+        keep_paths = set()
+        for generation in keep:
+            keep_paths.update(os.path.basename(path) for path in self._shard_paths(shard_id, generation))
+            keep_paths.update(os.path.basename(path) for path in self._vector_paths(shard_id, generation))
+
+        prefix = f"shard_{shard_id:04d}."
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(('.index', '.json', '.npy')) and name not in keep_paths:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError as e:
+                    logger.warning("Could not remove old FAISS snapshot %s: %s", name, e)
+
+    def _acquire_writer_lock(self):
+        """Take the exclusive writer lock of the directory, failing if another process holds it"""
+        lock_file = open(os.path.join(self.directory, WRITER_LOCK_FILE), 'a')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Another process is writing {self.directory}; "
+                "run web workers with FAISS_MODE=reader and a single vector_indexer.py"
+            )
+        return lock_file
+
+    def _load_manifest(self, shard_count: int, metric: str, index_type: str) -> Dict:
+        """Read the manifest; the shard count, metric and index type of existing data win over configuration"""
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self._manifest_mtime = os.stat(path).st_mtime_ns
+            if manifest['shard_count'] != shard_count:
+                logger.warning(
+                    "FAISS_SHARD_COUNT=%s ignored, existing shards use %s", shard_count, manifest['shard_count']
+                )
+            if manifest.get('metric', 'l2') != metric:
+                logger.warning(
+                    "FAISS_METRIC=%s ignored, existing shards use %s (convert them with convert_index.py)",
+                    metric, manifest.get('metric', 'l2')
+                )
+            if manifest.get('index_type', 'flat') != index_type:
+                logger.warning(
+                    "FAISS_INDEX_TYPE=%s ignored, existing shards use %s (convert them with convert_index.py)",
+                    index_type, manifest.get('index_type', 'flat')
+                )
+            return manifest
+
+        manifest = {
+            "version": 2,
+            "generation": 0,
+            "shard_count": shard_count,
+            "dimension": self.dimension,
+            "metric": metric,
+            "index_type": index_type,
+            "shards": {}
+        }
+        if not self.read_only:
+            atomic_write_json(path, manifest)
+        return manifest
@@ -0,0 +1,222 @@
+import numpy as np  # type: ignore
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+if TYPE_CHECKING:
+    from services.faiss_service import FAISSService
+    from services.vector_shards import ShardedVectorStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_MANIFEST = 'snapshot.json'
+
+# Metadata fields written with every vector
+METADATA_FIELDS = ("message_id", "user_id", "text", "intent", "domain")
+
+
+def file_sha256(path: str) -> str:
+    """Checksum of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SnapshotWriter:
+    """
+    Writes a vector snapshot directory: chunk_NNNNN.npy (vectors) and chunk_NNNNN.jsonl (their
+    metadata, one line per row) plus snapshot.json listing the chunks with checksums
+    Rows are buffered up to chunk_rows; the directory appears atomically on close()
+    """
+
+    def __init__(self, path: str, dimension: int, chunk_rows: int = 10000, dtype: str = 'float32'):
+        self.path = path
+        self.tmp_path = f"{path}.partial"
+        self.dimension = dimension
+        self.chunk_rows = chunk_rows
+        self.dtype = dtype
+        self.chunks: List[Dict] = []
+        self.count = 0
+        self._vectors: List[np.ndarray] = []
+        self._metadata: List[Dict] = []
+        self._buffered = 0
+        if os.path.exists(path):
+            raise FileExistsError(f"Snapshot {path} already exists")
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def add(self, vectors: np.ndarray, metadata: List[Dict]):
+        """Buffer rows, writing full chunks as they fill"""
+        self._vectors.append(np.asarray(vectors, dtype=self.dtype))
+        self._metadata.extend({field: meta.get(field) for field in METADATA_FIELDS} for meta in metadata)
+        self._buffered += len(metadata)
+        while self._buffered >= self.chunk_rows:
+            self._write_chunk(self.chunk_rows)
+
+    def close(self, **info) -> Dict:
+        """Write the remaining rows and the manifest, then publish the directory"""
+        if self._buffered:
+            self._write_chunk(self._buffered)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "dimension": self.dimension,
+            "dtype": self.dtype,
+            "count": self.count,
+            "chunks": self.chunks,
+            **info
+        }
+        with open(os.path.join(self.tmp_path, SNAPSHOT_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(self.tmp_path, self.path)
+        return manifest
+
+    def abort(self):
+        """Drop a partly written snapshot"""
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def _write_chunk(self, rows: int):
+        vectors = np.concatenate(self._vectors) if len(self._vectors) > 1 else self._vectors[0]
+        metadata = self._metadata[:rows]
+        name = f"chunk_{len(self.chunks):05d}"
+
+        vectors_path = os.path.join(self.tmp_path, f"{name}.npy")
+        with open(vectors_path, 'wb') as f:
+            np.save(f, vectors[:rows])
+        metadata_path = os.path.join(self.tmp_path, f"{name}.jsonl")
+        with open(metadata_path, 'w', encoding='utf-8') as f:
+            for meta in metadata:
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+
+        self.chunks.append({
+            "vectors": f"{name}.npy",
+            "metadata": f"{name}.jsonl",
+            "count": rows,
+            "sha256": {"vectors": file_sha256(vectors_path), "metadata": file_sha256(metadata_path)}
+        })
+        self.count += rows
+        self._vectors = [vectors[rows:]] if len(vectors) > rows else []
+        self._metadata = self._metadata[rows:]
+        self._buffered -= rows
+
+
+class SnapshotReader:
+    """Reads a snapshot written by SnapshotWriter one chunk at a time"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, SNAPSHOT_MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')!r}")
+
+    @property
+    def dimension(self) -> int:
+        return self.manifest["dimension"]
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    def chunks(self, verify: bool = True) -> Iterator[Tuple[np.ndarray, List[Dict]]]:
+        """(float32 vectors, metadata) per chunk; checksums are checked first unless verify is False"""
+        for chunk in self.manifest["chunks"]:
+            vectors_path = os.path.join(self.path, chunk["vectors"])
+            metadata_path = os.path.join(self.path, chunk["metadata"])
+            if verify:
+                for key, path in (("vectors", vectors_path), ("metadata", metadata_path)):
+                    if file_sha256(path) != chunk["sha256"][key]:
+                        raise ValueError(f"Checksum mismatch in {path}")
+
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                metadata = [json.loads(line) for line in f if line.strip()]
+            vectors = np.load(vectors_path, mmap_mode='r')
+            if len(vectors) != chunk["count"] or len(metadata) != chunk["count"]:
+                raise ValueError(f"Chunk {chunk['vectors']} holds {len(vectors)} vectors and {len(metadata)} entries, expected {chunk['count']}")
+            yield np.asarray(vectors, dtype=np.float32), metadata
+
+
+def default_snapshot_name(generation: int) -> str:
+    """Versioned snapshot name: UTC time plus the store generation it was taken from"""
+    return f"snapshot-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-g{generation:08d}"
+
+
+def list_snapshots(directory: str) -> List[Dict]:
+    """Manifests of the complete snapshots in a directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith('.partial') or not os.path.exists(os.path.join(path, SNAPSHOT_MANIFEST)):
+            continue
+        try:
+            snapshots.append(dict(SnapshotReader(path).manifest, path=path))
+        except Exception as e:
+            logger.warning("Skipping unreadable snapshot %s: %s", path, e)
+    return snapshots
+
+
+def prune_snapshots(directory: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots; returns the removed paths"""
+    removed = []
+    for snapshot in list_snapshots(directory)[:-keep] if keep > 0 else []:
+        shutil.rmtree(snapshot["path"])
+        removed.append(snapshot["path"])
+    return removed
+
+
+def export_store(store: "ShardedVectorStore", path: str, chunk_rows: int = 10000, dtype: str = 'float32') -> Dict:
+    """
+    Write every published vector of the store to a snapshot
+    Read-only stores must keep one manifest for the whole export (no reloads), which makes the
+    snapshot consistent; a shard that no longer matches it aborts the export
+    """
+    published = store.published_shards()
+    generation = store.get_stats()['generation']
+    writer = SnapshotWriter(path, store.dimension, chunk_rows, dtype)
+    try:
+        for shard_id in store.shard_ids():
+            with store.use(shard_id) as shard:
+                expected = published.get(shard_id, {})
+                if store.read_only and (shard.generation != expected.get('generation', 0) or shard.ntotal != expected.get('ntotal', 0)):
+                    raise RuntimeError(f"Shard {shard_id} changed or could not be read during the export, retry")
+                for message_ids, vectors in shard.iter_vectors(chunk_rows):
+                    writer.add(vectors, [shard.metadata[int(message_id)] for message_id in message_ids])
+        return writer.close(
+            generation=generation,
+            metric=store.metric,
+            shard_count=store.shard_count
+        )
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def import_snapshot(service: "FAISSService", path: str, verify: bool = True, progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Add every vector of a snapshot to a writer FAISSService, one bulk add per shard and chunk
+    Existing vectors with the same message_id are replaced; shards are saved at the end
+    (or earlier when the memory budget evicts them). Returns the vectors imported
+    """
+    reader = SnapshotReader(path)
+    if reader.dimension != service.dimension:
+        raise ValueError(f"Snapshot dimension {reader.dimension} does not match EMBEDDING_DIMENSION={service.dimension}")
+
+    imported = 0
+    for vectors, metadata in reader.chunks(verify=verify):
+        entries = [dict(meta, vector=vector) for meta, vector in zip(metadata, vectors)]
+        service.apply_operations([{"op": "add", "entries": entries}])
+        imported += len(entries)
+        if progress:
+            progress(imported, reader.count)
+    service.save_index()
+    return imported
@@ -0,0 +1,55 @@
+from typing import Dict, List
+import itertools
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VectorSpool:
+    """
+    Directory queue of vector write operations, handed from read-only web workers to the indexer
+    Each append becomes one JSONL file that appears atomically; files are processed in name order
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, 'failed')
+        os.makedirs(self.failed_directory, exist_ok=True)
+        self._sequence = itertools.count()
+
+    def append(self, operations: List[Dict]):
+        """Durably queue operations such as {"op": "add", "entries": [...]}"""
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self._sequence)}"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for operation in operations:
+                f.write(json.dumps(operation, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, f"{name}.jsonl"))
+
+    def pending(self, limit: int) -> List[str]:
+        """Oldest queued files, at most limit"""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.jsonl'))
+        return [os.path.join(self.directory, name) for name in names[:limit]]
+
+    def read(self, path: str) -> List[Dict]:
+        """Operations stored in one queued file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def ack(self, paths: List[str]):
+        """Remove files whose operations were applied and published"""
+        for path in paths:
+            os.remove(path)
+
+    def reject(self, path: str):
+        """Set aside a file that could not be applied"""
+        os.replace(path, os.path.join(self.failed_directory, os.path.basename(path)))
+
+    def depth(self) -> int:
+        """Number of queued files"""
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.jsonl'))
@@ -5,6 +5,10 @@ class PromptSenseApp {
         this.apiBase = '';
         this.currentUserId = 1;
         this.currentConversationId = null;
+        this.messagePageSize = 50;
+        this.hasMoreMessages = false;
+        this.oldestMessageCursor = null;
+        this.loadingOlderMessages = false;
         this.initializeElements();
         this.attachEventListeners();
         this.loadUsers();
@@ -48,6 +52,13 @@ class PromptSenseApp {
             this.messageInput.style.height = this.messageInput.scrollHeight + 'px';
         });
 
+        // Load older messages when scrolled to the top of a conversation
+        this.chatMessages.addEventListener('scroll', () => {
+            if (this.chatMessages.scrollTop < 50) {
+                this.loadOlderMessages();
+            }
+        });
+
         // Insights modal
         this.insightsBtn.addEventListener('click', () => this.showInsights());
         this.closeModal.addEventListener('click', () => this.hideInsights());
@@ -134,10 +145,9 @@ class PromptSenseApp {
                 this.updateStatus('Ready');
 
                 // Update conversation ID if it's a new conversation
+                // (the server titles new conversations in the background after the first turn)
                 if (data.conversation_id && !this.currentConversationId) {
                     this.currentConversationId = data.conversation_id;
-                    // Generate title for new conversation after first message
-                    this.generateConversationTitle(this.currentConversationId, message);
                 }
 
                 // Reload conversations list to update
@@ -166,6 +176,24 @@ class PromptSenseApp {
             welcomeMsg.remove();
         }
 
+        this.chatMessages.appendChild(this.createMessageElement(role, content, metadata, enhancedPrompt));
+        this.scrollToBottom();
+    }
+
+    createStoredMessageElement(msg) {
+        // Stored messages come without prompt details; the enhanced prompt is fetched on demand
+        const metadata = msg.metadata || {};
+        if (msg.intent) metadata.intent = msg.intent;
+        if (msg.domain) metadata.domain = msg.domain;
+
+        const loadEnhancedPrompt = msg.has_enhanced_prompt && !msg.enhanced_prompt
+            ? () => this.fetchEnhancedPrompt(msg.conversation_id, msg.id)
+            : null;
+
+        return this.createMessageElement(msg.role, msg.content, metadata, msg.enhanced_prompt, loadEnhancedPrompt);
+    }
+
+    createMessageElement(role, content, metadata = null, enhancedPrompt = null, loadEnhancedPrompt = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${role}`;
 
@@ -219,18 +247,25 @@ class PromptSenseApp {
         }
 
         // Add enhanced prompt toggle for any message that has an enhanced prompt
-        if (enhancedPrompt) {
+        if (enhancedPrompt || loadEnhancedPrompt) {
             const enhancedPromptSection = document.createElement('div');
             enhancedPromptSection.className = 'enhanced-prompt-section';
 
             const toggleButton = document.createElement('button');
             toggleButton.className = 'enhanced-prompt-toggle';
             toggleButton.textContent = '🔍 View Enhanced Prompt';
-            toggleButton.onclick = () => {
+            toggleButton.onclick = async () => {
                 const content = enhancedPromptSection.querySelector('.enhanced-prompt-content');
                 const isVisible = content.style.display === 'block';
                 content.style.display = isVisible ? 'none' : 'block';
                 toggleButton.textContent = isVisible ? '🔍 View Enhanced Prompt' : '🔼 Hide Enhanced Prompt';
+
+                // Fetch the prompt the first time it is shown
+                const promptText = content.querySelector('.enhanced-prompt-text');
+                if (!isVisible && !promptText.textContent && loadEnhancedPrompt) {
+                    promptText.textContent = 'Loading...';
+                    promptText.textContent = await loadEnhancedPrompt() || 'Enhanced prompt unavailable';
+                }
             };
 
             const promptContent = document.createElement('div');
@@ -243,7 +278,7 @@ class PromptSenseApp {
 
             const promptText = document.createElement('pre');
             promptText.className = 'enhanced-prompt-text';
-            promptText.textContent = enhancedPrompt;
+            promptText.textContent = enhancedPrompt || '';
 
             promptContent.appendChild(promptLabel);
             promptContent.appendChild(promptText);
@@ -257,8 +292,18 @@ class PromptSenseApp {
         messageDiv.appendChild(avatar);
         messageDiv.appendChild(messageContent);
 
-        this.chatMessages.appendChild(messageDiv);
-        this.scrollToBottom();
+        return messageDiv;
+    }
+
+    async fetchEnhancedPrompt(conversationId, messageId) {
+        try {
+            const response = await fetch(`${this.apiBase}/api/conversations/${conversationId}/messages/${messageId}/details`);
+            const data = await response.json();
+            return data.success && data.message ? data.message.enhanced_prompt : null;
+        } catch (error) {
+            console.error('Error loading enhanced prompt:', error);
+            return null;
+        }
     }
 
     showTyping() {
@@ -488,6 +533,10 @@ class PromptSenseApp {
                 this.generateConversationTitleIfNeeded(conversation.id);
             }
 
+            const preview = document.createElement('div');
+            preview.className = 'conversation-preview';
+            preview.textContent = conversation.last_message_preview || '';
+
             const date = document.createElement('div');
             date.className = 'conversation-date';
             date.textContent = this.formatDate(conversation.updated_at || conversation.created_at);
@@ -506,6 +555,9 @@ class PromptSenseApp {
             actions.appendChild(deleteBtn);
 
             item.appendChild(title);
+            if (conversation.last_message_preview) {
+                item.appendChild(preview);
+            }
             item.appendChild(date);
             item.appendChild(actions);
 
@@ -551,28 +603,27 @@ class PromptSenseApp {
         try {
             this.updateStatus('Loading conversation...');
 
-            const response = await fetch(`${this.apiBase}/api/conversations/${conversationId}/messages`);
+            // Newest page first; older pages load when scrolling up
+            const response = await fetch(`${this.apiBase}/api/conversations/${conversationId}/messages?limit=${this.messagePageSize}`);
             const data = await response.json();
 
             if (data.success && data.messages) {
                 this.currentConversationId = conversationId;
                 this.clearChat();
 
-                // Add all messages from the conversation
+                const welcomeMsg = this.chatMessages.querySelector('.welcome-message');
+                if (welcomeMsg && data.messages.length > 0) {
+                    welcomeMsg.remove();
+                }
+
                 data.messages.forEach(msg => {
-                    if (msg.role === 'user') {
-                        // User messages also have enhanced prompts
-                        const metadata = msg.metadata || {};
-                        if (msg.intent) metadata.intent = msg.intent;
-                        if (msg.domain) metadata.domain = msg.domain;
-                        this.addMessage('user', msg.content, metadata, msg.enhanced_prompt);
-                    } else if (msg.role === 'assistant') {
-                        const metadata = msg.metadata || {};
-                        if (msg.intent) metadata.intent = msg.intent;
-                        if (msg.domain) metadata.domain = msg.domain;
-                        this.addMessage('assistant', msg.content, metadata, msg.enhanced_prompt);
+                    if (msg.role === 'user' || msg.role === 'assistant') {
+                        this.chatMessages.appendChild(this.createStoredMessageElement(msg));
                     }
                 });
+                this.hasMoreMessages = data.has_more;
+                this.oldestMessageCursor = data.next_cursor;
+                this.scrollToBottom();
 
                 this.loadConversations();
                 this.updateStatus('Conversation loaded');
@@ -585,6 +636,46 @@ class PromptSenseApp {
         }
     }
 
+    async loadOlderMessages() {
+        if (this.loadingOlderMessages || !this.hasMoreMessages || !this.currentConversationId) {
+            return;
+        }
+
+        this.loadingOlderMessages = true;
+        const conversationId = this.currentConversationId;
+
+        try {
+            const response = await fetch(
+                `${this.apiBase}/api/conversations/${conversationId}/messages?limit=${this.messagePageSize}&before=${this.oldestMessageCursor}`
+            );
+            const data = await response.json();
+
+            // Ignore pages that arrive after switching to another conversation
+            if (!data.success || conversationId !== this.currentConversationId) {
+                return;
+            }
+
+            const fragment = document.createDocumentFragment();
+            data.messages.forEach(msg => {
+                if (msg.role === 'user' || msg.role === 'assistant') {
+                    fragment.appendChild(this.createStoredMessageElement(msg));
+                }
+            });
+
+            // Keep the message the user was reading in place while prepending
+            const previousHeight = this.chatMessages.scrollHeight;
+            this.chatMessages.insertBefore(fragment, this.chatMessages.firstChild);
+            this.chatMessages.scrollTop += this.chatMessages.scrollHeight - previousHeight;
+
+            this.hasMoreMessages = data.has_more;
+            this.oldestMessageCursor = data.next_cursor;
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            this.loadingOlderMessages = false;
+        }
+    }
+
     async deleteConversation(conversationId) {
         if (!confirm('Are you sure you want to delete this conversation?')) {
             return;
@@ -615,27 +706,8 @@ class PromptSenseApp {
         }
     }
 
-    async generateConversationTitle(conversationId, firstMessage) {
-        try {
-            await fetch(`${this.apiBase}/api/conversations/${conversationId}/generate-title`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    message: firstMessage
-                })
-            });
-
-            // Reload conversations to show the new title
-            setTimeout(() => this.loadConversations(), 1000);
-        } catch (error) {
-            console.error('Error generating conversation title:', error);
-        }
-    }
-
     async generateConversationTitleIfNeeded(conversationId) {
-        // Prevent multiple simultaneous requests for the same conversation
+        // Ask at most once per conversation; the server deduplicates generation as well
         if (!this.generatingTitles) {
             this.generatingTitles = new Set();
         }
@@ -657,15 +729,15 @@ class PromptSenseApp {
             // If conversation doesn't exist (404), stop trying to generate title
             if (response.status === 404) {
                 console.warn(`Conversation ${conversationId} not found, skipping title generation`);
-                this.generatingTitles.delete(conversationId);
                 return;
             }
 
-            // Reload conversations to show the new title after a short delay
-            setTimeout(() => {
-                this.loadConversations();
-                this.generatingTitles.delete(conversationId);
-            }, 1000);
+            const data = await response.json();
+
+            // The title is generated in the background; refresh the list once it is likely ready
+            if (data.success && data.pending) {
+                setTimeout(() => this.loadConversations(), 2000);
+            }
         } catch (error) {
             console.error('Error generating conversation title:', error);
             this.generatingTitles.delete(conversationId);
@@ -673,6 +745,8 @@ class PromptSenseApp {
     }
 
     clearChat() {
+        this.hasMoreMessages = false;
+        this.oldestMessageCursor = null;
         this.chatMessages.innerHTML = `
             <div class="welcome-message">
                 <div class="welcome-icon">💬</div>
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vector Indexer for PromptSense
+Single writer for the FAISS shards when web workers run with FAISS_MODE=reader:
+applies the writes they spool and publishes new shard generations for them to map
+
+Examples:
+    python vector_indexer.py
+    python vector_indexer.py --once
+"""
+
+import sys
+import io
+import argparse
+import signal
+import threading
+from services.faiss_service import FAISSService
+from services.vector_spool import VectorSpool
+from config import Config
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Apply spooled vector writes and publish shard snapshots")
+    parser.add_argument('--interval', type=float, default=Config.FAISS_INDEXER_POLL_INTERVAL, help="Seconds between spool checks")
+    parser.add_argument('--batch-files', type=int, default=200, help="Spool files applied per published snapshot")
+    parser.add_argument('--once', action='store_true', help="Drain the spool once and exit")
+    return parser.parse_args()
+
+
+def drain(service, spool, batch_files):
+    """Apply one batch of spool files, publish the touched shards, then remove the files"""
+    paths = spool.pending(batch_files)
+    if not paths:
+        return 0
+
+    applied = []
+    totals = {"added": 0, "removed": 0}
+    for path in paths:
+        try:
+            counts = service.apply_operations(spool.read(path))
+        except Exception as e:
+            logger.error("Error applying %s, moving it aside: %s", path, e)
+            spool.reject(path)
+            continue
+        applied.append(path)
+        for key, value in counts.items():
+            totals[key] += value
+
+    # Files are only removed once their effects are on disk
+    if not service.save_index():
+        raise RuntimeError("Could not publish FAISS shards")
+    spool.ack(applied)
+
+    logger.info("Applied %s spool files: %s added, %s removed", len(applied), totals['added'], totals['removed'])
+    return len(paths)
+
+
+def main():
+    """Run the indexer loop"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Vector Indexer")
+    print("=" * 60)
+    print()
+    print(f"📁 Shards: {Config.FAISS_SHARD_DIR}")
+    print(f"📥 Spool:  {Config.FAISS_SPOOL_DIR}")
+    print()
+
+    service = FAISSService(mode='writer')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards (see the log above)")
+        sys.exit(1)
+
+    spool = VectorSpool(Config.FAISS_SPOOL_DIR)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    print("✅ Indexer running" if not args.once else "✅ Draining spool")
+    try:
+        while not stop.is_set():
+            processed = drain(service, spool, args.batch_files)
+            if processed:
+                continue
+            if args.once:
+                break
+            stop.wait(args.interval)
+    finally:
+        service.save_index()
+
+    print("👋 Indexer stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vector Search Server for PromptSense
+Owns the FAISS shards in its own process so vector search scales separately from the web workers,
+which use it with FAISS_MODE=remote. Concurrent searches are coalesced into one index search
+
+Examples:
+    python vector_server.py
+    python vector_server.py --port 5055 --batch-size 128 --window-ms 3
+"""
+
+import sys
+import io
+import argparse
+import signal
+import threading
+from services.faiss_service import FAISSService
+from services.vector_rpc import make_server
+from config import Config
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Vector search server for FAISS_MODE=remote web workers")
+    parser.add_argument('--host', default=Config.VECTOR_SERVER_HOST)
+    parser.add_argument('--port', type=int, default=Config.VECTOR_SERVER_PORT)
+    parser.add_argument('--batch-size', type=int, default=Config.VECTOR_SEARCH_BATCH_SIZE, help="Maximum queries per index search")
+    parser.add_argument('--window-ms', type=float, default=Config.VECTOR_SEARCH_BATCH_WINDOW_MS, help="Milliseconds to wait for more queries")
+    return parser.parse_args()
+
+
+def main():
+    """Run the vector server"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Vector Server")
+    print("=" * 60)
+    print()
+
+    service = FAISSService(mode='writer')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards (see the log above)")
+        sys.exit(1)
+
+    server = make_server(service, args.host, args.port, args.batch_size, args.window_ms / 1000)
+    # Stop serving on SIGTERM so the shards are saved below
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"✅ Listening on http://{args.host}:{args.port}")
+    print(f"📦 Search batches: up to {args.batch_size} queries, {args.window_ms} ms window")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.save_index()
+
+    print("👋 Vector server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vector Snapshots for PromptSense
+Exports the FAISS shards (vectors + metadata) to a versioned snapshot of chunked .npy/.jsonl files
+and imports snapshots back with bulk adds. Memory stays bounded by the chunk size and the shard budget
+
+Export reads the published shard files like a web worker in reader mode, so it can run next to
+the app; writes not yet saved by the writer are not included. Import needs the writer lock:
+stop the app (single worker), the vector indexer or the vector server first
+
+Examples:
+    python vector_snapshot.py export
+    python vector_snapshot.py export --output /backups/vectors --dtype float16 --keep 5
+    python vector_snapshot.py list
+    python vector_snapshot.py import faiss_snapshots/snapshot-20250101T000000Z-g00000042
+"""
+
+import sys
+import io
+import os
+import argparse
+from config import Config
+import logging
+
+# Set UTF-8 encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Export, list and import vector store snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="Write the published vectors to a new snapshot")
+    export.add_argument('--output', help=f"Snapshot directory (default: a versioned name in {Config.FAISS_SNAPSHOT_DIR})")
+    export.add_argument('--chunk-rows', type=int, default=10000, help="Vectors per chunk file")
+    export.add_argument('--dtype', choices=['float32', 'float16'], default='float32', help="Stored vector precision")
+    export.add_argument('--keep', type=int, default=0, help=f"Keep only the newest N snapshots in {Config.FAISS_SNAPSHOT_DIR}")
+
+    commands.add_parser('list', help=f"List the snapshots in {Config.FAISS_SNAPSHOT_DIR}")
+
+    restore = commands.add_parser('import', help="Add a snapshot's vectors to the shards")
+    restore.add_argument('path', help="Snapshot directory")
+    restore.add_argument('--no-verify', action='store_true', help="Skip checksum verification")
+    return parser.parse_args()
+
+
+def export_command(args):
+    """Export the shards to a snapshot"""
+    from services.faiss_service import FAISSService
+    from services.vector_snapshot import default_snapshot_name, export_store, prune_snapshots
+
+    service = FAISSService(mode='reader')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards (see the log above)")
+        sys.exit(1)
+
+    # One manifest for the whole export keeps the snapshot consistent
+    store = service.store
+    store.reload_interval = float('inf')
+
+    path = args.output or os.path.join(Config.FAISS_SNAPSHOT_DIR, default_snapshot_name(store.get_stats()['generation']))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    print(f"📦 Exporting {store.total_vectors()} vectors to {path}...")
+
+    try:
+        manifest = export_store(store, path, chunk_rows=args.chunk_rows, dtype=args.dtype)
+    except Exception as e:
+        print(f"❌ Export failed: {e}")
+        sys.exit(1)
+
+    print(f"✅ Exported {manifest['count']} vectors in {len(manifest['chunks'])} chunks (generation {manifest['generation']})")
+    if args.keep and not args.output:
+        for removed in prune_snapshots(Config.FAISS_SNAPSHOT_DIR, args.keep):
+            print(f"🗑️  Removed old snapshot {removed}")
+
+
+def list_command(args):
+    """Print the snapshots in the snapshot directory"""
+    from services.vector_snapshot import list_snapshots
+
+    snapshots = list_snapshots(Config.FAISS_SNAPSHOT_DIR)
+    if not snapshots:
+        print(f"No snapshots in {Config.FAISS_SNAPSHOT_DIR}")
+        return
+
+    for snapshot in snapshots:
+        size = sum(os.path.getsize(os.path.join(snapshot['path'], name)) for name in os.listdir(snapshot['path']))
+        print(
+            f"📦 {os.path.basename(snapshot['path'])}: {snapshot['count']} vectors, "
+            f"{snapshot['dtype']}, {size / (1024 * 1024):.1f} MB, created {snapshot['created_at']}"
+        )
+
+
+def import_command(args):
+    """Import a snapshot into the shards"""
+    from services.faiss_service import FAISSService
+    from services.vector_snapshot import import_snapshot
+
+    service = FAISSService(mode='writer')
+    if not service.ready:
+        print("❌ Could not open the FAISS shards for writing (see the log above)")
+        sys.exit(1)
+
+    def progress(done, total):
+        print(f"   {done}/{total} vectors")
+
+    print(f"📦 Importing {args.path}...")
+    try:
+        imported = import_snapshot(service, args.path, verify=not args.no_verify, progress=progress)
+    except Exception as e:
+        print(f"❌ Import failed: {e}")
+        sys.exit(1)
+
+    print(f"✅ Imported {imported} vectors; the store now holds {service.store.total_vectors()}")
+
+
+def main():
+    """Run the snapshot command"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("PromptSense Vector Snapshots")
+    print("=" * 60)
+    print()
+
+    {'export': export_command, 'list': list_command, 'import': import_command}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()